@@ -0,0 +1,209 @@
+# aggregates.py
+"""
+Mergeable partial aggregates behind champion_summary.csv.
+
+Instead of grouping the whole participants table on every run, we keep one
+small table of partials per (championName, patch, queueId):
+
+    games, wins, and for every summary metric  <m>_n, <m>_sum, <m>_sq
+
+Partials of disjoint row sets simply add up, so a run only aggregates its new
+participants part file and merges it in. The summary (means, win rate,
+popularity, ...) is re-derived from the partials, optionally sliced by patch
+and/or queue, and sums of squares give standard deviations and 95% confidence
+intervals for free.
+
+    python aggregates.py rebuild
+    python aggregates.py summary --patch 15.19 --queue 420
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from features import add_summary_features
+from staging import folded_parts
+
+KEYS = ["championName", "patch", "queueId"]
+
+# metrics averaged in the champion summary (same order as the original cell)
+METRICS = [
+    "kills", "deaths", "assists", "goldEarned", "goldSpent",
+    "KDA_ratio", "CS_per_min", "DMG_per_min", "Vision_per_min",
+    "Gold_efficiency", "DMG_Gold_ratio", "CS_per_game",
+    "totalDamageDealtToChampions", "totalDamageTaken", "totalHeal", "timeCCingOthers",
+]
+
+INPUT_COLUMNS = ["championName", "patch", "gameVersion", "queueId", "win"] + METRICS
+
+DEFAULT_PARTIALS = Path("data/processed/champion_partials.parquet")
+
+Z95 = 1.96
+
+
+def add_patch(df: pd.DataFrame) -> pd.DataFrame:
+    """'15.19.715.1234' -> '15.19', vectorized (same rule as raw_store.patch_of)."""
+    if "patch" not in df.columns:
+        df["patch"] = (df["gameVersion"].astype("string").str.split(".").str[:2].str.join(".")
+                       .fillna("unknown"))
+    return df
+
+
+# ====== BUILD / MERGE ======
+def partials_from_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Participants rows -> partials (one row per champion/patch/queue)."""
+    df = add_patch(df)
+    # plain keys: grouping on categoricals would emit every champion x patch combination
+    work = pd.DataFrame({"championName": df["championName"].astype(str),
+                         "patch": df["patch"].astype(str),
+                         "queueId": df["queueId"].astype("int64")})
+    work["games"] = 1
+    win = df["win"] if "win" in df.columns else df["winCount"].astype(bool)
+    work["wins"] = win.astype("boolean").fillna(False).astype("int64")
+    for m in METRICS:
+        v = df[m].astype("float64")
+        work[f"{m}_n"] = v.notna().astype("int64")
+        work[f"{m}_sum"] = v.fillna(0.0)
+        work[f"{m}_sq"] = (v * v).fillna(0.0)
+    return work.groupby(KEYS, as_index=False, dropna=False).sum()
+
+
+def merge_partials(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return empty_partials()
+    return pd.concat(frames, ignore_index=True).groupby(KEYS, as_index=False, dropna=False).sum()
+
+
+def empty_partials() -> pd.DataFrame:
+    cols = KEYS + ["games", "wins"] + [f"{m}_{s}" for m in METRICS for s in ("n", "sum", "sq")]
+    return pd.DataFrame(columns=cols)
+
+
+def partials_from_parquet(path) -> pd.DataFrame:
+    """Aggregate a participants Parquet file batch by batch (bounded memory)."""
+    f = pq.ParquetFile(path)
+    names = f.schema_arrow.names
+    cols = [c for c in INPUT_COLUMNS if c in names and not (c == "gameVersion" and "patch" in names)]
+    return merge_partials(partials_from_frame(b.to_pandas())
+                          for b in f.iter_batches(columns=cols, batch_size=100_000))
+
+
+# ====== PERSISTENCE ======
+def load_partials(path=DEFAULT_PARTIALS):
+    """-> (partials DataFrame, set of part-file names already folded in)."""
+    path = Path(path)
+    if not path.exists():
+        return empty_partials(), set()
+    table = pq.read_table(path)
+    meta = table.schema.metadata or {}
+    parts = set(json.loads(meta.get(b"parts", b"[]")))
+    return table.to_pandas(), parts
+
+
+def save_partials(partials: pd.DataFrame, parts: Iterable[str], path=DEFAULT_PARTIALS) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(partials, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b"parts": json.dumps(sorted(parts)).encode()})
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(table, tmp)
+    tmp.replace(path)
+
+
+def update_partials(participant_parts: Sequence[Path], path=DEFAULT_PARTIALS,
+                    rebuild: bool = False) -> pd.DataFrame:
+    """Fold participants part files not yet included into the stored partials.
+
+    `participant_parts` is the current list of part files. Compacted parts
+    whose sources are folded in already are only renamed (staging.folded_parts).
+    If some part folded in earlier is gone (the staged data was rebuilt), or
+    with `rebuild`, the partials are recomputed from scratch.
+    """
+    partials, done = load_partials(path)
+    covered, new = folded_parts(participant_parts, done)
+    if rebuild or covered is None:
+        partials, covered, new, rebuild = empty_partials(), set(), [Path(p) for p in participant_parts], True
+    if new or rebuild or covered != done:
+        partials = merge_partials([partials] + [partials_from_parquet(p) for p in new])
+        save_partials(partials, covered | {p.name for p in new}, path)
+    return partials
+
+
+# ====== DERIVE THE SUMMARY ======
+def summarize(partials: pd.DataFrame, by: Sequence[str] = ("championName",),
+              patch: Optional[Sequence[str]] = None,
+              queue: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    """Champion summary (same columns as champion_summary.csv plus spread / CIs)."""
+    p = partials
+    if patch is not None:
+        p = p[p["patch"].isin([patch] if isinstance(patch, str) else patch)]
+    if queue is not None:
+        p = p[p["queueId"].isin([queue] if isinstance(queue, int) else queue)]
+    g = p.drop(columns=[k for k in KEYS if k not in by]).groupby(list(by), as_index=False).sum()
+
+    out = g[list(by)].copy()
+    out["winCount"] = g["wins"].astype("int64")
+    out["loseCount"] = (g["games"] - g["wins"]).astype("int64")
+    for m in METRICS:
+        n = g[f"{m}_n"].replace(0, np.nan)
+        out[m] = g[f"{m}_sum"] / n
+
+    # basic totals
+    out["totalGames"] = out["winCount"] + out["loseCount"]
+    out["winRate"] = 100 * out["winCount"] / out["totalGames"]
+    out["popularity_%"] = 100 * out["totalGames"] / out["totalGames"].sum()
+    add_summary_features(out)      # KDA_performance, DMG_per_death, ... (features.py)
+
+    # ---- spread from sums of squares ----
+    games = out["totalGames"].astype("float64")
+    p_win = out["winCount"] / games
+    half = Z95 * np.sqrt(p_win * (1 - p_win) / games)
+    out["winRate_ci_low"] = 100 * (p_win - half).clip(lower=0)
+    out["winRate_ci_high"] = 100 * (p_win + half).clip(upper=1)
+    for m in ("KDA_ratio", "CS_per_min", "DMG_per_min"):
+        std = sample_std(g[f"{m}_n"], g[f"{m}_sum"], g[f"{m}_sq"])
+        se = std / np.sqrt(g[f"{m}_n"].replace(0, np.nan))
+        out[f"{m}_std"] = std
+        out[f"{m}_ci_low"] = out[m] - Z95 * se
+        out[f"{m}_ci_high"] = out[m] + Z95 * se
+    return out
+
+
+def sample_std(n, s, sq):
+    n = n.astype("float64")
+    var = (sq - s * s / n.replace(0, np.nan)) / (n - 1).where(n > 1)
+    return np.sqrt(var.clip(lower=0))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Champion summary from mergeable partials")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("rebuild", help="recompute partials from every participants part file")
+    r.add_argument("--participants", default="data/staged/participants")
+    s = sub.add_parser("summary")
+    s.add_argument("--patch", action="append")
+    s.add_argument("--queue", type=int, action="append")
+    s.add_argument("--by", default="championName", help="comma list of championName,patch,queueId")
+    s.add_argument("--out")
+    for sp in (r, s):
+        sp.add_argument("--partials", default=str(DEFAULT_PARTIALS))
+    args = ap.parse_args()
+
+    if args.cmd == "rebuild":
+        parts = sorted(Path(args.participants).glob("part-*.parquet"))
+        partials = update_partials(parts, args.partials, rebuild=True)
+        print(f"{len(partials)} partial rows from {len(parts)} part files")
+    else:
+        partials, _ = load_partials(args.partials)
+        out = summarize(partials, by=args.by.split(","), patch=args.patch, queue=args.queue)
+        if args.out:
+            out.to_csv(args.out, index=False)
+        print(out.sort_values("totalGames", ascending=False).head(20).to_string(index=False))
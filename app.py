@@ -2,139 +2,244 @@
 """
 Streamlit app for hackathon-aws-data-pipeline-lol-analytics
 Features:
- - load local match / player CSV or parquet
+ - read the pipeline's precomputed dashboard artifacts (data/dashboard)
+ - OR load local match / player CSV, Parquet, Feather / Arrow IPC or zip, or a
+   (partitioned) dataset directory, memory-mapped and column-pruned (loaders.py)
  - OR fetch matches live using functions from riot.py (if available)
  - basic EDA: counts, winrate, time series, champion frequencies
- - per-match view with key stats and quick coaching suggestions
+ - per-match view with key stats, champion-role percentiles (rollups.py) and
+   quick coaching suggestions (rules.json, evaluated for every match when the
+   artifacts are built; see features.py)
+ - live panel following the ingestion daemon (daemon.py): the newest games of
+   the tracked players, refreshed every few seconds from data/live
+
+Streamlit reruns this script on every interaction, so everything expensive
+(loading, aggregating, importing riot.py) is cached: files by content hash,
+the artifacts as shared resources. Charts only read the small artifact tables.
 """
 
-from typing import Optional
-import streamlit as st
-import pandas as pd
-import numpy as np
-import importlib
+import hashlib
 import os
 from pathlib import Path
-import plotly.express as px
+
+import pandas as pd
+import streamlit as st
+
+import dashboard
+import features
+import match_index
 
 st.set_page_config(page_title="LoL Coach — Hackathon Demo", layout="wide")
 
+RAW_STORE = Path("data/raw/store")
+MATCHUP_DIR = Path("data/processed/matchups")
+MATCH_PAGE_SIZE = 50
+LIVE_DIR = Path("data/live")
+LIVE_REFRESH = 5        # seconds between snapshot checks
+LIVE_EVENTS = 20
+
 # -------------------------
 # Helpers
 # -------------------------
-@st.cache_data
 def load_local_file(file: Path) -> pd.DataFrame:
-    ext = file.suffix.lower()
-    if ext == ".csv":
-        return pd.read_csv(file)
-    if ext in [".parquet", ".pqt"]:
-        return pd.read_parquet(file)
-    # fallback attempt
-    return pd.read_csv(file, low_memory=False)
+    # Arrow read of only the columns the dashboard uses (mmap / streamed, see
+    # loaders.py); staged-table columns get the schema dtypes on the way to pandas
+    import loaders
+
+    return loaders.load_frame(file, dashboard.input_columns(loaders.columns_of(file)))
+
+
+# cache_resource: artifacts are shared read-only, not copied on every rerun
+@st.cache_resource(max_entries=4, show_spinner="Summarizing dataset...")
+def file_artifacts(path: str, digest: str) -> dict:
+    return dashboard.build_artifacts(load_local_file(Path(path)))
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def pipeline_artifacts(stat: str) -> dict:
+    # everything but the full per-match table, which only the CSV export needs
+    art = dashboard.load_artifacts()
+    art["matches"] = None
+    return art
+
+
+def all_matches(art: dict) -> pd.DataFrame:
+    if art["matches"] is None:
+        return dashboard.load_artifacts(tables=["matches"])["matches"]
+    return art["matches"]
+
+
+@st.cache_resource(show_spinner=False)
+def demo_artifacts(n: int = 200, seed: int = 1) -> dict:
+    # small demo synthetic dataset if repo has none
+    import numpy as np
+
+    np.random.seed(seed)
+    df = pd.DataFrame({
+        "match_id": np.arange(n),
+        "date": pd.date_range(end=pd.Timestamp.now().normalize(), periods=n).astype(str),
+        "champion": np.random.choice(["Ahri","Yasuo","Lee Sin","Ezreal","Lux"], size=n),
+        "kills": np.random.poisson(4, n),
+        "deaths": np.random.poisson(3, n),
+        "assists": np.random.poisson(5, n),
+        "win": np.random.choice([True, False], n, p=[0.52,0.48]),
+        "gold": np.random.normal(11000, 1500, n).astype(int)
+    })
+    return dashboard.build_artifacts(df)
+
+
+# queries over data/staged: filters and aggregation run inside the Parquet scan
+@st.cache_data(show_spinner=False)
+def staged_options(stat: str) -> dict:
+    import pyarrow.compute as pc
+    import query
+    from raw_store import patch_of
+
+    patches = query.distinct("patch") or sorted({patch_of(v) for v in query.distinct("gameVersion")})
+    created = query.matches_dataset().to_table(columns=["gameCreation"]).column("gameCreation")
+    lo, hi = pc.min_max(created).values()
+    return {"patch": patches, "queueId": query.distinct("queueId"),
+            "championName": query.distinct("championName", table="participants"),
+            "dates": (pd.to_datetime(lo.as_py(), unit="ms").date(), pd.to_datetime(hi.as_py(), unit="ms").date())}
+
+
+@st.cache_data(show_spinner="Querying staged data...")
+def champion_breakdown(stat: str, champion: tuple, patch: tuple, queue: tuple, start, end) -> pd.DataFrame:
+    import query
+
+    return query.champion_breakdown(champion=list(champion) or None, patch=list(patch) or None,
+                                    queue=list(queue) or None, start=start, end=end)
+
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_match_index(stat: str) -> match_index.MatchIndex:
+    return match_index.MatchIndex("data/staged")
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_matchups(stat: str, patches: tuple):
+    import matchups
+    return matchups.Matrix(MATCHUP_DIR, list(patches) or None)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_percentiles(stat: str):
+    import rollups
+    return rollups.Percentiles("champion_role")
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_raw_store(stat: str):
+    from raw_store import RawStore
+    return RawStore(RAW_STORE)
+
+
+@st.cache_resource(show_spinner="Importing riot.py...")
 def try_import_riot_module():
+    # imported on demand only: riot.py pulls in the pipeline modules
     try:
         import riot  # if your file is riot.py in repo, Python module name is riot
         return riot
     except Exception:
-        try:
-            # sometimes your file is named riot.py but package name differs
-            mod = importlib.import_module("riot")
-            return mod
-        except Exception:
-            return None
-
-def summarize_matches(df: pd.DataFrame) -> dict:
-    summary = {}
-    # Make best-effort flexible column names
-    col_win = None
-    for c in df.columns:
-        if c.lower() in ("win","is_win","victory","result"):
-            col_win = c
-            break
-    if col_win is None:
-        # try to infer from 'result' containing 'Win'/'Loss'
-        summary['win_rate'] = None
-    else:
-        wins = df[col_win].map(lambda v: 1 if str(v).lower() in ("true","1","win","victory") else 0)
-        summary['win_rate'] = wins.mean() if len(wins)>0 else None
+        return None
 
-    # Champion frequency
-    champ_col = next((c for c in df.columns if "champ" in c.lower()), None)
-    if champ_col:
-        summary['champ_freq'] = df[champ_col].value_counts().head(10)
-    else:
-        summary['champ_freq'] = None
 
-    # KDA if present
-    k_cols = [c for c in df.columns if any(x in c.lower() for x in ("kill","assist","death"))]
-    summary['has_kda'] = len(k_cols) >= 3
-    return summary
+@st.fragment(run_every=LIVE_REFRESH)
+def live_panel():
+    # only snapshot.json (tiny) is read per tick; the feed when its seq moved
+    import live_feed
+
+    snapshot = live_feed.read_snapshot(LIVE_DIR)
+    if snapshot is None:
+        return
+    seen = st.session_state.get("live_seq")
+    st.session_state["live_seq"] = snapshot["seq"]
+    if seen is not None and snapshot["seq"] > seen:
+        # new games were staged: rerun the whole app so the cached views pick them up
+        st.rerun(scope="app")
+    age = pd.Timestamp.now(tz="UTC") - pd.Timestamp(snapshot["updated"], unit="s", tz="UTC")
+    st.subheader("Live")
+    st.caption(f"Daemon feed #{snapshot['seq']:,} · updated {age.total_seconds() / 60:.0f} min ago · "
+               f"{snapshot.get('staged_total', 0):,} matches staged")
+    players = pd.DataFrame([{"player": p[:12], **r} for p, r in snapshot.get("players", {}).items()])
+    if len(players):
+        players["win_rate"] = (players["wins"] / players["games"]).round(3)
+    events = pd.DataFrame(live_feed.read_feed(LIVE_DIR, limit=LIVE_EVENTS))
+    c1, c2 = st.columns([1, 3])
+    c1.dataframe(players, use_container_width=True, hide_index=True)
+    if len(events):
+        events["player"] = events["puuid"].str[:12]
+        events["hints"] = events["hints"].str.join(" ")
+        c2.dataframe(events[["date", "matchId", "player", "championName", "teamPosition", "win",
+                             "kills", "deaths", "assists", "kda", "hints"]],
+                     use_container_width=True, hide_index=True)
+
 
 # -------------------------
 # Sidebar
 # -------------------------
 st.sidebar.title("LoL Coach — Controls")
-data_source = st.sidebar.radio("Data source", ["Local file / dataset", "Fetch live via riot.py (PUUID)"])
+has_pipeline = (dashboard.DASHBOARD_DIR / "summary.json").exists()
+sources = ["Pipeline dashboard (data/dashboard)", "Local file / dataset", "Fetch live via riot.py (PUUID)"]
+data_source = st.sidebar.radio("Data source", sources, index=0 if has_pipeline else 1)
 
-df = None
+art = None
 
-if data_source == "Local file / dataset":
-    uploaded = st.sidebar.file_uploader("Upload CSV or Parquet (or select sample)", type=["csv","parquet","pqt","zip"])
+if data_source == sources[0]:
+    if has_pipeline:
+        art = pipeline_artifacts(dashboard.stat_key(dashboard.DASHBOARD_DIR))
+        st.sidebar.write(f"Built by the pipeline from {art['summary']['matches']:,} rows.")
+    else:
+        st.sidebar.error("No data/dashboard artifacts yet — run `python dashboard.py` (or riot.py).")
+
+elif data_source == "Local file / dataset":
+    uploaded = st.sidebar.file_uploader("Upload CSV, Parquet or Feather (or select sample)",
+                                        type=["csv","parquet","pqt","zip","feather","arrow","ipc"])
+    # large files / partitioned datasets: opened in place (memory-mapped), no upload copy
+    local_path = st.sidebar.text_input("...or a local file / dataset directory", value="")
     use_sample = st.sidebar.checkbox("Use sample demo data (if no upload)", value=True)
-    if uploaded:
-        # save to temp and load
+    if local_path:
+        if Path(local_path).exists():
+            art = file_artifacts(local_path, dashboard.stat_key(Path(local_path)))
+        else:
+            st.sidebar.error(f"Not found: {local_path}")
+    elif uploaded:
+        # save to temp (once per distinct content) and load
+        digest = hashlib.md5(uploaded.getbuffer()).hexdigest()
         tmp_path = Path("tmp_uploaded_data")
         tmp_path.mkdir(exist_ok=True)
-        fpath = tmp_path / uploaded.name
-        with open(fpath, "wb") as f:
-            f.write(uploaded.getbuffer())
-        df = load_local_file(fpath)
+        fpath = tmp_path / f"{digest[:12]}-{uploaded.name}"
+        if not fpath.exists():
+            with open(fpath, "wb") as f:
+                f.write(uploaded.getbuffer())
+        art = file_artifacts(str(fpath), digest)
     elif use_sample:
-        # small demo synthetic dataset if repo has none
         st.sidebar.write("Using generated demo dataset.")
-        # make small synthetic dataframe
-        np.random.seed(1)
-        n = 200
-        df = pd.DataFrame({
-            "match_id": np.arange(n),
-            "date": pd.date_range(end=pd.Timestamp.now(), periods=n).astype(str),
-            "champion": np.random.choice(["Ahri","Yasuo","Lee Sin","Ezreal","Lux"], size=n),
-            "kills": np.random.poisson(4, n),
-            "deaths": np.random.poisson(3, n),
-            "assists": np.random.poisson(5, n),
-            "win": np.random.choice([True, False], n, p=[0.52,0.48]),
-            "gold": np.random.normal(11000, 1500, n).astype(int)
-        })
+        art = demo_artifacts()
 
 else:
     st.sidebar.write("Live fetch selected.")
-    riot_mod = try_import_riot_module()
-    if riot_mod is None:
-        st.sidebar.error("Could not import riot.py from the repo. Make sure riot.py exists and defines functions to fetch matches.")
-    else:
-        st.sidebar.success("riot.py imported.")
     puuid = st.sidebar.text_input("Player PUUID (or leave blank to use saved)", value=os.getenv("PUUID",""))
     riot_key = st.sidebar.text_input("Riot API key (will not be saved by app)", type="password", value=os.getenv("RIOT_API_KEY",""))
     fetch_n = st.sidebar.slider("Num matches to fetch",  min_value=20, max_value=500, value=100, step=20)
     if st.sidebar.button("Fetch matches"):
+        riot_mod = try_import_riot_module()
         if riot_mod is None:
-            st.sidebar.error("riot.py not found. Can't fetch.")
+            st.sidebar.error("Could not import riot.py from the repo. Make sure riot.py exists and defines fetch_matches.")
         elif not puuid or not riot_key:
             st.sidebar.error("Provide PUUID and API key.")
         else:
-            # assume riot_mod has function fetch_matches(puuid, api_key, count)
             try:
-                st.sidebar.info("Requesting matches... this may take a moment.")
-                matches = riot_mod.fetch_matches(puuid, riot_key, count=fetch_n)
+                with st.spinner("Requesting matches... this may take a moment."):
+                    matches = riot_mod.fetch_matches(puuid, riot_key, count=fetch_n)
                 # expect matches as list of dicts or DataFrame
-                if isinstance(matches, pd.DataFrame):
-                    df = matches
-                else:
-                    df = pd.DataFrame(matches)
+                df = matches if isinstance(matches, pd.DataFrame) else pd.DataFrame(matches)
+                # kept across reruns (the button is only True for one run)
+                st.session_state["live_artifacts"] = dashboard.build_artifacts(df)
                 st.sidebar.success(f"Fetched {len(df)} matches.")
             except Exception as e:
                 st.sidebar.error(f"Error fetching: {e}")
+    art = st.session_state.get("live_artifacts")
 
 # -------------------------
 # Main layout
@@ -142,85 +247,140 @@ else:
 st.title("LoL Coach — Hackathon Demo app")
 st.markdown("Quick demo UI for your hackathon analytics project. Use the sidebar to upload data or fetch live matches.")
 
-if df is None:
+if data_source == sources[0] and (LIVE_DIR / "snapshot.json").exists():
+    live_panel()
+
+if art is None:
     st.info("No dataset loaded yet. Upload a CSV/Parquet or use the demo data from the sidebar.")
 else:
-    st.subheader("Dataset preview")
-    st.dataframe(df.head(50), use_container_width=True)
+    import plotly.express as px  # deferred: only needed once there is something to plot
 
-    # smart infer date column
-    date_col = next((c for c in df.columns if "date" in c.lower()), None)
-    if date_col:
-        try:
-            df[date_col] = pd.to_datetime(df[date_col])
-        except Exception:
-            pass
+    summary, recent = art["summary"], art["recent"]
+    st.subheader("Dataset preview")
+    st.dataframe(recent.head(50).drop(columns=[c for c in recent.columns
+                                               if c.startswith(features.HINT_PREFIX)]),
+                 use_container_width=True)
 
     # Summary cards in three columns
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Matches", len(df))
+        st.metric("Matches", summary["matches"])
     with col2:
-        summary = summarize_matches(df)
         wr = summary.get("win_rate")
         st.metric("Win rate", f"{(wr*100):.1f}%" if wr is not None else "N/A")
     with col3:
-        avg_kills = df["kills"].mean() if "kills" in df.columns else None
+        avg_kills = summary.get("avg_kills")
         st.metric("Avg kills", f"{avg_kills:.2f}" if avg_kills is not None else "N/A")
 
     # Champion frequency plot
-    champ_col = next((c for c in df.columns if "champ" in c.lower()), None)
-    if champ_col:
-        champ_counts = (
-        df[champ_col]
-        .value_counts(dropna=False)
-        .rename_axis("champion")     # name the index -> column after reset_index
-        .reset_index(name="count")
-    )
-    fig = px.bar(champ_counts, x="champion", y="count", title="Top champions")
-    st.plotly_chart(fig, use_container_width=True)
+    if len(art["champions"]):
+        fig = px.bar(art["champions"], x="champion", y="games", title="Top champions")
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Filtered breakdown straight from the staged Parquet (pipeline data only)
+    staged_dir = Path("data/staged")
+    if data_source == sources[0] and staged_dir.exists():
+        st.subheader("Champion breakdown")
+        staged_stat = dashboard.stat_key(staged_dir)
+        opts = staged_options(staged_stat)
+        f1, f2, f3, f4 = st.columns(4)
+        patch_sel = f1.multiselect("Patch", opts["patch"])
+        queue_sel = f2.multiselect("Queue", opts["queueId"])
+        champ_sel = f3.multiselect("Champion", opts["championName"])
+        dates = f4.date_input("Date range", opts["dates"], min_value=opts["dates"][0], max_value=opts["dates"][1])
+        start, end = (dates[0], dates[1] + pd.Timedelta(days=1)) if len(dates) == 2 else (None, None)
+        breakdown = champion_breakdown(staged_stat, tuple(champ_sel), tuple(patch_sel), tuple(queue_sel),
+                                       start, end)
+        st.dataframe(breakdown, use_container_width=True, hide_index=True)
+
+    if data_source == sources[0] and staged_dir.exists() and (MATCHUP_DIR / "lane.parquet").exists():
+        # lane matchups / synergies from the precomputed matrices (matchups.py)
+        st.subheader("Counters and synergies")
+        matrix = load_matchups(dashboard.stat_key(MATCHUP_DIR), tuple(patch_sel))
+        m1, m2, m3 = st.columns(3)
+        target = m1.selectbox("Champion", ["-- pick --"] + matrix.champions.tolist())
+        role = m2.selectbox("Lane", ["any", "TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"])
+        min_games = m3.number_input("Min. games", 1, 1000, 5)
+        if target != "-- pick --":
+            c1, c2 = st.columns(2)
+            c1.markdown(f"**Best counters to {target}** (their win rate in lane)")
+            c1.dataframe(matrix.counters(target, None if role == "any" else role, min_games),
+                         use_container_width=True, hide_index=True)
+            c2.markdown(f"**Best allies for {target}**")
+            c2.dataframe(matrix.synergy(target, min_games), use_container_width=True, hide_index=True)
+
     # Win rate over time if date present
-    if date_col:
-        tmp = df.copy()
-        # need a boolean win col
-        win_col = next((c for c in df.columns if c.lower() in ("win","is_win","victory")), None)
-        if win_col:
-            tmp["win_flag"] = tmp[win_col].map(lambda v: 1 if str(v).lower() in ("true","1","win","victory") else 0)
-            ts = tmp.set_index(date_col).resample("7D").win_flag.mean().reset_index()
-            fig2 = px.line(ts, x=date_col, y="win_flag", title="Win rate (7-day rolling bins)")
-            st.plotly_chart(fig2, use_container_width=True)
-
-    # Simple KDA scatter if columns exist
-    if all(x in df.columns for x in ("kills","deaths","assists")):
-        df["kda"] = (df["kills"] + df["assists"]) / df["deaths"].replace(0,1)
-        fig3 = px.scatter(df, x="kda", y="gold" if "gold" in df.columns else "kills",
-                          hover_data=["match_id"] if "match_id" in df.columns else None,
-                          title="KDA vs gold/kills")
+    if len(art["weekly"]):
+        fig2 = px.line(art["weekly"], x="date", y="win_rate", title="Win rate (7-day rolling bins)")
+        st.plotly_chart(fig2, use_container_width=True)
+
+    # Simple KDA scatter if columns exist (sampled for large datasets)
+    sample = art["sample"]
+    if "kda" in sample.columns:
+        fig3 = px.scatter(sample, x="kda", y="gold" if "gold" in sample.columns else "kills",
+                          hover_data=["match_id"] if "match_id" in sample.columns else None,
+                          title="KDA vs gold/kills" + (" (sample)" if len(sample) < summary["matches"] else ""))
         st.plotly_chart(fig3, use_container_width=True)
 
     # Match list + detail
     st.subheader("Match list")
-    if "match_id" in df.columns:
-        match_ids = df["match_id"].astype(str).tolist()
-        sel = st.selectbox("Select a match", ["-- pick --"] + match_ids)
+    index_path = staged_dir / match_index.INDEX_NAME
+    if data_source == sources[0] and index_path.exists():
+        # indexed picker: prefix search + pages, drill-down by row offset / raw-store offset
+        idx = load_match_index(dashboard.stat_key(index_path))
+        q = st.text_input("Search matchId (prefix)", placeholder="e.g. KR_7667")
+        rows = idx.search(q)
+        n_pages = max(1, -(-len(rows) // MATCH_PAGE_SIZE))
+        page = st.number_input(f"Page (of {n_pages:,}; {len(rows):,} matches)", 1, n_pages, 1) - 1
+        listing = idx.page(rows, page, MATCH_PAGE_SIZE)
+        st.dataframe(listing, use_container_width=True, hide_index=True)
+        sel = st.selectbox("Select a match", ["-- pick --"] + listing["matchId"].tolist())
+        if sel and sel != "-- pick --":
+            info = idx.locate(sel)
+            st.markdown(f"### Match {sel}")
+            st.write(f"{info['date']:%Y-%m-%d %H:%M} · queue {info['queueId']} · patch {info['patch']}")
+            roster = idx.participants(sel)
+            flags = features.apply_rules(dashboard.normalize(roster))
+            rules = [r for r in features.load_rules() if r.column in flags.columns]
+            roster["hints"] = [", ".join(r.id for r, hit in zip(rules, row) if hit)
+                               for row in flags[[r.column for r in rules]].to_numpy()]
+            sketch_path = Path("data/processed/rollups/champion_role_sketch.parquet")
+            if sketch_path.exists() and "teamPosition" in roster.columns:
+                # percentile of each player's game among all games on that champion + role
+                pct = load_percentiles(dashboard.stat_key(sketch_path)).rank_frame(roster)
+                roster = roster.join(pct.round(0))
+            # item / spell / rune / champion IDs -> names for this match's patch (static_data.py)
+            import static_data
+            roster = static_data.load(str(info["patch"])).decode_frame(roster)
+            st.dataframe(roster, use_container_width=True, hide_index=True)
+            with st.expander("Hints"):
+                for r in rules:
+                    st.write(f"- **{r.id}**: {r.hint}")
+            store = load_raw_store(dashboard.stat_key(RAW_STORE / "index.tsv"))
+            if sel in store:
+                with st.expander("Raw match JSON"):
+                    st.json(store.get(sel), expanded=False)
+    elif "match_id" in recent.columns:
+        match_ids = recent["match_id"].astype(str)
+        if summary["matches"] > len(recent):
+            st.caption(f"Showing the newest {len(recent):,} of {summary['matches']:,} matches.")
+        sel = st.selectbox("Select a match", ["-- pick --"] + match_ids.tolist())
         if sel and sel != "-- pick --":
-            m = df[df["match_id"].astype(str) == sel].iloc[0]
+            m = recent[(match_ids == sel).to_numpy()].iloc[0]
             st.markdown("### Match details")
             # pretty table of important stats
-            stats = {k: m[k] for k in m.index if k not in ("raw_json",)}
-            st.json(stats)
+            stats = {k: m[k] for k in m.index
+                     if k not in ("raw_json", "win_flag") and not k.startswith(features.HINT_PREFIX)}
+            st.json(pd.Series(stats).to_json(date_format="iso", default_handler=str))
 
-            # coaching suggestions (very simple rule-based)
+            # coaching suggestions: rules.json flags, precomputed for every match
             st.markdown("**Quick coaching hints**")
-            hints = []
-            if "deaths" in m and m["deaths"] >= 6:
-                hints.append("High deaths — play safer in teamfights, ward more, avoid 1v1s when behind.")
-            if "kills" in m and m["kills"] >= 8:
-                hints.append("Good aggression — look to turn kills into objectives (towers, dragons).")
-            if "gold" in m and "minions" in m.index and m["minions"] < 60:
-                hints.append("CS is low — focus on last-hitting and wave management.")
+            if not any(c.startswith(features.HINT_PREFIX) for c in m.index):
+                # artifacts built before the rules existed
+                m = features.apply_rules(recent[(match_ids == sel).to_numpy()]).iloc[0]
+            hints = features.hints(m)
             if not hints:
-                hints.append("No automated tips for this match — add custom logic in riot.py or here.")
+                hints.append("No automated tips for this match — add rules to rules.json.")
             for h in hints:
                 st.write("- " + h)
     else:
@@ -229,9 +389,9 @@ else:
     # Export cleaned dataset
     st.sidebar.subheader("Export / Save")
     if st.sidebar.button("Download cleaned CSV"):
-        csv = df.to_csv(index=False)
+        csv = all_matches(art).drop(columns=["win_flag"], errors="ignore").to_csv(index=False)
         st.sidebar.download_button("Download CSV", data=csv, file_name="cleaned_matches.csv", mime="text/csv")
 
 # Footer / notes
 st.markdown("---")
-st.markdown("**Notes:** This is a demo Streamlit UI. To integrate with your riot.py, ensure riot.py provides a `fetch_matches(puuid, api_key, count)` function that returns a list of dicts or a DataFrame. Keep API keys out of VCS (use .env or secrets).")
+st.markdown("**Notes:** This is a demo Streamlit UI. To integrate with your riot.py, ensure riot.py provides a `fetch_matches(puuid, api_key, count)` function that returns a list of dicts or a DataFrame. Keep API keys out of VCS (use .env or secrets). Refresh the pipeline dashboard with `python dashboard.py`.")
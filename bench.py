@@ -0,0 +1,278 @@
+# bench.py
+"""
+End-to-end pipeline benchmark on synthetic data, without Riot or AWS.
+
+One run generates `--matches` synthetic matches (synth.py), serves them from
+the mock Riot API (mock_riot.py, store-backed) and pushes them through the
+same code riot.py uses, timing each stage:
+
+    generate   synthetic matches -> source raw store
+    ids        by-puuid ID paging for `--page-players` players
+    download   every match through RiotClient + download_matches -> raw store
+    parse      decompress + JSON-parse the whole raw store
+    stage      stage_incremental -> Parquet parts, manifest, match index
+    aggregate  update_partials + summarize (champion summary)
+    upload     S3Uploader into a local S3 stand-in (mock_s3.py)
+
+Each stage reports wall time, items/s, MB/s and the peak RSS of this process
+(sampled from /proc) and, for stages that fork (staging), of its children;
+the request / upload latency histograms recorded by metrics.py are included.
+The report is JSON; `--compare` prints it against an earlier report and
+flags stages more than `--threshold` slower.
+
+    python bench.py --matches 10000
+    python bench.py --matches 100000 --out data/bench/100k.json --compare data/bench/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from aggregates import summarize, update_partials
+from id_paging import page_match_ids
+from metrics import Metrics
+from mock_riot import MockRiotServer
+from mock_s3 import LocalS3
+from ratelimit import RateLimiter
+from raw_store import RawStore, json_loads, store_size
+from riot_client import RiotClient, download_matches
+from s3_upload import S3Uploader
+from staging import stage_incremental
+from synth import MatchGenerator, load_templates, write_store
+
+STAGES = ("generate", "ids", "download", "parse", "stage", "aggregate", "upload")
+MB = 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# ====== MEASUREMENT ======
+def rss_bytes() -> int:
+    """Current resident set size (Linux /proc; peak-so-far elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _children_peak() -> int:
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples RSS on a background thread while the block runs."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+class Bench:
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage; the block fills in r["items"] / r["bytes"]."""
+        r = {"items": 0, "bytes": 0}
+        children = _children_peak()
+        print(f"--- {name} ---")
+        with PeakRSS() as mem:
+            t0 = time.perf_counter()
+            yield r
+            seconds = time.perf_counter() - t0
+        r["seconds"] = round(seconds, 3)
+        r["items_per_s"] = round(r["items"] / seconds, 1) if seconds else None
+        r["mb_per_s"] = round(r["bytes"] / MB / seconds, 2) if seconds and r["bytes"] else None
+        r["peak_rss_mb"] = round(mem.peak / MB, 1)
+        # ru_maxrss of children is a high-water mark over all reaped children
+        after = _children_peak()
+        r["children_peak_rss_mb"] = round(after / MB, 1) if after > children else None
+        self.stages[name] = r
+        print(f"{name}: {r['seconds']:.2f}s, {r['items']} items ({r['items_per_s']}/s)"
+              + (f", {r['mb_per_s']} MB/s" if r["mb_per_s"] else "")
+              + f", peak RSS {r['peak_rss_mb']} MB")
+
+
+def _dir_bytes(paths) -> int:
+    return sum(Path(p).stat().st_size for p in paths if Path(p).exists())
+
+
+# ====== RUN ======
+def run_bench(matches: int = 10_000, players: int = 10_000, page_players: int = 200,
+              templates: str = "data/raw/store", work: Optional[str] = None,
+              workers: int = 8, stage_workers: Optional[int] = None, batch_size: int = 2000,
+              riot_latency: float = 0.0, s3_latency: float = 0.0,
+              s3_bandwidth: Optional[float] = None, seed: int = 0) -> dict:
+    work = Path(work or tempfile.mkdtemp(prefix="lol-bench-"))
+    config = {k: v for k, v in locals().items() if k != "work"}
+    config["work"] = str(work)
+    bench = Bench()
+    metrics = Metrics()     # request / upload latencies and counters of the instrumented code
+
+    gen = MatchGenerator(load_templates(RawStore(templates)), players=players, seed=seed)
+    source = RawStore(work / "source", level=1)
+    with bench.stage("generate") as r:
+        r["items"] = write_store(gen, matches, source)
+        r["bytes"] = store_size(source)
+
+    # no server-side limits: the benchmark measures the pipeline, not Riot's quota
+    server = MockRiotServer(store=source, app_limits="1000000:1", latency=riot_latency).__enter__()
+    try:
+        client = RiotClient("bench", base_url=server.base_url, pool_size=workers,
+                            limiter=RateLimiter("1000000:1"), metrics=metrics)
+        t0 = time.perf_counter()
+        client.match_ids(gen.players[0], count=1)       # builds the server's puuid index
+        config["mock_index_seconds"] = round(time.perf_counter() - t0, 2)
+
+        with bench.stage("ids") as r:
+            for puuid in gen.players[:page_players]:
+                r["items"] += len(page_match_ids(client, puuid))
+            r["requests"] = client.stats["requests"] - 1
+
+        raw = RawStore(work / "raw")
+        with bench.stage("download") as r:
+            ok, failed = download_matches(client, source.ids(), lambda mid, data: raw.append(data),
+                                          workers=workers, progress_every=max(1000, matches // 4))
+            r["items"], r["failed"] = len(ok), len(failed)
+            r["bytes"] = store_size(raw)
+            r["rate_limit_wait_s"] = round(client.limiter.total_wait, 2)
+    finally:
+        server.stop()
+
+    with bench.stage("parse") as r:
+        for blob in raw.iter_raw():
+            json_loads(blob)
+            r["items"] += 1
+            r["bytes"] += len(blob)
+
+    staged, processed = work / "staged", work / "processed"
+    with bench.stage("stage") as r:
+        counts = stage_incremental(raw, staged, processed, batch_size=batch_size,
+                                   workers=stage_workers)
+        r["items"] = counts["participants"]
+        r["matches"] = counts["matches"]
+        r["bytes"] = _dir_bytes(counts["parts"])
+
+    parts = sorted((staged / "participants").glob("part-*.parquet"))
+    with bench.stage("aggregate") as r:
+        partials = update_partials(parts, processed / "champion_partials.parquet")
+        r["groups"] = len(partials)
+        r["items"] = len(summarize(partials))
+        r["bytes"] = _dir_bytes(parts)
+
+    s3 = LocalS3(work / "s3", latency=s3_latency, bandwidth=s3_bandwidth)
+    files = [raw.root / seg for seg in raw.drain_touched()] + [raw.index_path]
+    files += [p for p in staged.rglob("*") if p.is_file()]
+    files += [p for p in processed.rglob("*") if p.is_file()]
+    with bench.stage("upload") as r:
+        uploader = S3Uploader("bench", client=s3, workers=workers, cache_path=None, metrics=metrics)
+        for f in files:
+            uploader.submit(f, f.relative_to(work).as_posix())
+        stats = uploader.close()
+        r["items"], r["bytes"], r["failed"] = stats["uploaded"], stats["bytes"], stats["failed"]
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "orjson": json_loads is not json.loads},
+        "stages": bench.stages,
+        "metrics": metrics.report(),
+    }
+
+
+# ====== COMPARE ======
+def compare(report: dict, baseline: dict, threshold: float = 0.10) -> list:
+    """Print stage-by-stage changes; returns the stages slower than `threshold`."""
+    slower = []
+    print(f"{'stage':<10} {'before s':>9} {'after s':>9} {'change':>8} {'peak MB':>15}")
+    for name in STAGES:
+        new, old = report["stages"].get(name), baseline["stages"].get(name)
+        if not new or not old:
+            continue
+        # compare throughput, so runs of different sizes stay comparable
+        if new["items_per_s"] and old["items_per_s"]:
+            change = old["items_per_s"] / new["items_per_s"] - 1
+        else:
+            change = new["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        flag = ""
+        if change > threshold:
+            slower.append(name)
+            flag = "  SLOWER"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<10} {old['seconds']:>9.2f} {new['seconds']:>9.2f} {change:>+8.0%} "
+              f"{old['peak_rss_mb']:>7.0f}->{new['peak_rss_mb']:<7.0f}{flag}")
+    return slower
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data")
+    ap.add_argument("--matches", type=int, default=10_000)
+    ap.add_argument("--players", type=int, default=10_000, help="synthetic PUUID pool")
+    ap.add_argument("--page-players", type=int, default=200, help="players whose IDs are paged")
+    ap.add_argument("--templates", default="data/raw/store")
+    ap.add_argument("--workers", type=int, default=8, help="download / upload threads")
+    ap.add_argument("--stage-workers", type=int, default=None, help="staging processes")
+    ap.add_argument("--batch-size", type=int, default=2000)
+    ap.add_argument("--riot-latency", type=float, default=0.0, help="seconds per mock API request")
+    ap.add_argument("--s3-latency", type=float, default=0.0, help="seconds per mock S3 request")
+    ap.add_argument("--s3-bandwidth", type=float, default=None, help="mock S3 MB/s per transfer")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--work", help="working directory (default: a temp dir, removed afterwards)")
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--compare", help="earlier JSON report to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged by --compare")
+    args = ap.parse_args()
+
+    work = args.work or tempfile.mkdtemp(prefix="lol-bench-")
+    try:
+        report = run_bench(args.matches, args.players, args.page_players, args.templates, work,
+                           args.workers, args.stage_workers, args.batch_size, args.riot_latency,
+                           args.s3_latency, args.s3_bandwidth, args.seed)
+    finally:
+        if not args.work:
+            shutil.rmtree(work, ignore_errors=True)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_suffix(".tmp")
+        tmp.write_text(json.dumps(report, indent=2))
+        tmp.replace(out)
+        print("Report:", out)
+    else:
+        print(json.dumps(report["stages"], indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(report, json.load(f), args.threshold)
+        if slower:
+            raise SystemExit("Slower than the baseline: " + ", ".join(slower))
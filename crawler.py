@@ -0,0 +1,281 @@
+# crawler.py
+"""
+Multi-player crawl scheduler.
+
+One match appears under all ten participants, so crawling a ladder player by
+player re-downloads most matches many times. The Crawler keeps a single
+deduplicated frontier of match IDs across every tracked PUUID, gives each
+routing region its own RiotClient (and therefore its own rate budget, as Riot
+limits are per region), and fetches every match exactly once.
+
+Progress (players listed, pending / done / failed match IDs) is persisted to a
+JSON state file after every batch, so a crashed crawl resumes where it left off.
+A player counts as listed only once their last ID page came back cleanly; a
+failed page leaves them to be paged again on the next run.
+
+    python crawler.py --puuid <PUUID> --puuid <PUUID> --routing asia
+    python crawler.py --seed-from data/raw/store --max-players 200
+"""
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from raw_store import RawStore
+from riot_client import RiotClient, download_matches
+
+# platform prefix of a matchId ("KR_7667898191") -> regional routing value
+PLATFORM_ROUTING = {
+    "NA1": "americas", "BR1": "americas", "LA1": "americas", "LA2": "americas",
+    "KR": "asia", "JP1": "asia",
+    "EUN1": "europe", "EUW1": "europe", "TR1": "europe", "RU": "europe", "ME1": "europe",
+    "OC1": "sea", "PH2": "sea", "SG2": "sea", "TH2": "sea", "TW2": "sea", "VN2": "sea",
+}
+
+DEFAULT_STATE_PATH = Path("data/raw/index/crawl_state.json")
+
+
+def routing_for_match(match_id: str, default: str = "asia") -> str:
+    return PLATFORM_ROUTING.get(match_id.split("_", 1)[0].upper(), default)
+
+
+def write_json_atomic(path: Path, obj) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def iter_match_files(match_dir) -> Iterable[dict]:
+    for f in sorted(Path(match_dir).glob("*.json")):
+        with open(f) as fp:
+            yield json.load(fp)
+
+
+def seed_players(source, routing: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(puuid, routing) for every participant of already-downloaded matches.
+
+    `source` is a RawStore or a directory of <matchId>.json files.
+    """
+    matches = source.iter_matches() if isinstance(source, RawStore) else iter_match_files(source)
+    players = {}
+    for m in matches:
+        meta = m.get("metadata", {})
+        r = routing or routing_for_match(meta.get("matchId", ""))
+        for puuid in meta.get("participants", []):
+            players.setdefault(puuid, r)
+    return list(players.items())
+
+
+class CrawlState:
+    """Persisted frontier. Match IDs live in exactly one of pending/done/failed."""
+
+    def __init__(self, path: Path = DEFAULT_STATE_PATH):
+        self.path = Path(path)
+        self.players: Dict[str, dict] = {}      # puuid -> {"routing", "listed"}
+        self.pending: Dict[str, str] = {}       # matchId -> routing (insertion ordered)
+        self.done = set()
+        self.failed: Dict[str, str] = {}        # matchId -> routing it was queued under
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                raw = json.load(f)
+            self.players = raw.get("players", {})
+            self.pending = raw.get("pending", {})
+            self.done = set(raw.get("done", []))
+            failed = raw.get("failed", {})
+            if isinstance(failed, list):        # older state files kept only the IDs
+                failed = {mid: routing_for_match(mid) for mid in failed}
+            self.failed = failed
+
+    def save(self) -> None:
+        # region threads share one tmp file, so the write is under the lock too
+        with self._lock:
+            snapshot = {"players": {k: dict(v) for k, v in self.players.items()},
+                        "pending": dict(self.pending),
+                        "done": sorted(self.done), "failed": dict(self.failed)}
+            write_json_atomic(self.path, snapshot)
+
+    def add_player(self, puuid: str, routing: str) -> bool:
+        with self._lock:
+            if puuid in self.players:
+                return False
+            self.players[puuid] = {"routing": routing, "listed": False}
+            return True
+
+    def mark_listed(self, puuid: str) -> None:
+        with self._lock:
+            self.players[puuid]["listed"] = True
+
+    def add_matches(self, match_ids: Iterable[str], routing: str) -> int:
+        """Queue unseen IDs; returns how many were new."""
+        added = 0
+        with self._lock:
+            for mid in match_ids:
+                if mid in self.done or mid in self.pending or mid in self.failed:
+                    continue
+                self.pending[mid] = routing
+                added += 1
+        return added
+
+    def mark(self, match_id: str, ok: bool) -> None:
+        with self._lock:
+            routing = self.pending.pop(match_id, None)
+            if ok:
+                self.done.add(match_id)
+            else:
+                self.failed[match_id] = routing or routing_for_match(match_id)
+
+    def pending_for(self, routing: str) -> List[str]:
+        with self._lock:
+            return [m for m, r in self.pending.items() if r == routing]
+
+    def unlisted_for(self, routing: str) -> List[str]:
+        with self._lock:
+            return [p for p, v in self.players.items()
+                    if v["routing"] == routing and not v["listed"]]
+
+    def retry_failed(self) -> None:
+        with self._lock:
+            self.pending.update(self.failed)
+            self.failed.clear()
+
+
+class Crawler:
+    def __init__(self, api_key: str, state: Optional[CrawlState] = None,
+                 store: Optional[RawStore] = None, workers: int = 8,
+                 batch_size: int = 100, base_urls: Optional[Dict[str, str]] = None,
+                 on_match=None):
+        self.api_key = api_key
+        self.state = state or CrawlState()
+        self.store = store if store is not None else RawStore()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.base_urls = base_urls or {}    # routing -> URL override (mock server)
+        self.on_match = on_match            # extra hook, e.g. S3 upload
+        self.clients: Dict[str, RiotClient] = {}
+
+    def client(self, routing: str) -> RiotClient:
+        if routing not in self.clients:
+            self.clients[routing] = RiotClient(self.api_key, routing=routing,
+                                               base_url=self.base_urls.get(routing),
+                                               pool_size=self.workers)
+        return self.clients[routing]
+
+    def add_players(self, players: Iterable[Union[str, Tuple[str, str]]],
+                    routing: str = "asia") -> int:
+        added = 0
+        for p in players:
+            puuid, r = (p, routing) if isinstance(p, str) else p
+            added += self.state.add_player(puuid, r)
+        self.state.save()
+        return added
+
+    def _already_stored(self) -> None:
+        # matches downloaded before the crawler existed count as done
+        for mid in list(self.state.pending):
+            if mid in self.store:
+                self.state.mark(mid, True)
+        self.state.done.update(self.store.ids())
+
+    def list_ids(self, routing: str, start_time: Optional[int], end_time: Optional[int],
+                 queue: Optional[int] = None) -> None:
+        client = self.client(routing)
+        for puuid in self.state.unlisted_for(routing):
+            start, new = 0, 0
+            while True:
+                ids = client.match_ids(puuid, start=start, count=100,
+                                       start_time=start_time, end_time=end_time, queue=queue)
+                if ids is None:
+                    break
+                new += self.state.add_matches(ids, routing)
+                if len(ids) < 100:
+                    break
+                start += 100
+            # only a clean last page completes the listing; after a failed one the
+            # player stays unlisted and is paged again on the next run
+            if ids is not None:
+                self.state.mark_listed(puuid)
+            self.state.save()
+            print(f"[{routing}] {puuid[:12]}…: {new} new match IDs "
+                  f"(frontier {len(self.state.pending)})"
+                  + ("" if ids is not None else f"; listing failed at start={start}, will retry"))
+
+    def download(self, routing: str) -> None:
+        client = self.client(routing)
+
+        def on_match(match_id, data):
+            self.store.append(data)
+            if self.on_match:
+                self.on_match(match_id, data)
+
+        pending = self.state.pending_for(routing)
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            ok, failed = download_matches(client, batch, on_match, workers=self.workers,
+                                          progress_every=self.batch_size)
+            for mid in ok:
+                self.state.mark(mid, True)
+            for mid in failed:
+                self.state.mark(mid, False)
+            self.state.save()
+            print(f"[{routing}] downloaded {len(self.state.done)} total, "
+                  f"{len(self.state.pending_for(routing))} pending")
+
+    def run(self, start_time: Optional[int] = None, end_time: Optional[int] = None,
+            queue: Optional[int] = None) -> dict:
+        """List + download every region in parallel, one thread per routing value."""
+        self._already_stored()
+        routings = sorted({v["routing"] for v in self.state.players.values()}
+                          | set(self.state.pending.values()))
+
+        def region(routing):
+            self.list_ids(routing, start_time, end_time, queue)
+            self.download(routing)
+
+        threads = [threading.Thread(target=region, args=(r,), name=f"crawl-{r}")
+                   for r in routings]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.state.save()
+        return {"players": len(self.state.players), "done": len(self.state.done),
+                "pending": len(self.state.pending), "failed": len(self.state.failed)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Crawl matches for many players, each match once")
+    ap.add_argument("--puuid", action="append", default=[], help="player PUUID (repeatable)")
+    ap.add_argument("--routing", default="asia", help="routing for --puuid players")
+    ap.add_argument("--seed-from", help="seed players from a raw store or a directory of match JSON")
+    ap.add_argument("--max-players", type=int, default=None)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--queue", type=int, default=None, help="e.g. 420 for ranked solo")
+    ap.add_argument("--state", default=str(DEFAULT_STATE_PATH))
+    ap.add_argument("--store", default="data/raw/store")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--retry-failed", action="store_true")
+    args = ap.parse_args()
+
+    crawler = Crawler(os.environ["RIOT_API_KEY"], state=CrawlState(args.state),
+                      store=RawStore(args.store), workers=args.workers)
+    players = [(p, args.routing) for p in args.puuid]
+    if args.seed_from:
+        src = Path(args.seed_from)
+        players += seed_players(RawStore(src) if (src / "index.tsv").exists() else src)
+    if args.max_players:
+        players = players[:args.max_players]
+    print("New players:", crawler.add_players(players))
+    if args.retry_failed:
+        crawler.state.retry_failed()
+
+    end_dt = datetime.now(timezone.utc)
+    start_dt = end_dt - timedelta(days=args.days)
+    print(crawler.run(int(start_dt.timestamp()), int(end_dt.timestamp()), args.queue))
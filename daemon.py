@@ -0,0 +1,327 @@
+# daemon.py
+"""
+Long-running ingestion: follow a set of players and fold each finished game
+into the staged tables and aggregates as soon as it shows up.
+
+Every step, the players whose poll is due are asked for match IDs since
+their high-water mark (id_paging; one request per player when nothing new),
+failed downloads whose back-off is over are added (journal.py), and the new
+matches go through the same incremental path as riot.py, for just those
+matches:
+
+    download -> raw store (+ journal)    -> stage_incremental (one small part file)
+    -> champion partials, rollups, matchups (folded in, no rebuild)
+    -> lake.sync / compact               -> live feed + snapshot (live_feed.py)
+
+The small staged parts are merged once staging.COMPACT_MIN_PARTS of them
+pile up (staging.compact_parts, at the start of a step), so data/staged stays
+at a few dozen files however long the daemon runs.
+
+The poll interval is derived from the rate budget: polling may use at most
+POLL_SHARE of the key's sustained rate (the tightest X-App-Rate-Limit
+window), the rest stays for downloads, so adding players stretches the
+interval instead of starving the downloader. Polls are spread over the
+interval rather than bunched together.
+
+app.py follows data/live/snapshot.json and shows new games (and reruns its
+staged-data views) within seconds of the step that ingested them. The full
+dashboard artifacts are rebuilt at most every DASHBOARD_EVERY seconds.
+
+Everything the batch run uploads goes to S3 the same way, except the flat
+CSV exports (whole-file rewrites; left to riot.py). Against the local
+stand-ins, no key and no AWS needed:
+
+    python mock_riot.py --store /tmp/synth/store --port 8080 --limits 1000:1 &
+    python daemon.py --base-url http://127.0.0.1:8080 --s3-root /tmp/s3 --puuid <PUUID>
+
+    python daemon.py --players data/live/players.txt     # one PUUID per line
+    python daemon.py --once                              # one step (cron / tests)
+"""
+
+import argparse
+import signal
+import threading
+import time
+import traceback
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import riot
+from dashboard import build_dashboard, normalize
+from features import apply_rules, hints, load_rules
+from id_paging import HighWaterMarks, merge_index, page_match_ids
+from journal import Journal
+from live_feed import LIVE_DIR, LiveFeed
+from ratelimit import RateLimiter, parse_limits
+from raw_store import RawStore
+from riot_client import RiotClient, download_matches
+
+POLL_INTERVAL = 60.0      # minimum seconds between two polls of one player
+POLL_SHARE = 0.25         # at most this share of the rate limit goes to polling
+LOOKBACK_DAYS = 3.0       # first poll of a player without a high-water mark
+DASHBOARD_EVERY = 300.0   # seconds between full dashboard rebuilds (0: every step)
+ERROR_WAIT = 30.0         # pause after a failed step
+
+
+def poll_interval(limiter: RateLimiter, players: int, minimum: float = POLL_INTERVAL,
+                  share: float = POLL_SHARE) -> float:
+    """Seconds between polls of one player so that polling stays within `share` of the budget."""
+    sustained = min(count / seconds for count, seconds in parse_limits(limiter.limits))
+    return max(minimum, players / (share * sustained))
+
+
+def read_players(path) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def match_events(matches: Iterable[dict], players: Iterable[str]) -> List[dict]:
+    """One feed event per tracked player per match, with the coaching hints that fire."""
+    players = set(players)
+    rows = []
+    for m in matches:
+        for p in m.get("metadata", {}).get("participants", []):
+            row = riot.player_row(m, p) if p in players else None
+            if row is not None:
+                rows.append(dict(row, puuid=p))
+    if not rows:
+        return []
+    flags = apply_rules(normalize(pd.DataFrame(rows)))
+    rules = load_rules()
+    events = []
+    for row, (_, f) in zip(rows, flags.iterrows()):
+        events.append({
+            "matchId": row["match_id"], "puuid": row["puuid"], "date": row["date"].isoformat(),
+            "championName": row["champion"], "teamPosition": row["position"],
+            "queueId": row["queueId"], "win": bool(row["win"]),
+            "kills": row["kills"], "deaths": row["deaths"], "assists": row["assists"],
+            "kda": round(float(f["kda"]), 2), "hints": hints(f, rules),
+        })
+    return events
+
+
+class Daemon:
+    def __init__(self, client: RiotClient, players: Iterable[str], store: Optional[RawStore] = None,
+                 journal: Optional[Journal] = None, hwm: Optional[HighWaterMarks] = None,
+                 uploader=None, live_dir=LIVE_DIR, interval: Optional[float] = None,
+                 lookback_days: float = LOOKBACK_DAYS, dashboard_every: float = DASHBOARD_EVERY,
+                 players_file=None):
+        self.client = client
+        self.store = store if store is not None else RawStore(riot.RAW_STORE)
+        self.journal = journal if journal is not None else Journal(riot.JOURNAL_PATH)
+        self.journal.sync_store(self.store)
+        self.hwm = hwm if hwm is not None else HighWaterMarks()
+        self.uploader = uploader       # s3_upload.S3Uploader (or None: local only)
+        self.feed = LiveFeed(live_dir)
+        self.lookback_days = lookback_days
+        self.dashboard_every = dashboard_every
+        self.players_file = Path(players_file) if players_file else None
+        self._players_stat = None
+        self._fixed_interval = interval
+        self._base_players = list(players)     # given directly; the file's are added to these
+        self.players: List[str] = []
+        self.next_poll: Dict[str, float] = {}
+        self._listed = set()           # players whose first listing ran (only their marks may move)
+        self.set_players(players)
+        self.stats = {"steps": 0, "polls": 0, "matches": 0, "errors": 0}
+        self._dashboard_at = 0.0
+        self._dirty = False            # staged data newer than the dashboard artifacts
+        self._stop = threading.Event()
+
+    # --- players / schedule ---
+    def set_players(self, players: Iterable[str]) -> None:
+        players = list(dict.fromkeys(players))
+        new = [p for p in players if p not in self.next_poll]
+        self.players = players
+        self.interval = self._fixed_interval or poll_interval(self.client.limiter, len(players))
+        now = time.time()
+        # spread the new players' first polls over one interval
+        for i, p in enumerate(new):
+            self.next_poll[p] = now + i * self.interval / max(1, len(new))
+        self.next_poll = {p: self.next_poll[p] for p in players}
+
+    def _reload_players(self) -> bool:
+        if self.players_file is None or not self.players_file.exists():
+            return False
+        st = self.players_file.stat()
+        if (st.st_size, st.st_mtime_ns) == self._players_stat:
+            return False
+        self._players_stat = (st.st_size, st.st_mtime_ns)
+        self.set_players(self._base_players + read_players(self.players_file))
+        print(f"Tracking {len(self.players)} players, polling each every {self.interval:.0f}s")
+        return True
+
+    def poll(self, puuid: str) -> List[str]:
+        start = self.hwm.start_time(puuid)
+        if start is None:
+            start = int(time.time() - self.lookback_days * 86400)
+        self.stats["polls"] += 1
+        ids = page_match_ids(self.client, puuid, start_time=start)
+        if puuid not in self._listed:
+            # first full listing: games already stored (through other players) now set
+            # the mark; the rest are downloaded in this step and observed then
+            for match_id in ids:
+                if match_id in self.store:
+                    self.hwm.observe(self.store.get(match_id), [puuid])
+            self._listed.add(puuid)
+        return ids
+
+    # --- one step ---
+    def step(self, now: Optional[float] = None) -> dict:
+        self._reload_players()
+        now = time.time() if now is None else now
+        ids = []
+        for p in self.players:
+            if self.next_poll[p] <= now:
+                ids += self.poll(p)
+                self.next_poll[p] = now + self.interval
+        ids += self.journal.due()       # failed downloads whose back-off is over
+        matches = self.ingest(list(dict.fromkeys(ids)))
+        if self._dirty and time.time() - self._dashboard_at >= self.dashboard_every:
+            build_dashboard("data/staged")
+            self._dashboard_at, self._dirty = time.time(), False
+        self.stats["steps"] += 1
+        self.stats["matches"] += len(matches)
+        return {"ids": len(ids), "matches": len(matches), "seq": self.feed.seq}
+
+    def ingest(self, ids: List[str]) -> List[dict]:
+        """Download, stage and aggregate the matches of `ids` not stored yet; publish them."""
+        todo = [m for m in ids if m not in self.store]
+        if not todo:
+            return []
+        self.journal.queue(todo)
+        due = set(self.journal.due())
+        todo = [m for m in todo if m in due]
+        merge_index(todo, riot.INDEX_PATH)
+        matches, lock = [], threading.Lock()
+
+        def on_match(match_id, data):
+            self.journal.mark([match_id], "fetched")
+            self.store.append(data)
+            # a player not listed yet keeps no mark, so the lookback still covers their older games
+            self.hwm.observe(data, self._listed)
+            self.journal.mark([match_id], "written")
+            with lock:
+                matches.append(data)
+
+        download_matches(self.client, todo, on_match, workers=riot.DOWNLOAD_WORKERS,
+                         on_failure=self.journal.fail)
+        self.hwm.save()
+        if not matches:
+            return []
+        errors_before = len(self.uploader.errors) if self.uploader is not None else 0
+        seg_ids = defaultdict(list)
+        for m in matches:
+            mid = m["metadata"]["matchId"]
+            seg_ids[self.store.index[mid].segment].append(mid)
+        for seg in sorted(set(self.store.drain_touched()) | set(seg_ids)):
+            self._upload(self.store.root / seg, f"raw/store/{seg}")
+        self._upload(self.store.index_path, "raw/store/index.tsv")
+
+        # the same incremental stages as riot.py, over this step's matches only
+        counts = riot.stage(self.store, self._upload, delete=self._delete, exports=False)
+        self.journal.mark(counts["ids"], "staged")
+        riot.champion_summary(self._upload, delete=self._delete)
+        self._dirty = True
+
+        seq = self.feed.publish(match_events(matches, self.players),
+                                journal=self.journal.stats(), staged_total=counts["staged_total"],
+                                players_tracked=len(self.players))
+        print(f"Published {len(matches)} new matches (feed seq {seq})")
+        for path in (self.feed.feed_path, self.feed.snapshot_path):
+            self._upload(path, f"live/{path.name}")
+
+        if self.uploader is not None:
+            self.uploader.wait()
+            failed = {k for k, _ in self.uploader.errors[errors_before:]}
+            self.journal.mark([m for seg, mids in seg_ids.items() if f"raw/store/{seg}" not in failed
+                               for m in mids], "uploaded")
+        return matches
+
+    def _upload(self, local_path, key: str) -> None:
+        if self.uploader is not None:
+            self.uploader.submit(str(local_path), key)
+
+    def _delete(self, keys: List[str]) -> None:
+        if self.uploader is not None:
+            self.uploader.delete(keys)
+
+    # --- loop ---
+    def stop(self, *_) -> None:
+        self._stop.set()
+
+    def run(self, max_steps: Optional[int] = None) -> dict:
+        """Step until stop() (SIGINT / SIGTERM) or `max_steps`."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        if not self._reload_players():
+            print(f"Tracking {len(self.players)} players, polling each every {self.interval:.0f}s")
+        steps = 0
+        while not self._stop.is_set():
+            try:
+                self.step()
+                wait = min(self.next_poll.values(), default=time.time() + self.interval) - time.time()
+            except Exception:
+                # a bad step (network, disk) must not end the daemon
+                self.stats["errors"] += 1
+                traceback.print_exc()
+                wait = ERROR_WAIT
+            steps += 1
+            if max_steps is not None and steps >= max_steps:
+                break
+            self._stop.wait(min(max(wait, 0.5), self.interval))
+        self.hwm.save()
+        return dict(self.stats)
+
+    def close(self) -> None:
+        self.journal.close()
+        if self.uploader is not None:
+            print("S3 uploads:", self.uploader.close())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Streaming ingestion daemon")
+    ap.add_argument("--puuid", action="append", default=[], help="player to follow (repeatable)")
+    ap.add_argument("--players", help="file with one PUUID per line (re-read when it changes)")
+    ap.add_argument("--interval", type=float, help="seconds between polls of one player "
+                                                    "(default: from the rate budget)")
+    ap.add_argument("--lookback-days", type=float, default=LOOKBACK_DAYS)
+    ap.add_argument("--dashboard-every", type=float, default=DASHBOARD_EVERY)
+    ap.add_argument("--once", action="store_true", help="run a single step and exit")
+    ap.add_argument("--max-steps", type=int)
+    ap.add_argument("--base-url", help="API base URL, e.g. a mock_riot.py server")
+    ap.add_argument("--limits", help="app rate limits, e.g. 20:1,100:120 (default: the key's)")
+    ap.add_argument("--s3-root", help="upload into a local directory (mock_s3.LocalS3) instead of S3")
+    ap.add_argument("--no-upload", action="store_true")
+    ap.add_argument("--live", default=str(LIVE_DIR))
+    args = ap.parse_args()
+
+    players = args.puuid or ([] if args.players else [riot.PUUID])
+    client = RiotClient(riot.RIOT_API_KEY, routing=riot.ROUTING, base_url=args.base_url,
+                        limiter=RateLimiter(args.limits) if args.limits else None,
+                        pool_size=riot.DOWNLOAD_WORKERS)
+    uploader = None
+    if not args.no_upload:
+        from s3_upload import S3Uploader
+        s3 = None
+        if args.s3_root:
+            from mock_s3 import LocalS3
+            s3 = LocalS3(args.s3_root)
+        uploader = S3Uploader(riot.S3_BUCKET, client=s3, workers=riot.UPLOAD_WORKERS,
+                              region_name=riot.AWS_REGION)
+    daemon = Daemon(client, players, uploader=uploader, live_dir=args.live,
+                    interval=args.interval, lookback_days=args.lookback_days,
+                    dashboard_every=args.dashboard_every, players_file=args.players)
+    try:
+        if args.once:
+            # one step with every player due (their first polls are otherwise spread out)
+            daemon.step(now=float("inf"))
+            print(daemon.stats)
+        else:
+            print(daemon.run(args.max_steps))
+    finally:
+        daemon.close()
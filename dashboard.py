@@ -0,0 +1,206 @@
+# dashboard.py
+"""
+Small precomputed tables behind app.py's dashboard.
+
+The app used to recompute everything from the full frame on every Streamlit
+rerun. Instead, build_artifacts() reduces a match-level frame once to:
+
+    summary     totals for the metric cards (dict)
+    champions   games / wins / mean K-D-A / gold per champion
+    weekly      games / wins / win rate per 7-day bin
+    matches     one row per match with normalized columns (match_id, date,
+                champion, kills, deaths, assists, win, gold, minions, kda) and
+                the coaching-rule flags hint_<id> (features.apply_rules)
+    recent      the newest RECENT_ROWS rows of `matches` (preview, match picker)
+    sample      at most SAMPLE_ROWS rows of `matches` for the scatter plot
+
+The pipeline writes them to data/dashboard/ from the staged tables
+(`python dashboard.py`, also run by riot.py); the app computes the same
+artifacts for uploaded files, cached on the file's content hash.
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES, apply_rules, compile_expr, feature, load_rules
+
+DASHBOARD_DIR = Path("data/dashboard")
+SAMPLE_ROWS = 5000
+RECENT_ROWS = 1000
+TABLES = ("champions", "weekly", "recent", "sample", "matches")
+
+WIN_COLUMNS = ("win", "is_win", "victory", "result")
+WIN_VALUES = ("true", "1", "win", "victory")
+
+
+# ====== NORMALIZE ======
+def _find(df: pd.DataFrame, names=(), contains: Optional[str] = None) -> Optional[str]:
+    for c in df.columns:
+        if c.lower() in names or (contains and contains in c.lower()):
+            return c
+    return None
+
+
+def win_flag(s: pd.Series) -> pd.Series:
+    """1/0 per row from a bool, 0/1 or 'Win'/'Victory'/'True' column (vectorized)."""
+    if pd.api.types.is_bool_dtype(s):
+        return s.fillna(False).astype("int8")
+    return s.astype("string").str.lower().isin(WIN_VALUES).astype("int8")
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Map flexible input column names onto the app's match columns (best effort)."""
+    out = df.copy()
+    renames = {}
+    for target, col in (("champion", _find(df, contains="champ")),
+                        ("date", _find(df, contains="date")),
+                        ("match_id", _find(df, ("match_id", "matchid")))):
+        if col is not None and col != target and target not in df.columns:
+            renames[col] = target
+    out = out.rename(columns=renames)
+    if "gold" not in out.columns and "goldEarned" in out.columns:
+        out["gold"] = out["goldEarned"]
+    if "minions" not in out.columns and "totalMinionsKilled" in out.columns:
+        out["minions"] = out["totalMinionsKilled"].fillna(0)
+        if "neutralMinionsKilled" in out.columns:
+            out["minions"] += out["neutralMinionsKilled"].fillna(0)
+    if "date" in out.columns and not pd.api.types.is_datetime64_any_dtype(out["date"]):
+        out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    win_col = _find(out, WIN_COLUMNS)
+    if win_col is not None:
+        out["win_flag"] = win_flag(out[win_col])
+    if all(c in out.columns for c in ("kills", "deaths", "assists")):
+        out["kda"] = feature(out, "KDA_ratio").astype("float32")
+    return out
+
+
+def input_columns(names) -> list:
+    """The columns of a file with `names` that normalize() and the rules read.
+
+    Loaders read only these (column projection); the rest never leaves disk.
+    """
+    wanted = {"kills", "deaths", "assists", "gold", "goldEarned", "minions",
+              "totalMinionsKilled", "neutralMinionsKilled"}
+    wanted |= compile_expr(FEATURES["KDA_ratio"][0]).columns
+    for rule in load_rules():
+        wanted |= rule.when.columns
+    return [c for c in names
+            if c in wanted or "champ" in c.lower() or "date" in c.lower()
+            or c.lower() in ("match_id", "matchid") or c.lower() in WIN_COLUMNS]
+
+
+# ====== BUILD ======
+def build_artifacts(df: pd.DataFrame) -> Dict[str, object]:
+    """Match-level frame (any of the app's accepted layouts) -> dashboard artifacts."""
+    m = apply_rules(normalize(df))     # hint_<id> flags for every row, one pass per rule
+    has_win = "win_flag" in m.columns
+    summary = {
+        "matches": int(len(m)),
+        "win_rate": float(m["win_flag"].mean()) if has_win and len(m) else None,
+        "avg_kills": float(m["kills"].mean()) if "kills" in m.columns and len(m) else None,
+        "columns": list(df.columns),
+    }
+
+    champions = pd.DataFrame()
+    if "champion" in m.columns:
+        agg = {"games": ("champion", "size")}
+        if has_win:
+            agg["wins"] = ("win_flag", "sum")
+        for c in ("kills", "deaths", "assists", "gold", "kda"):
+            if c in m.columns:
+                agg[c] = (c, "mean")
+        champions = (m.assign(champion=m["champion"].astype("string").fillna("<NA>"))
+                     .groupby("champion", sort=False).agg(**agg)
+                     .sort_values("games", ascending=False).reset_index())
+
+    weekly = pd.DataFrame()
+    if "date" in m.columns and has_win and m["date"].notna().any():
+        bins = m[["date", "win_flag"]].dropna(subset=["date"]).set_index("date").sort_index()
+        weekly = bins.resample("7D")["win_flag"].agg(["size", "sum"])
+        weekly.columns = ["games", "wins"]
+        weekly["win_rate"] = weekly["wins"] / weekly["games"].replace(0, np.nan)
+        weekly = weekly.reset_index()
+
+    if "date" in m.columns:
+        # newest first, so the app's match picker is a head() slice
+        m = m.sort_values("date", ascending=False, ignore_index=True)
+    sample = m.sample(SAMPLE_ROWS, random_state=0) if len(m) > SAMPLE_ROWS else m
+    return {"summary": summary, "champions": champions, "weekly": weekly,
+            "recent": m.head(RECENT_ROWS), "sample": sample, "matches": m}
+
+
+def staged_frame(staged_dir="data/staged") -> pd.DataFrame:
+    """Participants joined with match dates, in the app's match-level columns."""
+    import pyarrow.parquet as pq
+
+    staged_dir = Path(staged_dir)
+    # incremental part directories, else the single-file layout
+    p_src = staged_dir / "participants"
+    m_src = staged_dir / "matches"
+    if not p_src.is_dir():
+        p_src, m_src = staged_dir / "participants.parquet", staged_dir / "matches.parquet"
+    p_cols = ["matchId", "championName", "teamId", "queueId", "patch", "gameDuration", "win",
+              "kills", "deaths", "assists", "goldEarned", "totalMinionsKilled",
+              "neutralMinionsKilled", "visionScore", "totalDamageDealtToChampions"]
+    names = pq.read_schema(next(p_src.glob("part-*.parquet")) if p_src.is_dir() else p_src).names
+    p = pq.read_table(p_src, columns=[c for c in p_cols if c in names]).to_pandas()
+    dates = pq.read_table(m_src, columns=["matchId", "gameCreation"]).to_pandas()
+    dates["matchId"] = dates["matchId"].astype(str)
+    p["matchId"] = p["matchId"].astype(str)
+    df = p.merge(dates, on="matchId", how="left")
+    df["date"] = pd.to_datetime(df.pop("gameCreation"), unit="ms")
+    return df.rename(columns={"matchId": "match_id", "championName": "champion"})
+
+
+# ====== PERSISTENCE ======
+def save_artifacts(artifacts: Dict[str, object], out_dir=DASHBOARD_DIR) -> None:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in TABLES:
+        tmp = out_dir / f"{name}.parquet.tmp"
+        artifacts[name].to_parquet(tmp, index=False)
+        tmp.replace(out_dir / f"{name}.parquet")
+    # summary last: its presence marks a complete set
+    tmp = out_dir / "summary.json.tmp"
+    with open(tmp, "w") as f:
+        json.dump(artifacts["summary"], f)
+    tmp.replace(out_dir / "summary.json")
+
+
+def load_artifacts(out_dir=DASHBOARD_DIR, tables=TABLES[:-1]) -> Dict[str, object]:
+    """Read the saved artifacts; the full `matches` table only when asked for."""
+    out_dir = Path(out_dir)
+    with open(out_dir / "summary.json") as f:
+        artifacts = {"summary": json.load(f)}
+    for name in tables:
+        artifacts[name] = pd.read_parquet(out_dir / f"{name}.parquet")
+    return artifacts
+
+
+def build_dashboard(staged_dir="data/staged", out_dir=DASHBOARD_DIR) -> Dict[str, object]:
+    artifacts = build_artifacts(staged_frame(staged_dir))
+    save_artifacts(artifacts, out_dir)
+    return artifacts
+
+
+# ====== CACHE KEY ======
+def stat_key(path) -> str:
+    """Cheap change marker (size + mtime) for a file or every file in a directory."""
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    return "|".join(f"{p.name}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in files)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build the app's dashboard artifacts from staged tables")
+    ap.add_argument("--staged", default="data/staged")
+    ap.add_argument("--out", default=str(DASHBOARD_DIR))
+    args = ap.parse_args()
+    a = build_dashboard(args.staged, args.out)
+    print(f"{a['summary']['matches']} rows -> {len(a['champions'])} champions, "
+          f"{len(a['weekly'])} weeks -> {args.out}")
@@ -0,0 +1,290 @@
+# features.py
+"""
+Declarative derived metrics and coaching rules, evaluated as vectorized
+column expressions.
+
+Every derived column is defined once, here, as an expression over other
+columns, and evaluated over whole columns at a time (numpy) wherever it is
+needed:
+
+    FEATURES          per-participant features stored in the staged tables;
+                      staging evaluates them on every record batch, and the
+                      app's `kda` is FEATURES["KDA_ratio"]
+    SUMMARY_FEATURES  per-champion columns of champion_summary.csv, derived
+                      from the aggregated means
+
+Coaching rules live in rules.json (`{"rules": [{"id", "when", "hint"}]}`).
+apply_rules() evaluates every rule over a frame in one pass and stores the
+outcome as boolean `hint_<id>` columns. The dashboard artifacts carry them,
+so every match has its hints precomputed. A rule whose columns are missing
+from a frame is skipped.
+
+Expressions are Python syntax restricted to column names, numbers,
++ - * / // % **, comparisons, and / or / not (also & | ~), and the helpers
+nonzero(x) (0 -> 1, for safe divisions), fill(x, v), abs, min and max.
+Missing values propagate through arithmetic and make comparisons False.
+
+    python features.py check                   # validate rules.json
+    python features.py hints --staged data/staged
+"""
+
+import argparse
+import ast
+import json
+import operator
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+RULES_PATH = Path(__file__).with_name("rules.json")
+HINT_PREFIX = "hint_"
+
+# name -> (expression, storage type in the staged participants table)
+FEATURES: Dict[str, Tuple[str, pa.DataType]] = {
+    "KDA_ratio": ("(kills + assists) / nonzero(deaths)", pa.float32()),
+    "CS_per_min": ("totalMinionsKilled / (nonzero(timePlayed) / 60)", pa.float32()),
+    "CS_per_game": ("totalMinionsKilled + neutralMinionsKilled", pa.int16()),
+    "Gold_efficiency": ("goldSpent / nonzero(goldEarned)", pa.float32()),
+    "DMG_Gold_ratio": ("totalDamageDealtToChampions / nonzero(goldEarned)", pa.float32()),
+    "Vision_per_min": ("visionScore / (nonzero(timePlayed) / 60)", pa.float32()),
+    "DMG_per_min": ("totalDamageDealtToChampions / (nonzero(timePlayed) / 60)", pa.float32()),
+}
+
+# champion_summary.csv columns derived from the per-champion means
+SUMMARY_FEATURES: Dict[str, str] = {
+    "KDA_performance": "kills + assists - deaths",
+    "DMG_per_death": "totalDamageDealtToChampions / nonzero(deaths)",
+    "DMG_taken_per_death": "totalDamageTaken / nonzero(deaths)",
+    "Heal_per_min": "totalHeal / nonzero(DMG_per_min)",
+    "CC_per_min": "timeCCingOthers / nonzero(DMG_per_min)",
+}
+
+
+# ====== EXPRESSIONS ======
+def _nonzero(x):
+    return np.where(x == 0, 1.0, x)
+
+
+def _fill(x, value):
+    return np.where(np.isnan(x), value, x)
+
+
+FUNCTIONS = {"nonzero": _nonzero, "fill": _fill, "abs": np.abs,
+             "min": np.minimum, "max": np.maximum}
+
+_BINOPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+           ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+           ast.Pow: operator.pow, ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or}
+_CMPOPS = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+           ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+
+class Expr:
+    """A parsed, validated expression; `columns` are the names it reads."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tree = ast.parse(source, mode="eval").body
+        self.columns = set()
+        self._check(self.tree)
+
+    def _check(self, node) -> None:
+        if isinstance(node, ast.Name):
+            self.columns.add(node.id)
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise ValueError(f"only numeric constants allowed: {self.source!r}")
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.Not, ast.Invert)):
+            self._check(node.operand)
+        elif isinstance(node, ast.BoolOp):
+            for v in node.values:
+                self._check(v)
+        elif isinstance(node, ast.Compare) and all(type(op) in _CMPOPS for op in node.ops):
+            for v in [node.left] + node.comparators:
+                self._check(v)
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id in FUNCTIONS and not node.keywords):
+            for a in node.args:
+                self._check(a)
+        else:
+            raise ValueError(f"unsupported syntax in {self.source!r}: {ast.dump(node)[:60]}")
+
+    def __call__(self, cols: Mapping[str, np.ndarray]):
+        return self._eval(self.tree, cols)
+
+    def _eval(self, node, cols):
+        if isinstance(node, ast.Name):
+            return cols[node.id]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BinOp):
+            return _BINOPS[type(node.op)](self._eval(node.left, cols), self._eval(node.right, cols))
+        if isinstance(node, ast.UnaryOp):
+            v = self._eval(node.operand, cols)
+            return -v if isinstance(node.op, ast.USub) else np.logical_not(v)
+        if isinstance(node, ast.BoolOp):
+            fn = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            out = self._eval(node.values[0], cols)
+            for v in node.values[1:]:
+                out = fn(out, self._eval(v, cols))
+            return out
+        if isinstance(node, ast.Compare):
+            left, out = self._eval(node.left, cols), None
+            for op, right in zip(node.ops, node.comparators):
+                right = self._eval(right, cols)
+                part = _CMPOPS[type(op)](left, right)
+                out = part if out is None else np.logical_and(out, part)
+                left = right
+            return out
+        return FUNCTIONS[node.func.id](*(self._eval(a, cols) for a in node.args))
+
+
+_compiled: Dict[str, Expr] = {}
+
+
+def compile_expr(source: str) -> Expr:
+    if source not in _compiled:
+        _compiled[source] = Expr(source)
+    return _compiled[source]
+
+
+def _column(s) -> np.ndarray:
+    """pandas / Arrow column -> numpy, missing values as NaN."""
+    if isinstance(s, (pa.Array, pa.ChunkedArray)):
+        if s.null_count or pa.types.is_boolean(s.type):
+            return s.cast(pa.float64()).to_numpy(zero_copy_only=False)
+        return s.to_numpy(zero_copy_only=False)
+    if not isinstance(s.dtype, np.dtype) or s.dtype.kind not in "iuf" or s.hasnans:
+        return pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return s.to_numpy()
+
+
+class Columns(dict):
+    """Lazy numpy view of a frame's (or a batch's) columns; derived ones can be added."""
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+
+    def __missing__(self, name):
+        self[name] = _column(self.source[name])
+        return self[name]
+
+    def has(self, names) -> bool:
+        return all(n in self or n in self.source for n in names)
+
+
+def derive(cols: Columns, defs: Mapping[str, str]) -> Dict[str, np.ndarray]:
+    """Evaluate `defs` in order (later ones may use earlier ones); returns the new columns."""
+    out = {}
+    for name, source in defs.items():
+        expr = compile_expr(source)
+        if cols.has(expr.columns):
+            cols[name] = out[name] = np.asarray(expr(cols))
+    return out
+
+
+# ====== PIPELINE ======
+def add_features(cols: Dict[str, pa.Array]) -> Dict[str, pa.Array]:
+    """Staging hook: FEATURES computed on one batch's Arrow columns (NaN -> null)."""
+    view = Columns(cols)
+    for name, values in derive(view, {n: e for n, (e, _) in FEATURES.items()}).items():
+        cols[name] = pa.array(values, from_pandas=True)
+    return cols
+
+
+def add_summary_features(df: pd.DataFrame) -> pd.DataFrame:
+    for name, values in derive(Columns(df), SUMMARY_FEATURES).items():
+        df[name] = values
+    return df
+
+
+def feature(df: pd.DataFrame, name: str) -> pd.Series:
+    """One FEATURES column computed on a pandas frame."""
+    return pd.Series(compile_expr(FEATURES[name][0])(Columns(df)), index=df.index)
+
+
+# ====== COACHING RULES ======
+class Rule:
+    def __init__(self, id: str, when: str, hint: str, **extra):
+        self.id = id
+        self.when = compile_expr(when)
+        self.hint = hint
+        self.extra = extra
+
+    @property
+    def column(self) -> str:
+        return HINT_PREFIX + self.id
+
+
+_rules_cache: Dict[str, Tuple[int, List[Rule]]] = {}
+
+
+def load_rules(path=RULES_PATH) -> List[Rule]:
+    """Rules from a JSON file, re-read when the file changes."""
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+    cached = _rules_cache.get(str(path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        rules = [Rule(**r) for r in json.load(f)["rules"]]
+    ids = [r.id for r in rules]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"duplicate rule ids in {path}")
+    _rules_cache[str(path)] = (mtime, rules)
+    return rules
+
+
+def apply_rules(df: pd.DataFrame, rules: Optional[Sequence[Rule]] = None) -> pd.DataFrame:
+    """Add a boolean hint_<id> column per rule (rules with missing columns are skipped)."""
+    rules = load_rules() if rules is None else rules
+    cols = Columns(df)
+    out = {}
+    for rule in rules:
+        if cols.has(rule.when.columns):
+            hit = np.broadcast_to(np.asarray(rule.when(cols), dtype=bool), (len(df),))
+            out[rule.column] = hit
+    return df.assign(**out) if out else df
+
+
+def hints(row: Mapping, rules: Optional[Sequence[Rule]] = None) -> List[str]:
+    """Hint texts of one row with hint_<id> columns (as produced by apply_rules)."""
+    rules = load_rules() if rules is None else rules
+    return [r.hint for r in rules if bool(row.get(r.column, False))]
+
+
+def hint_counts(df: pd.DataFrame, rules: Optional[Sequence[Rule]] = None) -> pd.Series:
+    rules = load_rules() if rules is None else rules
+    flagged = apply_rules(df, rules)
+    return pd.Series({r.id: int(flagged[r.column].sum()) for r in rules if r.column in flagged})
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Feature and coaching-rule registry")
+    ap.add_argument("--rules", default=str(RULES_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("check", help="parse every rule and feature expression")
+    h = sub.add_parser("hints", help="how often each rule fires on the staged participants")
+    h.add_argument("--staged", default="data/staged")
+    args = ap.parse_args()
+
+    rules = load_rules(args.rules)
+    if args.cmd == "check":
+        for name, (source, _) in FEATURES.items():
+            print(f"feature {name}: {sorted(compile_expr(source).columns)}")
+        for r in rules:
+            print(f"rule {r.id}: {sorted(r.when.columns)}")
+    else:
+        import dashboard
+
+        frame = dashboard.normalize(dashboard.staged_frame(args.staged))
+        counts = hint_counts(frame, rules)
+        print(f"{len(frame)} participant rows")
+        print(counts.to_string())
@@ -0,0 +1,117 @@
+# id_paging.py
+"""
+Match-ID paging with a persisted per-PUUID high-water mark.
+
+A full listing pages the whole 365-day window (100 IDs per request). Once a
+player's newest gameEndTimestamp is known, an incremental listing only asks
+for games that started after it, which is usually a single request, and the
+new IDs are merged into the existing index file instead of replacing it.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from riot_client import RiotClient
+
+DEFAULT_INDEX_PATH = Path("data/raw/index/match_ids_year.json")
+DEFAULT_HWM_PATH = Path("data/raw/index/high_water.json")
+
+
+def page_match_ids(client: RiotClient, puuid: str, start_time: Optional[int] = None,
+                   end_time: Optional[int] = None, queue: Optional[int] = None,
+                   count: int = 100) -> List[str]:
+    """All IDs in [start_time, end_time], newest first."""
+    all_ids = []
+    start = 0
+    while True:
+        ids = client.match_ids(puuid, start=start, count=count,
+                               start_time=start_time, end_time=end_time, queue=queue)
+        if ids is None:
+            # a cut-short listing would let the high-water mark skip the missing games
+            raise RuntimeError(f"listing match IDs failed for {puuid[:12]}… at start={start}")
+        all_ids.extend(ids)
+        if ids:
+            print(f"Fetched {len(ids)} IDs (total so far {len(all_ids)})")
+        if len(ids) < count:
+            break
+        start += count
+    return all_ids
+
+
+class HighWaterMarks:
+    """puuid -> newest gameEndTimestamp (ms) seen in a downloaded match."""
+
+    def __init__(self, path: Path = DEFAULT_HWM_PATH):
+        self.path = Path(path)
+        self.marks: Dict[str, int] = {}
+        self._lock = threading.Lock()    # observe() is called from download workers
+        if self.path.exists():
+            with open(self.path) as f:
+                self.marks = json.load(f)
+
+    def get(self, puuid: str) -> Optional[int]:
+        return self.marks.get(puuid)
+
+    def start_time(self, puuid: str) -> Optional[int]:
+        """startTime (epoch seconds) for the next incremental listing, or None."""
+        mark = self.marks.get(puuid)
+        return mark // 1000 if mark is not None else None
+
+    def observe(self, match: dict, puuids: Optional[Iterable[str]] = None) -> None:
+        """Advance the mark of every tracked participant of `match`."""
+        end = match.get("info", {}).get("gameEndTimestamp")
+        if not end:
+            return
+        participants = match.get("metadata", {}).get("participants", [])
+        tracked = set(puuids) if puuids is not None else set(participants)
+        with self._lock:
+            for puuid in participants:
+                if puuid in tracked and end > self.marks.get(puuid, 0):
+                    self.marks[puuid] = end
+
+    def bootstrap(self, matches: Callable[[], Iterable[dict]], puuids: Iterable[str]) -> None:
+        """Derive missing marks from matches already stored (one-off scan).
+
+        `matches` is only called when some mark is missing, e.g. store.iter_matches.
+        """
+        missing = [p for p in puuids if p not in self.marks]
+        if not missing:
+            return
+        for m in matches():
+            self.observe(m, missing)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with self._lock, open(tmp, "w") as f:
+            json.dump(self.marks, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def load_index(index_path: Path = DEFAULT_INDEX_PATH) -> List[str]:
+    index_path = Path(index_path)
+    if not index_path.exists():
+        return []
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def merge_index(new_ids: Iterable[str], index_path: Path = DEFAULT_INDEX_PATH) -> List[str]:
+    """Merge `new_ids` into the index file (newest first, no duplicates) and save it."""
+    old = load_index(index_path)
+    seen = set()
+    merged = []
+    for mid in list(new_ids) + old:
+        if mid not in seen:
+            seen.add(mid)
+            merged.append(mid)
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(merged, f, indent=2)
+    os.replace(tmp, index_path)
+    return merged
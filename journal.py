@@ -0,0 +1,222 @@
+# journal.py
+"""
+Durable per-match download journal (SQLite, data/raw/journal.sqlite).
+
+Every matchId the pipeline decides to download is tracked through its stages:
+
+    queued     known, not downloaded yet
+    fetched    the API returned it (set together with written by riot.py)
+    written    appended to the raw store (data + index line on disk)
+    uploaded   its raw-store segment reached S3
+    staged     included in the staged Parquet datasets
+
+Each stage is a timestamp column, so a row shows how far a match got and
+when. A failed fetch is recorded with the error and an exponential back-off
+(RETRY_BASE * 2^(attempts-1), capped at RETRY_MAX, with jitter); due() hands
+it back once the back-off is over, and after MAX_ATTEMPTS (or a 404) it is
+given up. An interrupted backfill restarts from the journal: written matches
+are never requested again, matches written but not uploaded get their
+segment re-queued, and failed ones wait for their back-off instead of being
+hammered on every run.
+
+The database runs in WAL mode and every call is one short transaction, so a
+crash loses at most the calls in flight; the raw store's own index stays the
+source of truth for what is on disk (sync_store() reconciles the two).
+
+    python journal.py stats
+    python journal.py failed --limit 20
+    python journal.py retry-now          # clear back-offs, e.g. after fixing a key
+"""
+
+import argparse
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_JOURNAL = Path("data/raw/journal.sqlite")
+STAGES = ("fetched", "written", "uploaded", "staged")
+RETRY_BASE = 60.0          # seconds before the first retry
+RETRY_MAX = 6 * 3600.0     # back-off cap
+MAX_ATTEMPTS = 8
+GIVE_UP = ("404",)         # statuses not worth retrying
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id  TEXT PRIMARY KEY,
+    queued    REAL NOT NULL,
+    fetched   REAL,
+    written   REAL,
+    uploaded  REAL,
+    staged    REAL,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    next_try  REAL,            -- NULL: nothing to retry (done, or given up)
+    error     TEXT
+);
+CREATE INDEX IF NOT EXISTS matches_retry ON matches (next_try) WHERE written IS NULL;
+"""
+
+
+def backoff(attempts: int, base: float = RETRY_BASE, cap: float = RETRY_MAX) -> float:
+    """Seconds to wait after the `attempts`-th failure (full exponential, +-20% jitter)."""
+    return min(cap, base * 2 ** max(0, attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+class Journal:
+    def __init__(self, path=DEFAULT_JOURNAL, max_attempts: int = MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        # one connection shared by the download threads, serialized by the lock
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self):
+        # the connection is in autocommit mode (isolation_level=None), where
+        # `with self._db` opens no transaction: BEGIN / COMMIT by hand
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _run(self, sql: str, rows: Iterable[tuple] = ((),), many: bool = False) -> int:
+        with self._transaction() as db:
+            cur = db.executemany(sql, rows) if many else db.execute(sql, *rows)
+            return cur.rowcount
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # --- writes ---
+    def queue(self, match_ids: Iterable[str]) -> int:
+        """Track `match_ids` (already tracked ones are left as they are); returns new rows."""
+        now = time.time()
+        return self._run("INSERT OR IGNORE INTO matches (match_id, queued, next_try) VALUES (?, ?, ?)",
+                         ((m, now, now) for m in match_ids), many=True)
+
+    def mark(self, match_ids: Iterable[str], *stages: str) -> int:
+        """Record that `match_ids` reached `stages` (first time only; unknown ids are added)."""
+        for s in stages:
+            if s not in STAGES:
+                raise ValueError(f"unknown stage {s!r}")
+        now = time.time()
+        sets = ", ".join(f"{s} = COALESCE({s}, :now)" for s in stages)
+        done = ", next_try = NULL, error = NULL" if "written" in stages else ""
+        rows = [{"mid": m, "now": now} for m in match_ids]
+        with self._transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO matches (match_id, queued) VALUES (:mid, :now)", rows)
+            return db.executemany(f"UPDATE matches SET {sets}{done} WHERE match_id = :mid", rows).rowcount
+
+    def fail(self, match_id: str, error: str) -> Optional[float]:
+        """Record a failed fetch; returns when to retry (None: given up)."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO matches (match_id, queued) VALUES (?, ?)",
+                       (match_id, now))
+            (attempts,) = db.execute("SELECT attempts FROM matches WHERE match_id = ?",
+                                     (match_id,)).fetchone()
+            attempts += 1
+            give_up = attempts >= self.max_attempts or str(error) in GIVE_UP
+            next_try = None if give_up else now + backoff(attempts)
+            db.execute("UPDATE matches SET attempts = ?, next_try = ?, error = ? WHERE match_id = ?",
+                       (attempts, next_try, str(error), match_id))
+        return next_try
+
+    def retry_now(self, include_given_up: bool = False) -> int:
+        """Make every failed match due immediately (optionally also given-up ones)."""
+        where = "written IS NULL AND attempts > 0"
+        if not include_given_up:
+            where += " AND next_try IS NOT NULL"
+        return self._run(f"UPDATE matches SET next_try = ? WHERE {where}", ((time.time(),),))
+
+    def sync_store(self, store) -> int:
+        """Mark every match in the raw store as written (store index = what is on disk)."""
+        known = {m for (m,) in self._query("SELECT match_id FROM matches WHERE written IS NOT NULL")}
+        return self.mark([m for m in store.ids() if m not in known], "written")
+
+    # --- reads ---
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """Not yet written matches whose (back-off) time has come, oldest first."""
+        sql = "SELECT match_id FROM matches WHERE written IS NULL AND next_try <= ? ORDER BY next_try"
+        params = (time.time() if now is None else now,)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [m for (m,) in self._query(sql, params)]
+
+    def waiting(self) -> List[str]:
+        """Not written, retry scheduled in the future."""
+        return [m for (m,) in self._query(
+            "SELECT match_id FROM matches WHERE written IS NULL AND next_try > ?", (time.time(),))]
+
+    def not_uploaded(self) -> List[str]:
+        return [m for (m,) in self._query(
+            "SELECT match_id FROM matches WHERE written IS NOT NULL AND uploaded IS NULL")]
+
+    def state(self, match_id: str) -> Optional[dict]:
+        cur = self._query("SELECT * FROM matches WHERE match_id = ?", (match_id,))
+        if not cur:
+            return None
+        cols = ["match_id", "queued"] + list(STAGES) + ["attempts", "next_try", "error"]
+        row = dict(zip(cols, cur[0]))
+        reached = [s for s in STAGES if row[s] is not None]
+        row["state"] = reached[-1] if reached else (
+            "queued" if not row["attempts"] else "retry" if row["next_try"] is not None else "given_up")
+        return row
+
+    def failed(self, limit: int = 50) -> List[tuple]:
+        """(match_id, attempts, next_try, error) of matches with failed fetches, most attempts first."""
+        return self._query("SELECT match_id, attempts, next_try, error FROM matches "
+                           "WHERE written IS NULL AND attempts > 0 ORDER BY attempts DESC LIMIT ?",
+                           (limit,))
+
+    def stats(self) -> Dict[str, int]:
+        (row,) = self._query(
+            "SELECT COUNT(*), COUNT(written), COUNT(uploaded), COUNT(staged),"
+            " SUM(written IS NULL AND attempts = 0),"
+            " SUM(written IS NULL AND attempts > 0 AND next_try IS NOT NULL),"
+            " SUM(written IS NULL AND attempts > 0 AND next_try IS NULL) FROM matches")
+        keys = ("tracked", "written", "uploaded", "staged", "queued", "retrying", "given_up")
+        return {k: int(v or 0) for k, v in zip(keys, row)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-match download journal")
+    ap.add_argument("--journal", default=str(DEFAULT_JOURNAL))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    f = sub.add_parser("failed", help="matches whose fetch failed, with their last error")
+    f.add_argument("--limit", type=int, default=20)
+    r = sub.add_parser("retry-now", help="make failed matches due on the next run")
+    r.add_argument("--all", action="store_true", help="also matches that were given up")
+    g = sub.add_parser("get")
+    g.add_argument("match_id")
+    args = ap.parse_args()
+
+    journal = Journal(args.journal)
+    if args.cmd == "stats":
+        print(journal.stats())
+    elif args.cmd == "failed":
+        for mid, attempts, next_try, error in journal.failed(args.limit):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(next_try)) if next_try else "given up"
+            print(f"{mid}\t{attempts} attempts\t{error}\tnext: {when}")
+    elif args.cmd == "retry-now":
+        print(f"{journal.retry_now(args.all)} matches due now")
+    else:
+        print(journal.state(args.match_id))
@@ -0,0 +1,374 @@
+# lake.py
+"""
+Hive-partitioned Parquet copy of the staged and analytics tables, for query
+engines (Athena, DuckDB) that prune by directory.
+
+    data/lake/matches/platformId=KR/queueId=420/patch=15.19/date=2025-06-01/part-<run>-0.parquet
+    data/lake/participants/platformId=KR/queueId=420/patch=15.19/date=2025-06-01/...
+    data/lake/champion_summary/queueId=420/patch=15.19/part-<run>-0.parquet
+    data/lake/_manifest.json
+
+`date` is the UTC day of gameCreation; participants get platformId and date
+from their match. Partition columns live in the directory names only, so a
+query filtered on patch or queue opens only those directories. Within a
+file, participants are sorted by championName and matches by gameCreation,
+and every row group (ROW_GROUP_ROWS rows) carries min/max statistics, so
+champion and time filters also skip row groups.
+
+sync() appends each staging run (staging.py part files) that is not in the
+lake yet; a compacted staged part whose runs are all in the lake only
+replaces their names. A restaged data/staged (runs the lake has that staging
+no longer has) rebuilds it. _manifest.json lists every live file with its rows and
+bytes, plus the staging runs included. It is written (atomically) only after
+the files it names are complete, so files missing from it are leftovers of
+an interrupted write or compaction and are removed (sweep). The champion
+summary is rewritten whole on every run (write_summary): the manifest switches
+to the new files, then every previous one is deleted, including slices that
+dropped out.
+
+Incremental runs add one small file per touched partition. compact() merges
+a partition's small files (< SMALL_FILE_BYTES) into files of up to
+TARGET_FILE_ROWS rows; the manifest switches to the new files before the
+old ones are deleted.
+
+Readers should go through the manifest (dataset(), or the file list) rather
+than list directories, to never see a half-finished compaction.
+
+    python lake.py sync
+    python lake.py compact
+    python lake.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+LAKE_DIR = Path("data/lake")
+MANIFEST_NAME = "_manifest.json"
+TABLES = ("matches", "participants")
+SUMMARY_TABLE = "champion_summary"
+
+PARTITION_SCHEMA = pa.schema([
+    ("platformId", pa.string()),
+    ("queueId", pa.int16()),
+    ("patch", pa.string()),
+    ("date", pa.string()),          # YYYY-MM-DD (UTC) of gameCreation
+])
+SUMMARY_PARTITIONS = pa.schema([("queueId", pa.int16()), ("patch", pa.string())])
+SORT_KEYS = {"matches": ["gameCreation"], "participants": ["championName"]}
+
+TARGET_FILE_ROWS = 1_000_000       # ~50-100 MB of participants
+ROW_GROUP_ROWS = 128 * 1024
+SMALL_FILE_BYTES = 16 * 1024 * 1024
+
+
+def lake_dir_for(staged_dir) -> Path:
+    """data/staged -> data/lake (the lake sits next to the staged dir)."""
+    return Path(staged_dir).parent / "lake"
+
+
+def _stat(path: Path) -> Optional[str]:
+    return f"{path.stat().st_size}:{path.stat().st_mtime_ns}" if path.exists() else None
+
+
+# ====== MANIFEST ======
+class LakeManifest:
+    """{"runs": [...], "staged": <staging manifest size:mtime>, "summary": <digest>,
+    "files": {relpath: {rows, bytes}}}."""
+
+    def __init__(self, lake_dir=LAKE_DIR):
+        self.root = Path(lake_dir)
+        self.path = self.root / MANIFEST_NAME
+        data = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+        self.runs = set(data.get("runs", []))
+        self.staged = data.get("staged")
+        self.summary = data.get("summary")     # digest of the champion summary written
+        self.files: Dict[str, dict] = data.get("files", {})
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"runs": sorted(self.runs), "staged": self.staged, "summary": self.summary,
+                       "files": dict(sorted(self.files.items()))}, f, indent=0)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def add(self, paths) -> None:
+        for p in paths:
+            p = Path(p)
+            rel = p.relative_to(self.root).as_posix()
+            self.files[rel] = {"rows": pq.ParquetFile(p).metadata.num_rows, "bytes": p.stat().st_size}
+
+    def table_files(self, table: str) -> List[str]:
+        return [f for f in self.files if f.startswith(table + "/")]
+
+    def partitions(self, table: str) -> Dict[str, List[str]]:
+        out = defaultdict(list)
+        for f in self.table_files(table):
+            out[f.rsplit("/", 1)[0]].append(f)
+        return dict(out)
+
+    def sweep(self) -> List[str]:
+        """Delete table files the manifest doesn't list; returns their relative paths."""
+        removed = []
+        for table in TABLES + (SUMMARY_TABLE,):
+            for p in sorted((self.root / table).rglob("part-*.parquet")):
+                rel = p.relative_to(self.root).as_posix()
+                if rel not in self.files:
+                    p.unlink()
+                    removed.append(rel)
+        return removed
+
+
+# ====== WRITE ======
+def _write_options(**kwargs) -> dict:
+    return dict(format="parquet", max_rows_per_file=TARGET_FILE_ROWS,
+                min_rows_per_group=min(ROW_GROUP_ROWS, 16 * 1024), max_rows_per_group=ROW_GROUP_ROWS,
+                file_options=ds.ParquetFileFormat().make_write_options(write_statistics=True),
+                **kwargs)
+
+
+def _sorted(table: pa.Table, keys: List[str]) -> pa.Table:
+    # dictionary columns can't be sort keys: sort on their plain values
+    plain = [table.column(k).cast(table.schema.field(k).type.value_type)
+             if pa.types.is_dictionary(table.schema.field(k).type) else table.column(k) for k in keys]
+    order = pc.sort_indices(pa.table(plain, names=keys), [(k, "ascending") for k in keys])
+    return table.take(order)
+
+
+def with_partitions(table: pa.Table, matches: pa.Table) -> pa.Table:
+    """`table` (matches or participants rows) + platformId / queueId / patch / date columns."""
+    ids = matches.column("matchId").cast(pa.string())
+    pos = pc.index_in(table.column("matchId").cast(pa.string()), value_set=ids)
+    platform = pc.take(matches.column("platformId").cast(pa.string()), pos)
+    # matches without a platformId: the matchId prefix (KR_123 -> KR)
+    prefix = pc.replace_substring_regex(table.column("matchId").cast(pa.string()), r"_.*$", "")
+    created = pc.take(matches.column("gameCreation"), pos).cast(pa.timestamp("ms"))
+    parts = {
+        "platformId": pc.coalesce(platform, prefix),
+        "queueId": table.column("queueId").cast(pa.int16()),
+        "patch": table.column("patch").cast(pa.string()),
+        "date": pc.strftime(created, format="%Y-%m-%d"),
+    }
+    out = table.drop_columns([c for c in parts if c in table.column_names])
+    for name in PARTITION_SCHEMA.names:
+        out = out.append_column(name, parts[name])
+    return out
+
+
+def append_run(run: str, matches_part: Path, participants_part: Path, lake_dir=LAKE_DIR) -> List[Path]:
+    """Write one staging run's rows into the partitioned tables; returns the new files."""
+    lake_dir = Path(lake_dir)
+    matches = pq.read_table(matches_part)
+    written = []
+    for table, source in (("matches", matches), ("participants", pq.read_table(participants_part))):
+        if not source.num_rows:
+            continue
+        data = with_partitions(source, matches)
+        data = _sorted(data, PARTITION_SCHEMA.names + SORT_KEYS[table])
+        ds.write_dataset(data, lake_dir / table,
+                         partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+                         basename_template=f"part-{run}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore",
+                         file_visitor=lambda f: written.append(Path(f.path)),
+                         **_write_options())
+    return written
+
+
+def sync(staged_dir="data/staged", lake_dir=None) -> dict:
+    """Bring the lake up to date with the staged runs.
+
+    Returns {"written": [...], "removed": [...]} as paths relative to the lake
+    dir (what to upload / delete remotely).
+    """
+    from staging import (MANIFEST_NAME as STAGE_MANIFEST, StageManifest, dataset_dirs,
+                         folded_parts)
+
+    staged_dir = Path(staged_dir)
+    lake_dir = Path(lake_dir) if lake_dir is not None else lake_dir_for(staged_dir)
+    manifest = LakeManifest(lake_dir)
+    removed = manifest.sweep()
+    stage_manifest = staged_dir / STAGE_MANIFEST
+    runs = StageManifest(stage_manifest).runs()
+    matches_dir, participants_dir = dataset_dirs(staged_dir)
+    parts = {run: participants_dir / f"part-{run}.parquet" for run in runs}
+    empty = {run for run, p in parts.items() if not (p.exists() and (matches_dir / p.name).exists())}
+    # compacted staged parts (staging.compact_parts) replace runs the lake already has
+    covered, new = folded_parts([parts[r] for r in sorted(runs - empty)],
+                                {f"part-{r}.parquet" for r in manifest.runs - empty})
+    if covered is None:
+        print("Staged data was rebuilt; rebuilding the lake")
+        stale = [f for table in TABLES for f in manifest.table_files(table)]
+        removed += stale
+        for f in stale:
+            del manifest.files[f]
+        manifest.runs = set()
+        manifest.save()
+        removed += manifest.sweep()
+        covered, new = set(), [parts[r] for r in sorted(runs - empty)]
+    manifest.runs = {p[len("part-"):-len(".parquet")] for p in covered} | (manifest.runs & empty)
+
+    written = []
+    for p in new:
+        run = p.name[len("part-"):-len(".parquet")]
+        files = append_run(run, matches_dir / p.name, p, lake_dir)
+        manifest.add(files)
+        manifest.runs.add(run)
+        manifest.save()
+        written += [f.relative_to(lake_dir).as_posix() for f in files]
+    manifest.runs |= empty      # runs that wrote no rows
+    manifest.staged = _stat(stage_manifest)
+    manifest.save()
+    return {"written": written, "removed": removed}
+
+
+# ====== COMPACTION ======
+def compact(lake_dir=LAKE_DIR, small_bytes: int = SMALL_FILE_BYTES) -> dict:
+    """Merge each partition's small files; returns {"written": [...], "removed": [...]}."""
+    lake_dir = Path(lake_dir)
+    manifest = LakeManifest(lake_dir)
+    removed = manifest.sweep()
+    stamp = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    written, merged = [], []
+    for table in TABLES:
+        for part_dir, files in sorted(manifest.partitions(table).items()):
+            small = sorted(f for f in files if manifest.files[f]["bytes"] < small_bytes)
+            if len(small) < 2:
+                continue
+            data = pa.concat_tables([pq.ParquetFile(lake_dir / f).read() for f in small])
+            data = _sorted(data, SORT_KEYS[table])
+            out = []
+            for i, start in enumerate(range(0, data.num_rows, TARGET_FILE_ROWS)):
+                path = lake_dir / part_dir / f"part-c{stamp}-{i}.parquet"
+                pq.write_table(data.slice(start, TARGET_FILE_ROWS), path,
+                               row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+                out.append(path)
+            for f in small:
+                del manifest.files[f]
+            manifest.add(out)
+            written += [p.relative_to(lake_dir).as_posix() for p in out]
+            merged += small
+    if merged:
+        # switch readers to the new files first; the old ones are then unreferenced
+        manifest.save()
+        removed += merged
+        for f in merged:
+            (lake_dir / f).unlink()
+    return {"written": written, "removed": removed}
+
+
+# ====== ANALYTICS ======
+def write_summary(partials: pd.DataFrame, lake_dir=LAKE_DIR) -> dict:
+    """champion_summary per queueId / patch (aggregates.summarize of each slice).
+
+    Replaces the previous summary files as a whole (nothing is written when the
+    summary did not change); returns {"written": [...], "removed": [...]} like sync().
+    """
+    from aggregates import summarize
+
+    lake_dir = Path(lake_dir)
+    frames = []
+    for (queue, patch), p in partials.groupby(["queueId", "patch"], sort=True):
+        frames.append(summarize(p).assign(queueId=int(queue), patch=str(patch)))
+    summary = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    digest = hashlib.md5(pd.util.hash_pandas_object(summary, index=False).to_numpy().tobytes()
+                         + ",".join(summary.columns).encode()).hexdigest()
+    manifest = LakeManifest(lake_dir)
+    if digest == manifest.summary:
+        return {"written": [], "removed": []}
+    written = []
+    if frames:
+        table = pa.Table.from_pandas(summary, preserve_index=False)
+        table = table.set_column(table.schema.get_field_index("queueId"), "queueId",
+                                 table.column("queueId").cast(pa.int16()))
+        stamp = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        ds.write_dataset(table, lake_dir / SUMMARY_TABLE,
+                         partitioning=ds.partitioning(SUMMARY_PARTITIONS, flavor="hive"),
+                         basename_template=f"part-{stamp}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore",
+                         file_visitor=lambda f: written.append(Path(f.path)),
+                         **_write_options())
+    old = manifest.table_files(SUMMARY_TABLE)
+    for f in old:
+        del manifest.files[f]
+    manifest.add(written)
+    manifest.summary = digest
+    # switch readers to the new files first; the old ones are then unreferenced
+    manifest.save()
+    for f in old:
+        (lake_dir / f).unlink(missing_ok=True)
+    for d in sorted((lake_dir / SUMMARY_TABLE).glob("*/*"), reverse=True):
+        if d.is_dir() and not any(d.iterdir()):     # slices that dropped out
+            d.rmdir()
+            if not any(d.parent.iterdir()):
+                d.parent.rmdir()
+    return {"written": [p.relative_to(lake_dir).as_posix() for p in written], "removed": old}
+
+
+# ====== READ ======
+def fresh(staged_dir="data/staged", lake_dir=None) -> bool:
+    """True if the lake was synced after the last staging run."""
+    lake_dir = Path(lake_dir) if lake_dir is not None else lake_dir_for(staged_dir)
+    if not (lake_dir / MANIFEST_NAME).exists():
+        return False
+    from staging import MANIFEST_NAME as STAGE_MANIFEST
+    return LakeManifest(lake_dir).staged == _stat(Path(staged_dir) / STAGE_MANIFEST)
+
+
+def dataset(table: str, lake_dir=LAKE_DIR) -> ds.Dataset:
+    """The manifest's files of one table, partition columns included."""
+    lake_dir = Path(lake_dir)
+    files = sorted(str(lake_dir / f) for f in LakeManifest(lake_dir).table_files(table))
+    schema = SUMMARY_PARTITIONS if table == SUMMARY_TABLE else PARTITION_SCHEMA
+    return ds.dataset(files, format="parquet",
+                      partitioning=ds.partitioning(schema, flavor="hive"),
+                      partition_base_dir=str(lake_dir / table))
+
+
+def stats(lake_dir=LAKE_DIR, small_bytes: int = SMALL_FILE_BYTES) -> Dict[str, dict]:
+    manifest = LakeManifest(lake_dir)
+    out = {}
+    for table in TABLES + (SUMMARY_TABLE,):
+        files = [manifest.files[f] for f in manifest.table_files(table)]
+        out[table] = {"partitions": len(manifest.partitions(table)), "files": len(files),
+                      "rows": sum(f["rows"] for f in files),
+                      "mb": round(sum(f["bytes"] for f in files) / 1e6, 1),
+                      "small_files": sum(f["bytes"] < small_bytes for f in files)}
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Hive-partitioned Parquet lake")
+    ap.add_argument("--lake", default=str(LAKE_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sync", help="append staging runs not in the lake yet")
+    s.add_argument("--staged", default="data/staged")
+    c = sub.add_parser("compact", help="merge small files per partition")
+    c.add_argument("--small-mb", type=float, default=SMALL_FILE_BYTES / 1024 / 1024)
+    sub.add_parser("stats")
+    args = ap.parse_args()
+
+    if args.cmd == "sync":
+        out = sync(args.staged, args.lake)
+        print(f"{len(out['written'])} files written, {len(out['removed'])} removed")
+    elif args.cmd == "compact":
+        out = compact(args.lake, int(args.small_mb * 1024 * 1024))
+        print(f"{len(out['written'])} files written, {len(out['removed'])} removed")
+    print(stats(args.lake))
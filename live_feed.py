@@ -0,0 +1,129 @@
+# live_feed.py
+"""
+Change feed the ingestion daemon (daemon.py) publishes and app.py follows.
+
+    data/live/feed.jsonl      one line per (new match, tracked player), with a
+                              increasing `seq`: champion, result, K/D/A, hints
+    data/live/snapshot.json   last seq, update time, per-player record and the
+                              daemon's counters; rewritten atomically
+
+Feed lines are appended (and fsynced) before the snapshot that announces
+their seq, so a reader that stops at snapshot["seq"] never sees a torn
+line. The feed keeps the newest FEED_KEEP lines; older ones are trimmed away
+once it holds twice that.
+
+Readers poll snapshot.json (a few hundred bytes) and only read the feed when
+its seq moved.
+
+    python live_feed.py            # print the snapshot and the newest events
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+LIVE_DIR = Path("data/live")
+FEED_NAME = "feed.jsonl"
+SNAPSHOT_NAME = "snapshot.json"
+FEED_KEEP = 1000
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class LiveFeed:
+    """Writer side: publish() appends events and rewrites the snapshot."""
+
+    def __init__(self, live_dir=LIVE_DIR, keep: int = FEED_KEEP):
+        self.dir = Path(live_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.feed_path = self.dir / FEED_NAME
+        self.snapshot_path = self.dir / SNAPSHOT_NAME
+        self.keep = keep
+        self.snapshot = read_snapshot(self.dir) or {"seq": 0, "players": {}}
+        self._lines = sum(1 for _ in open(self.feed_path)) if self.feed_path.exists() else 0
+
+    @property
+    def seq(self) -> int:
+        return self.snapshot["seq"]
+
+    def publish(self, events: Iterable[dict], **state) -> int:
+        """Append `events` (dicts; seq/published are added), update the snapshot; returns the last seq."""
+        now = time.time()
+        lines = []
+        seq = self.seq
+        players = self.snapshot.setdefault("players", {})
+        for e in events:
+            seq += 1
+            e = {"seq": seq, "published": now, **e}
+            lines.append(json.dumps(e, default=str) + "\n")
+            p = players.setdefault(e.get("puuid", ""), {"games": 0, "wins": 0})
+            p["games"] += 1
+            p["wins"] += int(bool(e.get("win")))
+            p["last"] = e.get("matchId")
+        if lines:
+            with open(self.feed_path, "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._lines += len(lines)
+            if self._lines > 2 * self.keep:
+                self._trim()
+        self.snapshot.update(state, seq=seq, updated=now)
+        _write_json(self.snapshot_path, self.snapshot)
+        return seq
+
+    def _trim(self) -> None:
+        with open(self.feed_path) as f:
+            tail = f.readlines()[-self.keep:]
+        tmp = self.feed_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            f.writelines(tail)
+        os.replace(tmp, self.feed_path)
+        self._lines = len(tail)
+
+
+# ====== READERS ======
+def read_snapshot(live_dir=LIVE_DIR) -> Optional[dict]:
+    path = Path(live_dir) / SNAPSHOT_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_feed(live_dir=LIVE_DIR, since: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """Events with seq > `since` up to the snapshot's seq, newest first (at most `limit`)."""
+    snapshot = read_snapshot(live_dir)
+    path = Path(live_dir) / FEED_NAME
+    if snapshot is None or not path.exists():
+        return []
+    events = []
+    with open(path) as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:      # line being appended right now
+                continue
+            if since < e["seq"] <= snapshot["seq"]:
+                events.append(e)
+    events.reverse()
+    return events[:limit] if limit else events
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Show the live feed")
+    ap.add_argument("--live", default=str(LIVE_DIR))
+    ap.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+    print(read_snapshot(args.live))
+    for e in read_feed(args.live, limit=args.limit):
+        print(e["seq"], e.get("matchId"), e.get("championName"), "win" if e.get("win") else "loss",
+              f"{e.get('kills')}/{e.get('deaths')}/{e.get('assists')}", "; ".join(e.get("hints", [])))
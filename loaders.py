@@ -0,0 +1,167 @@
+# loaders.py
+"""
+Column-pruned Arrow loading for app.py's local files and datasets.
+
+    Arrow IPC / Feather (.arrow .feather .ipc), file or directory
+        memory-mapped; uncompressed files are read with zero copy, and only
+        the requested columns are touched
+    Parquet (.parquet .pqt), file or (hive-)partitioned directory
+        memory-mapped; only the requested columns' pages are decoded
+    CSV (.csv)
+        streamed block by block into Arrow, keeping only the requested columns
+    zip
+        CSV members are streamed from the archive, Parquet / Feather members
+        are extracted once next to it and then opened as a dataset
+
+The result goes to pandas through schema.to_frame(): schema types are applied
+in Arrow and the Arrow buffers are released while the frame is built, so a
+multi-GB export is never held as both a raw and a typed copy.
+
+    python loaders.py data/staged/participants --columns matchId,championName,win
+"""
+
+import argparse
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from schema import arrow_types, to_frame
+
+FORMATS = {".parquet": "parquet", ".pqt": "parquet", ".arrow": "ipc", ".feather": "ipc",
+           ".ipc": "ipc", ".csv": "csv", ".zip": "zip"}
+CSV_BLOCK = 16 * 1024 * 1024
+_MMAP = fs.LocalFileSystem(use_mmap=True)
+
+
+def file_format(path) -> Optional[str]:
+    """'parquet' / 'ipc' / 'csv' / 'zip' from the suffix (directories: their files)."""
+    path = Path(path)
+    if path.is_dir():
+        found = {FORMATS.get(f.suffix.lower()) for f in path.rglob("*") if f.is_file()} - {None}
+        return next(iter(sorted(found & {"parquet", "ipc"})), None)
+    return FORMATS.get(path.suffix.lower())
+
+
+# ====== ARROW DATASETS (Parquet / Feather) ======
+def dataset(path) -> ds.Dataset:
+    path = Path(path)
+    fmt = file_format(path)
+    if fmt not in ("parquet", "ipc"):
+        raise ValueError(f"not a Parquet / Arrow dataset: {path}")
+    source = str(path)
+    if path.is_dir():
+        suffixes = [s for s, f in FORMATS.items() if f == fmt]
+        source = sorted(str(f) for f in path.rglob("*") if f.suffix.lower() in suffixes)
+        # hive partition directories (patch=15.19/...) become columns
+        return ds.dataset(source, format=fmt, filesystem=_MMAP,
+                          partitioning=ds.HivePartitioning.discover(), partition_base_dir=str(path))
+    return ds.dataset(source, format=fmt, filesystem=_MMAP)
+
+
+# ====== CSV ======
+def _csv_reader(source, columns: Optional[Sequence[str]] = None) -> pv.CSVStreamingReader:
+    # types are inferred from the first block; known columns get a fixed (wide) type
+    known = {name: (pa.string() if pa.types.is_dictionary(t) else
+                    pa.int64() if pa.types.is_integer(t) else
+                    pa.float64() if pa.types.is_floating(t) else t)
+             for name, t in arrow_types().items()}
+    convert = pv.ConvertOptions(column_types=known,
+                                include_columns=list(columns) if columns is not None else None,
+                                include_missing_columns=False)
+    return pv.open_csv(source, read_options=pv.ReadOptions(block_size=CSV_BLOCK),
+                       convert_options=convert)
+
+
+def read_csv(source, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    """Stream a CSV (path or file object) into Arrow, block by block."""
+    dict_columns = {n for n, t in arrow_types().items() if pa.types.is_dictionary(t)}
+    reader = _csv_reader(source, columns)
+    batches = []
+    for batch in reader:
+        # low-cardinality strings are dictionary-encoded per block, not kept as full strings
+        cols = [c.dictionary_encode() if name in dict_columns else c
+                for name, c in zip(batch.schema.names, batch.columns)]
+        batches.append(pa.RecordBatch.from_arrays(cols, names=batch.schema.names))
+    return pa.Table.from_batches(batches) if batches else reader.schema.empty_table()
+
+
+# ====== ZIP ======
+def _zip_members(path) -> List[zipfile.ZipInfo]:
+    with zipfile.ZipFile(path) as zf:
+        return [m for m in zf.infolist() if not m.is_dir() and Path(m.filename).suffix.lower() in FORMATS
+                and not Path(m.filename).name.startswith(".")]
+
+
+def _extracted(path: Path) -> Path:
+    """Extract the zip's data files once into <name>.d/ (Parquet / Feather need random access)."""
+    out = path.with_name(path.name + ".d")
+    if not out.exists():
+        tmp = path.with_name(path.name + ".d.tmp")
+        with zipfile.ZipFile(path) as zf:
+            zf.extractall(tmp, members=_zip_members(path))
+        tmp.replace(out)
+    return out
+
+
+def _zip_format(path) -> Optional[str]:
+    kinds = {FORMATS[Path(m.filename).suffix.lower()] for m in _zip_members(path)} - {"zip"}
+    return "csv" if kinds == {"csv"} else next(iter(sorted(kinds & {"parquet", "ipc"})), None)
+
+
+# ====== ENTRY POINTS ======
+def columns_of(path) -> List[str]:
+    """Column names without reading the data (first CSV block at most)."""
+    path = Path(path)
+    fmt = file_format(path)
+    if fmt == "csv":
+        return _csv_reader(str(path)).schema.names
+    if fmt == "zip":
+        if _zip_format(path) == "csv":
+            with zipfile.ZipFile(path) as zf, zf.open(_zip_members(path)[0]) as f:
+                return _csv_reader(f).schema.names
+        return columns_of(_extracted(path))
+    return dataset(path).schema.names
+
+
+def read_table(path, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    """Only `columns` (all if None) of a file, directory or zip, as an Arrow table."""
+    path = Path(path)
+    fmt = file_format(path)
+    if fmt == "csv":
+        return read_csv(str(path), columns)
+    if fmt == "zip":
+        if _zip_format(path) == "csv":
+            with zipfile.ZipFile(path) as zf:
+                parts = []
+                for m in _zip_members(path):
+                    with zf.open(m) as f:
+                        parts.append(read_csv(f, columns))
+            return pa.concat_tables(parts, promote_options="permissive")
+        return read_table(_extracted(path), columns)
+    if fmt is None:
+        raise ValueError(f"unsupported file: {path}")
+    data = dataset(path)
+    if columns is not None:
+        columns = [c for c in columns if c in data.schema.names]
+    return data.to_table(columns=columns)
+
+
+def load_frame(path, columns: Optional[Sequence[str]] = None):
+    """read_table() -> pandas with the schema dtypes."""
+    return to_frame(read_table(path, columns))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Load a local file / dataset through Arrow")
+    ap.add_argument("path")
+    ap.add_argument("--columns", help="comma-separated; default: all")
+    args = ap.parse_args()
+    cols = args.columns.split(",") if args.columns else None
+    df = load_frame(args.path, cols)
+    print(f"{len(df)} rows, {df.memory_usage(deep=True).sum() / 1e6:.2f} MB in pandas")
+    print(df.dtypes.to_string())
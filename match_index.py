@@ -0,0 +1,217 @@
+# match_index.py
+"""
+matchId -> row offset index over the staged participants table.
+
+Staging writes the 10 participant rows of a match next to each other, so one
+match is (file, first row, row count). The index keeps that per match plus
+the columns the app's match picker shows (date, queue, patch), in
+data/staged/_match_index.parquet, newest first. It is updated per part file:
+parts already indexed (same size and mtime) are skipped, parts that changed
+are re-indexed and parts that disappeared are dropped. A lookup still checks
+the matchId of the rows it returns and falls back to a scan if they differ.
+
+Looking up a match is a hash lookup plus reading the row group(s) holding its
+rows, so it costs the same with 1k or 10M matches; prefix search over the
+matchIds is a binary search on a sorted copy.
+
+    python match_index.py build
+    python match_index.py get KR_7667898191
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from raw_store import patch_of
+
+INDEX_NAME = "_match_index.parquet"
+
+INDEX_SCHEMA = pa.schema([
+    ("matchId", pa.string()),
+    ("file", pa.string()),          # participants file, relative to the staged dir
+    ("row", pa.int64()),            # first participant row in that file
+    ("rows", pa.int16()),           # participant rows (0 = not contiguous, scan instead)
+    ("size", pa.int64()),           # file size and mtime when indexed: a rewrite under
+    ("mtime", pa.int64()),          # the same name (plain staging.py) is re-indexed
+    ("gameCreation", pa.int64()),
+    ("queueId", pa.int16()),
+    ("patch", pa.string()),
+])
+
+
+# ====== BUILD ======
+def participant_files(staged_dir) -> List[Path]:
+    staged_dir = Path(staged_dir)
+    parts = sorted((staged_dir / "participants").glob("part-*.parquet"))
+    if parts:
+        return parts
+    single = staged_dir / "participants.parquet"
+    return [single] if single.exists() else []
+
+
+def _matches_file(participants_file: Path) -> Path:
+    # part-<run>.parquet exists in both dataset dirs; the single files sit side by side
+    if participants_file.parent.name == "participants":
+        return participants_file.parent.parent / "matches" / participants_file.name
+    return participants_file.parent / "matches.parquet"
+
+
+def index_file(path: Path, staged_dir) -> pa.Table:
+    """One index row per match in one participants file."""
+    ids = pq.read_table(path, columns=["matchId"]).column("matchId").combine_chunks()
+    ids = ids.cast(pa.string()).to_numpy(zero_copy_only=False)
+    if not len(ids):
+        return INDEX_SCHEMA.empty_table()
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    lengths = np.diff(np.r_[starts, len(ids)])
+    run_ids = ids[starts]
+    # a matchId in two runs means its rows are not contiguous: leave it to a filtered scan
+    uniq, counts = np.unique(run_ids, return_counts=True)
+    rows = np.where(np.isin(run_ids, uniq[counts > 1]), 0, lengths)
+    first = ~pd.Series(run_ids).duplicated().to_numpy()
+
+    info = _match_info(_matches_file(path))
+    df = pd.DataFrame({"matchId": run_ids[first], "row": starts[first], "rows": rows[first]})
+    df = df.merge(info, on="matchId", how="left")
+    df["file"] = str(path.relative_to(staged_dir))
+    df["size"], df["mtime"] = _stamp(path)
+    return pa.Table.from_pandas(df, preserve_index=False).select(INDEX_SCHEMA.names).cast(INDEX_SCHEMA)
+
+
+def _match_info(matches_file: Path) -> pd.DataFrame:
+    cols = ["matchId", "gameCreation", "queueId"]
+    if not matches_file.exists():
+        return pd.DataFrame(columns=cols + ["patch"])
+    names = pq.read_schema(matches_file).names
+    t = pq.read_table(matches_file, columns=cols + [c for c in ("patch", "gameVersion") if c in names])
+    df = t.to_pandas()
+    df["matchId"] = df["matchId"].astype(str)
+    if "patch" not in df.columns:
+        df["patch"] = df["gameVersion"].map(patch_of)
+    df["patch"] = df["patch"].astype(str)
+    return df[cols + ["patch"]]
+
+
+def _stamp(path: Path):
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def update_match_index(staged_dir="data/staged") -> pa.Table:
+    """Index participants files new or changed since last time, drop files that are gone; save."""
+    staged_dir = Path(staged_dir)
+    path = staged_dir / INDEX_NAME
+    files = {str(p.relative_to(staged_dir)): p for p in participant_files(staged_dir)}
+    index = pq.read_table(path) if path.exists() else INDEX_SCHEMA.empty_table()
+    if not index.schema.equals(INDEX_SCHEMA):
+        index = INDEX_SCHEMA.empty_table()
+    stamps = index.select(["file", "size", "mtime"]).group_by("file").aggregate(
+        [("size", "max"), ("mtime", "max")]).to_pylist()
+    indexed = {r["file"]: (r["size_max"], r["mtime_max"]) for r in stamps}
+    stale = {name for name, stamp in indexed.items()
+             if name not in files or _stamp(files[name]) != stamp}
+    new = [p for name, p in files.items() if name not in indexed or name in stale]
+    if not stale and not new:
+        return index
+    if stale:
+        index = index.filter(pc.invert(pc.is_in(index.column("file"), pa.array(sorted(stale)))))
+    index = pa.concat_tables([index] + [index_file(p, staged_dir) for p in new])
+    index = index.sort_by([("gameCreation", "descending"), ("matchId", "ascending")])
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(index, tmp)
+    tmp.replace(path)
+    return index
+
+
+# ====== LOOKUP ======
+class MatchIndex:
+    def __init__(self, staged_dir="data/staged"):
+        self.staged_dir = Path(staged_dir)
+        path = self.staged_dir / INDEX_NAME
+        table = pq.read_table(path) if path.exists() else update_match_index(staged_dir)
+        self.df = table.to_pandas()
+        self.df["date"] = pd.to_datetime(self.df["gameCreation"], unit="ms")
+        self.pos = pd.Index(self.df["matchId"])           # hash lookup: matchId -> row
+        order = np.argsort(self.df["matchId"].to_numpy(), kind="stable")
+        self._sorted_ids = self.df["matchId"].to_numpy()[order]
+        self._sorted_pos = order
+        self._files: Dict[str, pq.ParquetFile] = {}
+        self._bounds: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.pos
+
+    def locate(self, match_id: str) -> Optional[dict]:
+        if match_id not in self.pos:
+            return None
+        return self.df.iloc[self.pos.get_loc(match_id)].to_dict()
+
+    # --- picker ---
+    def search(self, prefix: str = "") -> np.ndarray:
+        """Index rows (newest first) whose matchId starts with `prefix` (case-insensitive)."""
+        if not prefix:
+            return np.arange(len(self.df))
+        prefix = prefix.strip().upper()
+        lo = np.searchsorted(self._sorted_ids, prefix, side="left")
+        hi = np.searchsorted(self._sorted_ids, prefix + "\uffff", side="left")
+        return np.sort(self._sorted_pos[lo:hi])
+
+    def page(self, rows: np.ndarray, page: int, size: int = 50) -> pd.DataFrame:
+        take = rows[page * size:(page + 1) * size]
+        return self.df.iloc[take][["matchId", "date", "queueId", "patch"]]
+
+    # --- random access into the staged rows ---
+    def _file(self, name: str) -> pq.ParquetFile:
+        if name not in self._files:
+            f = pq.ParquetFile(self.staged_dir / name)
+            self._files[name] = f
+            sizes = [f.metadata.row_group(i).num_rows for i in range(f.num_row_groups)]
+            self._bounds[name] = np.cumsum([0] + sizes)
+        return self._files[name]
+
+    def participants(self, match_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """The match's participant rows, reading only the row group(s) that hold them."""
+        loc = self.locate(match_id)
+        if loc is None:
+            return pd.DataFrame()
+        if not loc["rows"]:
+            import query
+            return query.match_participants(match_id, self.staged_dir, columns)
+        f = self._file(loc["file"])
+        bounds = self._bounds[loc["file"]]
+        start, stop = loc["row"], loc["row"] + loc["rows"]
+        first = int(np.searchsorted(bounds, start, side="right") - 1)
+        last = int(np.searchsorted(bounds, stop - 1, side="right") - 1)
+        read = None if columns is None else list(dict.fromkeys(list(columns) + ["matchId"]))
+        t = f.read_row_groups(list(range(first, last + 1)), columns=read)
+        t = t.slice(start - bounds[first], loc["rows"])
+        if not pc.all(pc.equal(t.column("matchId").cast(pa.string()), match_id)).as_py():
+            # the file changed since it was indexed: scan instead of trusting the offsets
+            import query
+            return query.match_participants(match_id, self.staged_dir, columns)
+        return (t if columns is None else t.select(list(columns))).to_pandas()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="matchId -> staged row index")
+    ap.add_argument("--staged", default="data/staged")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build")
+    g = sub.add_parser("get")
+    g.add_argument("match_id")
+    args = ap.parse_args()
+    if args.cmd == "build":
+        print(f"{update_match_index(args.staged).num_rows} matches indexed")
+    else:
+        idx = MatchIndex(args.staged)
+        print(idx.locate(args.match_id))
+        print(idx.participants(args.match_id).to_string(index=False))
@@ -0,0 +1,233 @@
+# matchups.py
+"""
+Champion matchup (same lane, opposite team) and synergy (same team) matrices.
+
+Pairs come from the staged participants table, Summoner's Rift rows only
+(teamPosition set): every participant is joined to its lane opponent and to
+its four teammates in one vectorized merge per part file, and the pairs are
+counted with np.bincount into dense patch x role x champion x champion
+arrays. Only non-zero cells are kept, as long tables with
+dictionary-encoded names (data/processed/matchups/):
+
+    lane.parquet     patch, teamPosition, champion, opponent, games, wins
+    synergy.parquet  patch, champion, ally, games, wins
+
+`wins` counts games `champion` won, so both orientations of a pair are
+stored. Like the champion partials in aggregates.py, the files record which
+part files they include and new parts are added by summing counts; patch
+slices merge the same way.
+
+Matrix loads the tables once into dense count arrays (~170 champions: a few
+hundred KB), after which counters("Ahri") is a column slice plus a sort.
+
+    python matchups.py build
+    python matchups.py counters Ahri --role MIDDLE
+    python matchups.py synergy Thresh --patch 15.19
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aggregates import load_partials, save_partials
+from staging import folded_parts
+
+MATCHUP_DIR = Path("data/processed/matchups")
+ROLES = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+COLUMNS = ["matchId", "patch", "championName", "teamId", "teamPosition", "win"]
+KEYS = {"lane": ["patch", "teamPosition", "champion", "opponent"],
+        "synergy": ["patch", "champion", "ally"]}
+
+
+# ====== PAIR COUNTS ======
+def _read_part(path: Path) -> pd.DataFrame:
+    """Summoner's Rift participant rows of one part file (none if it predates teamPosition)."""
+    names = pq.ParquetFile(path).schema_arrow.names
+    if "teamPosition" not in names:
+        print(f"{path.name}: no teamPosition (staged before it existed); restage to include it")
+        return pd.DataFrame(columns=COLUMNS)
+    df = pq.read_table(path, columns=COLUMNS).to_pandas()
+    return df[df["teamPosition"].isin(ROLES)]
+
+
+def _count(index: np.ndarray, wins: np.ndarray, size: int):
+    """games / wins per flat cell (bulk accumulation, no per-pair Python work)."""
+    return (np.bincount(index, minlength=size),
+            np.bincount(index, weights=wins, minlength=size).astype("int64"))
+
+
+def pair_counts(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Long lane / synergy count tables for participant rows (see _read_part)."""
+    patches, patch_code = np.unique(df["patch"].astype(str).to_numpy(), return_inverse=True)
+    champs, champ_code = np.unique(df["championName"].astype(str).to_numpy(), return_inverse=True)
+    rows = pd.DataFrame({
+        "match": pd.factorize(df["matchId"].astype(str))[0],
+        "team": df["teamId"].to_numpy(dtype="int64", na_value=0),
+        "p": patch_code, "c": champ_code,
+        "r": pd.Categorical(df["teamPosition"].astype(str), categories=ROLES).codes.astype("int64"),
+        "win": df["win"].astype("boolean").fillna(False).to_numpy(dtype=bool),
+    })
+    n_p, n_r, n_c = len(patches), len(ROLES), len(champs)
+    out = {}
+
+    # lane: same match + role, other team (each row is one side of the pair)
+    lane = rows.merge(rows[["match", "r", "team", "c"]], on=["match", "r"], suffixes=("", "_o"))
+    lane = lane[lane["team"] != lane["team_o"]]
+    idx = ((lane["p"].to_numpy() * n_r + lane["r"].to_numpy()) * n_c
+           + lane["c"].to_numpy()) * n_c + lane["c_o"].to_numpy()
+    games, wins = _count(idx, lane["win"].to_numpy(), n_p * n_r * n_c * n_c)
+    nz = np.flatnonzero(games)
+    p, r, a, b = np.unravel_index(nz, (n_p, n_r, n_c, n_c))
+    out["lane"] = pd.DataFrame({"patch": patches[p], "teamPosition": np.array(ROLES)[r],
+                                "champion": champs[a], "opponent": champs[b],
+                                "games": games[nz], "wins": wins[nz]})
+
+    # synergy: same match + team, another player
+    syn = rows.merge(rows[["match", "team", "r", "c"]], on=["match", "team"], suffixes=("", "_o"))
+    syn = syn[syn["r"] != syn["r_o"]]
+    idx = (syn["p"].to_numpy() * n_c + syn["c"].to_numpy()) * n_c + syn["c_o"].to_numpy()
+    games, wins = _count(idx, syn["win"].to_numpy(), n_p * n_c * n_c)
+    nz = np.flatnonzero(games)
+    p, a, b = np.unravel_index(nz, (n_p, n_c, n_c))
+    out["synergy"] = pd.DataFrame({"patch": patches[p], "champion": champs[a], "ally": champs[b],
+                                   "games": games[nz], "wins": wins[nz]})
+    return out
+
+
+def merge_counts(frames: Sequence[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame({**{k: pd.Series(dtype="category") for k in keys},
+                             "games": pd.Series(dtype="int64"), "wins": pd.Series(dtype="int64")})
+    merged = pd.concat([f.astype({k: str for k in keys}) for f in frames], ignore_index=True)
+    out = merged.groupby(keys, as_index=False, sort=True)[["games", "wins"]].sum()
+    # categoricals -> dictionary-encoded columns in Parquet
+    return out.astype({k: "category" for k in keys})
+
+
+# ====== PERSISTENCE ======
+def update_matchups(participant_parts: Sequence[Path], out_dir=MATCHUP_DIR,
+                    rebuild: bool = False) -> Dict[str, int]:
+    """Fold participants part files not included yet into both tables; returns rows per table."""
+    out_dir = Path(out_dir)
+    participant_parts = [Path(p) for p in participant_parts]
+    tables, done = {}, {}
+    for kind in KEYS:
+        path = out_dir / f"{kind}.parquet"
+        tables[kind], done[kind] = load_partials(path) if path.exists() else (None, set())
+    covered, new = folded_parts(participant_parts, done["lane"])
+    # interrupted between the two writes, or a rebuilt staged dataset: start over
+    if rebuild or done["lane"] != done["synergy"] or covered is None:
+        tables, done = {k: None for k in KEYS}, {k: set() for k in KEYS}
+        covered, new = set(), participant_parts
+
+    counts = [pair_counts(_read_part(p)) for p in new]
+    rows = {}
+    for kind, keys in KEYS.items():
+        if new or tables[kind] is None or covered != done[kind]:
+            tables[kind] = merge_counts([tables[kind]] + [c[kind] for c in counts], keys)
+            save_partials(tables[kind], covered | {p.name for p in new}, out_dir / f"{kind}.parquet")
+        rows[kind] = len(tables[kind])
+    return rows
+
+
+# ====== QUERIES ======
+class Matrix:
+    """Dense game / win counts (role x champion x champion) for a set of patches."""
+
+    def __init__(self, out_dir=MATCHUP_DIR, patches: Optional[Sequence[str]] = None):
+        out_dir = Path(out_dir)
+        lane = pq.read_table(out_dir / "lane.parquet").to_pandas()
+        syn = pq.read_table(out_dir / "synergy.parquet").to_pandas()
+        self.patches = sorted(set(lane["patch"].astype(str)) | set(syn["patch"].astype(str)))
+        if patches:
+            lane = lane[lane["patch"].astype(str).isin(patches)]
+            syn = syn[syn["patch"].astype(str).isin(patches)]
+        self.champions = np.array(sorted(set(lane["champion"].astype(str)) | set(syn["champion"].astype(str))))
+        self._code = {c: i for i, c in enumerate(self.champions)}
+        n = len(self.champions)
+
+        r = pd.Categorical(lane["teamPosition"].astype(str), categories=ROLES).codes
+        a, b = self._codes(lane["champion"]), self._codes(lane["opponent"])
+        self.lane_games = np.zeros((len(ROLES), n, n), dtype="int64")
+        self.lane_wins = np.zeros((len(ROLES), n, n), dtype="int64")
+        np.add.at(self.lane_games, (r, a, b), lane["games"].to_numpy())
+        np.add.at(self.lane_wins, (r, a, b), lane["wins"].to_numpy())
+
+        a, b = self._codes(syn["champion"]), self._codes(syn["ally"])
+        self.syn_games = np.zeros((n, n), dtype="int64")
+        self.syn_wins = np.zeros((n, n), dtype="int64")
+        np.add.at(self.syn_games, (a, b), syn["games"].to_numpy())
+        np.add.at(self.syn_wins, (a, b), syn["wins"].to_numpy())
+
+    def _codes(self, names: pd.Series) -> np.ndarray:
+        return np.searchsorted(self.champions, names.astype(str).to_numpy())
+
+    def _lane(self, role: Optional[str]):
+        if role is None:
+            return self.lane_games.sum(axis=0), self.lane_wins.sum(axis=0)
+        i = ROLES.index(role)
+        return self.lane_games[i], self.lane_wins[i]
+
+    @staticmethod
+    def _table(names, games, wins, min_games: int, top: Optional[int], label: str) -> pd.DataFrame:
+        keep = games >= max(1, min_games)
+        out = pd.DataFrame({label: names[keep], "games": games[keep], "wins": wins[keep]})
+        out["winRate"] = 100 * out["wins"] / out["games"]
+        out = out.sort_values(["winRate", "games"], ascending=False, ignore_index=True)
+        return out.head(top) if top else out
+
+    def counters(self, champion: str, role: Optional[str] = None, min_games: int = 5,
+                 top: Optional[int] = 10) -> pd.DataFrame:
+        """Lane opponents with the best win rate against `champion` (their wins)."""
+        if champion not in self._code:
+            return self._table(self.champions[:0], np.zeros(0), np.zeros(0), 1, top, "champion")
+        games, wins = self._lane(role)
+        x = self._code[champion]
+        return self._table(self.champions, games[:, x], wins[:, x], min_games, top, "champion")
+
+    def matchup(self, champion: str, opponent: str, role: Optional[str] = None) -> dict:
+        games, wins = self._lane(role)
+        a, b = self._code.get(champion), self._code.get(opponent)
+        g = int(games[a, b]) if a is not None and b is not None else 0
+        w = int(wins[a, b]) if g else 0
+        return {"games": g, "wins": w, "winRate": 100 * w / g if g else None}
+
+    def synergy(self, champion: str, min_games: int = 5, top: Optional[int] = 10) -> pd.DataFrame:
+        """Teammates `champion` wins most with."""
+        if champion not in self._code:
+            return self._table(self.champions[:0], np.zeros(0), np.zeros(0), 1, top, "ally")
+        x = self._code[champion]
+        return self._table(self.champions, self.syn_games[x], self.syn_wins[x], min_games, top, "ally")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Champion matchup and synergy matrices")
+    ap.add_argument("--out", default=str(MATCHUP_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="fold new participants part files into the matrices")
+    b.add_argument("--participants", default="data/staged/participants")
+    b.add_argument("--rebuild", action="store_true")
+    for name in ("counters", "synergy"):
+        q = sub.add_parser(name)
+        q.add_argument("champion")
+        q.add_argument("--patch", action="append", help="limit to patch(es), e.g. 15.19")
+        q.add_argument("--min-games", type=int, default=5)
+        q.add_argument("--top", type=int, default=10)
+        if name == "counters":
+            q.add_argument("--role", choices=ROLES)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        parts = sorted(Path(args.participants).glob("part-*.parquet"))
+        print(update_matchups(parts, args.out, rebuild=args.rebuild))
+    else:
+        m = Matrix(args.out, args.patch)
+        if args.cmd == "counters":
+            print(m.counters(args.champion, args.role, args.min_games, args.top).to_string(index=False))
+        else:
+            print(m.synergy(args.champion, args.min_games, args.top).to_string(index=False))
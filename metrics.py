@@ -0,0 +1,235 @@
+# metrics.py
+"""
+Structured run metrics for the pipeline.
+
+One Metrics object per run collects:
+
+ - stages: wall time per stage plus the rows / bytes it handled, so the
+   report has rows/s and bytes/s (`with metrics.stage("stage") as st:`)
+ - counters with labels: requests by method and status, retries, cache
+   hits / misses, uploaded objects and bytes
+ - histograms: request and upload latencies in fixed buckets (cumulative,
+   as Prometheus expects), with p50/p95/p99 estimates in the JSON report
+ - rate-limit waits, as a counter of seconds spent blocked in the limiter
+
+Components take an optional `metrics=` and record nothing without it.
+save() writes the report as JSON and in the Prometheus text format
+(data/metrics/run-<time>.json / .prom, plus latest.prom for a textfile
+collector).
+
+Profiling: with `profile_dir` set (riot.py: PIPELINE_PROFILE=<dir>), every
+stage runs under cProfile and is dumped to <dir>/<stage>.prof (view with
+`python -m pstats` or snakeviz). cProfile only sees the thread that runs the
+stage; download and upload threads are named riot-dl-* / s3-*, so for those
+use `py-spy record -o flame.svg -- python riot.py`. Staging workers are
+separate processes: profile staging with STAGE_WORKERS = 1.
+"""
+
+import bisect
+import cProfile
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+METRICS_DIR = Path("data/metrics")
+PREFIX = "lol_pipeline"
+
+# seconds; request latencies against Riot are 50 ms - 2 s, S3 PUTs up to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)     # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket (like histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lo = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lo
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            total += n
+            yield bound, total
+
+
+class Metrics:
+    def __init__(self, profile_dir=None):
+        self.started = time.time()
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.stages: Dict[str, dict] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    # --- recording ---
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def cache(self, name: str, hits: int = 0, misses: int = 0) -> None:
+        if hits:
+            self.inc("cache_requests", hits, cache=name, result="hit")
+        if misses:
+            self.inc("cache_requests", misses, cache=name, result="miss")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage; the block may set st["rows"] / st["bytes"]."""
+        st = {"rows": 0, "bytes": 0}
+        prof = None
+        if self.profile_dir:
+            prof = cProfile.Profile()
+            prof.enable()
+        t0 = time.perf_counter()
+        try:
+            yield st
+        finally:
+            seconds = time.perf_counter() - t0
+            if prof:
+                prof.disable()
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                prof.dump_stats(str(self.profile_dir / f"{name}.prof"))
+            st["seconds"] = round(seconds, 3)
+            st["rows_per_s"] = round(st["rows"] / seconds, 1) if seconds and st["rows"] else None
+            st["bytes_per_s"] = round(st["bytes"] / seconds) if seconds and st["bytes"] else None
+            with self._lock:
+                self.stages[name] = st
+            print(f"[metrics] {name}: {seconds:.2f}s"
+                  + (f", {st['rows']} rows ({st['rows_per_s']}/s)" if st["rows"] else ""))
+
+    # --- reading ---
+    def counter(self, name: str, **labels) -> float:
+        """Sum of `name` over every label set matching `labels`."""
+        want = set(_labels(labels))
+        with self._lock:
+            return sum(v for (n, ls), v in self.counters.items() if n == name and want <= set(ls))
+
+    def report(self) -> dict:
+        with self._lock:
+            counters = [{"name": n, "labels": dict(ls), "value": v}
+                        for (n, ls), v in sorted(self.counters.items())]
+            histograms = [{"name": n, "labels": dict(ls), "count": h.count, "sum": round(h.sum, 4),
+                           "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                          for (n, ls), h in sorted(self.histograms.items())]
+            stages = dict(self.stages)
+        caches = {}
+        for c in counters:
+            if c["name"] == "cache_requests":
+                entry = caches.setdefault(c["labels"]["cache"], {"hits": 0, "misses": 0})
+                entry["hits" if c["labels"]["result"] == "hit" else "misses"] += c["value"]
+        for entry in caches.values():
+            total = entry["hits"] + entry["misses"]
+            entry["hit_rate"] = round(entry["hits"] / total, 4) if total else None
+        return {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": round(time.time() - self.started, 3), "stages": stages,
+                "caches": caches, "counters": counters, "histograms": histograms}
+
+    def prometheus(self, prefix: str = PREFIX) -> str:
+        """The report in the Prometheus text exposition format."""
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            ls = labels + extra
+            if not ls:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in ls) + "}"
+
+        lines = []
+        with self._lock:
+            stages = dict(self.stages)
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        for field, help_ in (("seconds", "wall time"), ("rows", "rows handled"),
+                             ("bytes", "bytes handled")):
+            lines += [f"# HELP {prefix}_stage_{field} Stage {help_}.",
+                      f"# TYPE {prefix}_stage_{field} gauge"]
+            lines += [f'{prefix}_stage_{field}{{stage="{s}"}} {st[field]}' for s, st in stages.items()]
+        typed = set()
+        for (name, ls), v in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                typed.add(name)
+            lines.append(f"{prefix}_{name}_total{fmt(ls)} {v:g}")
+        for (name, ls), h in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                typed.add(name)
+            for bound, n in h.cumulative():
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f"{prefix}_{name}_bucket{fmt(ls, (('le', le),))} {n}")
+            lines.append(f"{prefix}_{name}_sum{fmt(ls)} {h.sum:.6f}")
+            lines.append(f"{prefix}_{name}_count{fmt(ls)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, out_dir=METRICS_DIR) -> Path:
+        """Write run-<time>.json, run-<time>.prom and latest.prom; returns the JSON path."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        name = "run-" + time.strftime("%Y%m%dT%H%M%S", time.localtime(self.started))
+        prom = self.prometheus()
+        for path, text in ((out_dir / f"{name}.json", json.dumps(self.report(), indent=2)),
+                           (out_dir / f"{name}.prom", prom), (out_dir / "latest.prom", prom)):
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(text)
+            os.replace(tmp, path)
+        return out_dir / f"{name}.json"
+
+    def summary(self) -> str:
+        """One line per stage plus request / cache totals, for the end of a run."""
+        rep = self.report()
+        lines = [f"{s:<12} {st['seconds']:>8.2f}s"
+                 + (f"  {st['rows_per_s']:>10}/s rows" if st["rows_per_s"] else "")
+                 + (f"  {st['bytes_per_s'] / 1e6:>8.2f} MB/s" if st["bytes_per_s"] else "")
+                 for s, st in rep["stages"].items()]
+        for h in rep["histograms"]:
+            if h["name"] == "request_seconds":
+                lines.append(f"requests[{h['labels'].get('method')}] n={h['count']} "
+                             f"p50={h['p50'] or 0:.3f}s p95={h['p95'] or 0:.3f}s")
+        lines.append(f"429s={self.counter('requests', status='429'):g} "
+                     f"retries={self.counter('retries'):g} "
+                     f"rate-limit wait={self.counter('rate_limit_wait_seconds'):.1f}s")
+        s3_bytes = self.counter("s3_bytes")
+        if s3_bytes:
+            busy = sum(h["sum"] for h in rep["histograms"] if h["name"] == "s3_upload_seconds")
+            lines.append(f"s3: {s3_bytes / 1e6:.1f} MB in {self.counter('s3_uploads', result='uploaded'):g} "
+                         f"objects" + (f", {s3_bytes / 1e6 / busy:.1f} MB/s per upload" if busy else ""))
+        for cache, c in rep["caches"].items():
+            lines.append(f"cache[{cache}] hit rate {c['hit_rate']:.0%} ({c['hits']:g}/{c['hits'] + c['misses']:g})")
+        return "\n".join(lines)
@@ -0,0 +1,315 @@
+# mock_riot.py
+"""
+Local stand-in for the Riot match-v5 API, for exercising the downloader
+without a key.
+
+Serves /lol/match/v5/matches/{id}, .../{id}/timeline and
+.../by-puuid/{puuid}/ids from a dict of match JSON, a data/raw/matches
+style directory or a RawStore (served as stored, without re-encoding, so a
+synthetic store of 100k+ matches needs no memory per match) and enforces app rate limits the way Riot does: fixed
+windows that start at the first request, the X-App-Rate-Limit /
+X-App-Rate-Limit-Count headers on every response and a 429 with Retry-After
+when a window is exceeded. Timelines are served from
+`timelines` when given, otherwise synthesized from the match (per-minute
+frames that end at the participants' final stats, plus kill, monster and
+building events).
+
+    python mock_riot.py --matches data/raw/matches --port 8080 --limits 20:1,100:120
+    python mock_riot.py --store /tmp/synth/store --limits 10000:1
+"""
+
+import argparse
+import json
+import math
+import re
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from ratelimit import parse_limits
+from raw_store import RawStore
+
+IDS_RE = re.compile(r"^/lol/match/v5/matches/by-puuid/([^/]+)/ids$")
+MATCH_RE = re.compile(r"^/lol/match/v5/matches/([^/]+)$")
+TIMELINE_RE = re.compile(r"^/lol/match/v5/matches/([^/]+)/timeline$")
+
+
+def load_match_dir(path) -> Dict[str, dict]:
+    matches = {}
+    for f in sorted(Path(path).glob("*.json")):
+        with open(f) as fp:
+            m = json.load(fp)
+        matches[m["metadata"]["matchId"]] = m
+    return matches
+
+
+def synthetic_timeline(match: dict) -> dict:
+    """A plausible timeline for `match` (deterministic per matchId)."""
+    info = match["info"]
+    mid = match["metadata"]["matchId"]
+    rng = random.Random(zlib.crc32(mid.encode()))
+    parts = info.get("participants", [])
+    duration_ms = int(info.get("gameDuration", 1800)) * 1000
+    stamps = list(range(0, duration_ms, 60000)) + [duration_ms]
+    frames = []
+    for ts in stamps:
+        progress = ts / duration_ms if duration_ms else 1.0
+        pframes = {}
+        for p in parts:
+            share = progress ** 1.15
+            cs = int(p.get("totalMinionsKilled", 0) * share)
+            pframes[str(p["participantId"])] = {
+                "participantId": p["participantId"],
+                "totalGold": 500 + int((p.get("goldEarned", 500) - 500) * share),
+                "currentGold": rng.randint(0, 1500),
+                "xp": int(p.get("champExperience", 0) * share),
+                "level": max(1, int(p.get("champLevel", 18) * progress ** 0.6)),
+                "minionsKilled": cs,
+                "jungleMinionsKilled": int(p.get("neutralMinionsKilled", 0) * share),
+                "damageStats": {"totalDamageDoneToChampions":
+                                int(p.get("totalDamageDealtToChampions", 0) * share)},
+                "position": {"x": rng.randint(0, 14800), "y": rng.randint(0, 14800)},
+            }
+        frames.append({"timestamp": ts, "participantFrames": pframes, "events": []})
+
+    def event(ts, ev):
+        ev["timestamp"] = ts
+        frames[min(len(frames) - 1, ts // 60000 + 1)]["events"].append(ev)
+
+    by_team = {100: [p for p in parts if p.get("teamId") == 100],
+               200: [p for p in parts if p.get("teamId") == 200]}
+    for p in parts:
+        enemies = by_team.get(300 - p.get("teamId", 100)) or parts
+        for _ in range(p.get("kills", 0)):
+            victim = rng.choice(enemies)
+            event(rng.randint(90_000, duration_ms), {"type": "CHAMPION_KILL",
+                  "killerId": p["participantId"], "victimId": victim["participantId"]})
+    for team in info.get("teams", []):
+        tid, obj = team.get("teamId"), team.get("objectives", {})
+        killer = (by_team.get(tid) or parts or [{"participantId": 0}])[0]["participantId"]
+        for key, monster, lo in (("dragon", "DRAGON", 300_000), ("riftHerald", "RIFTHERALD", 840_000),
+                                 ("baron", "BARON_NASHOR", 1_200_000), ("horde", "HORDE", 360_000)):
+            for _ in range(obj.get(key, {}).get("kills", 0)):
+                event(rng.randint(lo, max(lo, duration_ms)), {"type": "ELITE_MONSTER_KILL",
+                      "killerId": killer, "killerTeamId": tid, "monsterType": monster})
+        for key, building in (("tower", "TOWER_BUILDING"), ("inhibitor", "INHIBITOR_BUILDING")):
+            for _ in range(obj.get(key, {}).get("kills", 0)):
+                # the event's teamId is the team that owned the building
+                event(rng.randint(480_000, max(480_000, duration_ms)), {"type": "BUILDING_KILL",
+                      "killerId": killer, "teamId": 300 - tid, "buildingType": building})
+    for f in frames:
+        f["events"].sort(key=lambda e: e["timestamp"])
+    return {
+        "metadata": {"dataVersion": "2", "matchId": mid,
+                     "participants": match["metadata"].get("participants", [])},
+        "info": {"frameInterval": 60000, "gameId": info.get("gameId"), "frames": frames,
+                 "participants": [{"participantId": p["participantId"], "puuid": p.get("puuid")}
+                                  for p in parts]},
+    }
+
+
+class FixedWindows:
+    """Server-side counter: each window resets `seconds` after its first hit."""
+
+    def __init__(self, limits: str):
+        self.limits = parse_limits(limits)
+        self.header = limits
+        self._lock = threading.Lock()
+        self._state = {s: [0.0, 0] for _, s in self.limits}   # seconds -> [window_start, count]
+
+    def hit(self):
+        """Count one request. Returns (allowed, retry_after, count_header)."""
+        with self._lock:
+            now = time.monotonic()
+            retry_after = 0.0
+            for limit, seconds in self.limits:
+                state = self._state[seconds]
+                if now - state[0] >= seconds:
+                    state[0], state[1] = now, 0
+                if state[1] >= limit:
+                    retry_after = max(retry_after, state[0] + seconds - now)
+            if retry_after <= 0:
+                for _, seconds in self.limits:
+                    self._state[seconds][1] += 1
+            counts = ",".join(f"{self._state[s][1]}:{s}" for _, s in self.limits)
+            return retry_after <= 0, retry_after, counts
+
+
+class MockRiotServer:
+    def __init__(self, matches: Optional[Dict[str, dict]] = None, match_dir=None,
+                 app_limits: str = "20:1,100:120", latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0,
+                 timelines: Optional[Dict[str, dict]] = None,
+                 store: Optional[RawStore] = None):
+        self.matches = dict(matches or {})
+        self.store = store
+        self.timelines = dict(timelines or {})
+        if match_dir is not None:
+            self.matches.update(load_match_dir(match_dir))
+        self.windows = FixedWindows(app_limits)
+        self.latency = latency
+        self.stats = {"requests": 0, "429": 0, "200": 0, "404": 0}
+        self._stats_lock = threading.Lock()
+        self._by_puuid = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_match(self, match: dict) -> None:
+        self.matches[match["metadata"]["matchId"]] = match
+        self._by_puuid = None
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.matches or (self.store is not None and match_id in self.store)
+
+    def match(self, match_id: str) -> dict:
+        if match_id in self.matches:
+            return self.matches[match_id]
+        return self.store.get(match_id)
+
+    def match_bytes(self, match_id: str) -> bytes:
+        if match_id in self.matches:
+            return json.dumps(self.matches[match_id]).encode()
+        return self.store.get_bytes(match_id)
+
+    def _all_matches(self):
+        yield from self.matches.values()
+        if self.store is not None:
+            for m in self.store.iter_matches():
+                if m["metadata"]["matchId"] not in self.matches:
+                    yield m
+
+    def _puuid_index(self):
+        # puuid -> [(gameCreation seconds, matchId, queueId)] newest first;
+        # built on the first ID request (one pass over a store)
+        if self._by_puuid is None:
+            index = {}
+            for m in self._all_matches():
+                info = m.get("info", {})
+                entry = (info.get("gameCreation", 0) // 1000, m["metadata"]["matchId"],
+                         info.get("queueId"))
+                for puuid in m.get("metadata", {}).get("participants", []):
+                    index.setdefault(puuid, []).append(entry)
+            for v in index.values():
+                v.sort(reverse=True)
+            self._by_puuid = index
+        return self._by_puuid
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"     # keep-alive, like the real API
+            disable_nagle_algorithm = True    # headers and body go out as separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                if isinstance(body, bytes):
+                    payload = body
+                else:
+                    payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                server._count("requests")
+                allowed, retry_after, counts = server.windows.hit()
+                headers = {"X-App-Rate-Limit": server.windows.header,
+                           "X-App-Rate-Limit-Count": counts}
+                if not allowed:
+                    server._count("429")
+                    headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                    headers["X-Rate-Limit-Type"] = "application"
+                    return self._send(429, {"status": {"message": "Rate limit exceeded",
+                                                       "status_code": 429}}, headers)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                url = urlparse(self.path)
+                qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+                m = IDS_RE.match(url.path)
+                if m:
+                    entries = server._puuid_index().get(m.group(1), [])
+                    lo = int(qs.get("startTime", 0))
+                    hi = int(qs.get("endTime", 2 ** 62))
+                    if "queue" in qs:
+                        q = int(qs["queue"])
+                        entries = [e for e in entries if e[2] == q]
+                    ids = [mid for created, mid, _ in entries if lo <= created <= hi]
+                    start, count = int(qs.get("start", 0)), int(qs.get("count", 20))
+                    server._count("200")
+                    return self._send(200, ids[start:start + count], headers)
+                m = TIMELINE_RE.match(url.path)
+                if m and m.group(1) in server:
+                    mid = m.group(1)
+                    server._count("200")
+                    timeline = server.timelines.get(mid) or synthetic_timeline(server.match(mid))
+                    return self._send(200, timeline, headers)
+                m = MATCH_RE.match(url.path)
+                if m and m.group(1) in server:
+                    server._count("200")
+                    return self._send(200, server.match_bytes(m.group(1)), headers)
+                server._count("404")
+                return self._send(404, {"status": {"message": "Data not found",
+                                                   "status_code": 404}}, headers)
+
+        return Handler
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local mock of the Riot match-v5 API")
+    ap.add_argument("--matches", default="data/raw/matches")
+    ap.add_argument("--store", help="serve a raw store (e.g. from synth.py) instead")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--limits", default="20:1,100:120")
+    ap.add_argument("--latency", type=float, default=0.0)
+    args = ap.parse_args()
+    if args.store:
+        srv = MockRiotServer(store=RawStore(args.store), app_limits=args.limits,
+                             latency=args.latency, port=args.port)
+    else:
+        srv = MockRiotServer(match_dir=args.matches, app_limits=args.limits,
+                             latency=args.latency, port=args.port)
+    n = len(srv.matches) + (len(srv.store) if srv.store is not None else 0)
+    print(f"Mock Riot API with {n} matches on {srv.base_url} (limits {args.limits})")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        srv.stop()
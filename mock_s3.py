@@ -0,0 +1,133 @@
+# mock_s3.py
+"""
+Local stand-in for the S3 client calls the pipeline makes, backed by a
+directory (one file per object under <root>/<bucket>/<key>).
+
+Pass it to S3Uploader as `client=` to run uploads without AWS:
+
+    from mock_s3 import LocalS3
+    uploader = S3Uploader("my-bucket", client=LocalS3("/tmp/s3"), cache_path=None)
+
+ETags are the ones S3 would report (s3_upload.s3_etag, multipart form for
+large files), so the skip-if-unchanged logic behaves as against the real
+thing. `latency` (seconds per request) and `bandwidth` (MB/s per transfer)
+simulate a remote endpoint for benchmarks.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from s3_upload import DEFAULT_TRANSFER, MB, s3_etag
+
+
+def _not_found(op: str, key: str) -> ClientError:
+    return ClientError({"Error": {"Code": "404", "Message": f"Not Found: {key}"}}, op)
+
+
+class LocalS3:
+    def __init__(self, root, latency: float = 0.0, bandwidth: Optional[float] = None):
+        self.root = Path(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.stats = {"requests": 0, "puts": 0, "bytes": 0}
+        self._etags: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def _request(self, put_bytes: int = 0) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+        delay = self.latency + (put_bytes / (self.bandwidth * MB) if self.bandwidth else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def _stored(self, bucket: str, key: str, tmp: Path, etag: str) -> None:
+        dst = self._path(bucket, key)
+        os.replace(tmp, dst)
+        with self._lock:
+            self._etags[f"{bucket}/{key}"] = etag
+            self.stats["puts"] += 1
+            self.stats["bytes"] += dst.stat().st_size
+
+    def _tmp(self, bucket: str, key: str) -> Path:
+        dst = self._path(bucket, key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        return dst.with_name(f".{dst.name}.{threading.get_ident()}.tmp")
+
+    # --- boto3-compatible calls ---
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        self._request()
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("HeadObject", Key)
+        etag = self._etags.get(f"{Bucket}/{Key}") or s3_etag(path)
+        return {"ETag": f'"{etag}"', "ContentLength": path.stat().st_size}
+
+    def upload_file(self, Filename, Bucket: str, Key: str, ExtraArgs=None, Callback=None,
+                    Config=None) -> None:
+        size = os.path.getsize(Filename)
+        self._request(size)
+        tmp = self._tmp(Bucket, Key)
+        shutil.copyfile(Filename, tmp)
+        self._stored(Bucket, Key, tmp, s3_etag(tmp, Config or DEFAULT_TRANSFER))
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs=None, Callback=None,
+                       Config=None) -> None:
+        tmp = self._tmp(Bucket, Key)
+        with open(tmp, "wb") as f:
+            shutil.copyfileobj(Fileobj, f)
+        self._request(tmp.stat().st_size)
+        self._stored(Bucket, Key, tmp, s3_etag(tmp, Config or DEFAULT_TRANSFER))
+
+    def put_object(self, Bucket: str, Key: str, Body=b"", **kwargs) -> dict:
+        data = Body.encode() if isinstance(Body, str) else Body
+        data = data.read() if hasattr(data, "read") else data
+        self._request(len(data))
+        tmp = self._tmp(Bucket, Key)
+        tmp.write_bytes(data)
+        etag = hashlib.md5(data).hexdigest()
+        self._stored(Bucket, Key, tmp, etag)
+        return {"ETag": f'"{etag}"'}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            self._request()
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        data = path.read_bytes()
+        self._request(len(data))
+        return {"Body": io.BytesIO(data), "ContentLength": len(data),
+                "ETag": self.head_object(Bucket, Key)["ETag"]}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **kwargs) -> dict:
+        self._request()
+        base = self.root / Bucket
+        contents = []
+        if base.is_dir():
+            for path in sorted(base.rglob("*")):
+                key = path.relative_to(base).as_posix()
+                if path.is_file() and key.startswith(Prefix) and not path.name.endswith(".tmp"):
+                    contents.append({"Key": key, "Size": path.stat().st_size})
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+
+    def delete_objects(self, Bucket: str, Delete: dict, **kwargs) -> dict:
+        self._request()
+        deleted = []
+        for obj in Delete.get("Objects", []):
+            path = self._path(Bucket, obj["Key"])
+            if path.is_file():
+                path.unlink()
+            with self._lock:
+                self._etags.pop(f"{Bucket}/{obj['Key']}", None)
+            deleted.append({"Key": obj["Key"]})
+        return {} if Delete.get("Quiet") else {"Deleted": deleted}
@@ -0,0 +1,280 @@
+# query.py
+"""
+Query layer over the staged Parquet (Arrow datasets), for app.py and ad-hoc use.
+
+Nothing is loaded whole: filters (champion, patch, queue, date range, matchId)
+become dataset expressions, so the Parquet scan skips row groups by their
+statistics and only reads the projected columns; aggregations run batch by
+batch and merge their partial sums, so memory is bounded by the number of
+groups, not the number of participant rows.
+
+Both staged layouts are read: the incremental part directories
+(data/staged/participants/part-*.parquet) and the older single files. Date
+filters are resolved against the (10x smaller) matches table first. When
+data/lake (lake.py) is in sync with data/staged, the partitioned copy is read
+instead, and patch / queue / date filters skip whole partition directories.
+
+sql() runs DuckDB SQL over the same datasets when duckdb is installed:
+
+    python query.py champions --patch 15.19 --queue 420
+    python query.py match KR_7667898191
+    python query.py sql "select championName, count(*) from participants group by 1"
+"""
+
+import argparse
+from datetime import timezone
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import lake
+from aggregates import load_partials, summarize
+
+STAGED_DIR = Path("data/staged")
+PROCESSED_DIR = Path("data/processed")
+
+# metrics averaged by champion_breakdown()
+BREAKDOWN_METRICS = ["kills", "deaths", "assists", "goldEarned", "KDA_ratio", "CS_per_min",
+                     "DMG_per_min", "Vision_per_min"]
+
+Many = Optional[Union[str, int, Sequence]]
+
+
+# ====== DATASETS ======
+def _source(staged_dir, name: str) -> Path:
+    staged_dir = Path(staged_dir)
+    parts = staged_dir / name
+    return parts if parts.is_dir() and any(parts.glob("part-*.parquet")) else staged_dir / f"{name}.parquet"
+
+
+def _dataset(staged_dir, name: str) -> ds.Dataset:
+    # the partitioned lake (lake.py) when it is in sync: patch / queue / date filters
+    # then skip whole directories
+    if lake.fresh(staged_dir):
+        return lake.dataset(name, lake.lake_dir_for(staged_dir))
+    return ds.dataset(_source(staged_dir, name), format="parquet")
+
+
+def participants_dataset(staged_dir=STAGED_DIR) -> ds.Dataset:
+    return _dataset(staged_dir, "participants")
+
+
+def matches_dataset(staged_dir=STAGED_DIR) -> ds.Dataset:
+    return _dataset(staged_dir, "matches")
+
+
+# ====== FILTERS ======
+def _many(v) -> Optional[list]:
+    if v is None:
+        return None
+    return [v] if isinstance(v, (str, int)) else list(v)
+
+
+def _epoch_ms(t) -> int:
+    if isinstance(t, (int, float)):
+        return int(t)
+    ts = pd.Timestamp(t)
+    ts = ts.tz_localize(timezone.utc) if ts.tzinfo is None else ts
+    return int(ts.timestamp() * 1000)
+
+
+def _day(t) -> str:
+    return pd.Timestamp(_epoch_ms(t), unit="ms").strftime("%Y-%m-%d")
+
+
+def match_ids_between(start=None, end=None, staged_dir=STAGED_DIR) -> pa.Array:
+    """matchIds whose gameCreation falls in [start, end) (datetimes, strings or epoch ms)."""
+    expr = None
+    if start is not None:
+        expr = pc.field("gameCreation") >= _epoch_ms(start)
+    if end is not None:
+        e = pc.field("gameCreation") < _epoch_ms(end)
+        expr = e if expr is None else expr & e
+    t = matches_dataset(staged_dir).to_table(columns=["matchId"], filter=expr)
+    return t.column("matchId").combine_chunks().cast(pa.string())
+
+
+def build_filter(dataset: ds.Dataset, champion: Many = None, patch: Many = None,
+                 queue: Many = None, match_id: Many = None,
+                 start=None, end=None, staged_dir=STAGED_DIR) -> Optional[ds.Expression]:
+    """AND of the given filters, as an expression the Parquet scan can push down."""
+    names = dataset.schema.names
+    terms = []
+    if _many(champion) is not None:
+        terms.append(pc.field("championName").isin(_many(champion)))
+    if _many(queue) is not None:
+        terms.append(pc.field("queueId").isin([int(q) for q in _many(queue)]))
+    if _many(patch) is not None:
+        if "patch" in names:
+            terms.append(pc.field("patch").isin(_many(patch)))
+        else:   # tables staged before the patch column: match the gameVersion prefix
+            ors = [pc.starts_with(pc.field("gameVersion"), f"{p}.") for p in _many(patch)]
+            terms.append(_or(ors))
+    if _many(match_id) is not None:
+        terms.append(pc.field("matchId").isin(_many(match_id)))
+    if start is not None or end is not None:
+        if "date" in names:     # lake partition: prunes directories before the exact filter
+            if start is not None:
+                terms.append(pc.field("date") >= _day(start))
+            if end is not None:
+                terms.append(pc.field("date") <= _day(end))
+        if "gameCreation" in names:
+            if start is not None:
+                terms.append(pc.field("gameCreation") >= _epoch_ms(start))
+            if end is not None:
+                terms.append(pc.field("gameCreation") < _epoch_ms(end))
+        else:
+            terms.append(pc.field("matchId").isin(match_ids_between(start, end, staged_dir)))
+    if not terms:
+        return None
+    expr = terms[0]
+    for t in terms[1:]:
+        expr = expr & t
+    return expr
+
+
+def _or(exprs: List[ds.Expression]) -> ds.Expression:
+    out = exprs[0]
+    for e in exprs[1:]:
+        out = out | e
+    return out
+
+
+# ====== QUERIES ======
+def scan(columns: Optional[Sequence[str]] = None, staged_dir=STAGED_DIR, table: str = "participants",
+         **filters) -> pd.DataFrame:
+    """Filtered, column-pruned read of one staged table into pandas."""
+    dataset = participants_dataset(staged_dir) if table == "participants" else matches_dataset(staged_dir)
+    expr = build_filter(dataset, staged_dir=staged_dir, **filters)
+    cols = [c for c in columns if c in dataset.schema.names] if columns else None
+    return dataset.to_table(columns=cols, filter=expr).to_pandas()
+
+
+def champion_breakdown(by: Sequence[str] = ("championName",), staged_dir=STAGED_DIR,
+                       metrics: Sequence[str] = BREAKDOWN_METRICS,
+                       batch_size: int = 256_000, **filters) -> pd.DataFrame:
+    """games, wins, winRate and mean metrics per `by` group over the filtered rows.
+
+    Each scanned batch is grouped on its own and the partial sums/counts are
+    merged, so the full participants table is never materialized.
+    """
+    dataset = participants_dataset(staged_dir)
+    names = dataset.schema.names
+    by = list(by)
+    metrics = [m for m in metrics if m in names]
+    expr = build_filter(dataset, staged_dir=staged_dir, **filters)
+    aggs = [("games", "sum"), ("wins", "sum")]
+    for m in metrics:
+        aggs += [(m, "sum"), (m, "count")]
+
+    partials = []
+    for batch in dataset.to_batches(columns=by + ["win"] + metrics, filter=expr,
+                                    batch_size=batch_size):
+        if not batch.num_rows:
+            continue
+        # plain keys: dictionaries differ between batches and files
+        cols = {k: batch.column(k).cast(pa.int64() if k == "queueId" else pa.string()) for k in by}
+        cols["games"] = pa.repeat(pa.scalar(1, pa.int64()), batch.num_rows)
+        cols["wins"] = pc.fill_null(batch.column("win"), False).cast(pa.int64())
+        for m in metrics:
+            cols[m] = batch.column(m).cast(pa.float64())
+        partials.append(pa.table(cols).group_by(by).aggregate(aggs))
+
+    if not partials:
+        return pd.DataFrame(columns=by + ["games", "wins", "winRate"] + metrics)
+    # merge: sums of sums, sums of counts
+    merged = pa.concat_tables(partials)
+    names_after = [c for c in merged.column_names if c not in by]
+    total = merged.group_by(by).aggregate([(c, "sum") for c in names_after]).to_pandas()
+    # second-level sums are named "<first-level name>_sum"
+    total.columns = [c[:-len("_sum")] if c not in by else c for c in total.columns]
+
+    out = total[by].copy()
+    out["games"] = total["games_sum"].astype("int64")
+    out["wins"] = total["wins_sum"].astype("int64")
+    out["winRate"] = 100 * out["wins"] / out["games"]
+    for m in metrics:
+        out[m] = total[f"{m}_sum"] / total[f"{m}_count"].replace(0, float("nan"))
+    return out.sort_values("games", ascending=False, ignore_index=True)
+
+
+def match_participants(match_id: str, staged_dir=STAGED_DIR,
+                       columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Every participant row of one match (pushdown on matchId)."""
+    return scan(columns, staged_dir, match_id=match_id)
+
+
+def match_row(match_id: str, staged_dir=STAGED_DIR) -> Optional[dict]:
+    df = scan(None, staged_dir, table="matches", match_id=match_id)
+    return df.iloc[0].to_dict() if len(df) else None
+
+
+def distinct(column: str, staged_dir=STAGED_DIR, table: str = "matches") -> list:
+    """Sorted distinct values of one column (reads that column only)."""
+    dataset = participants_dataset(staged_dir) if table == "participants" else matches_dataset(staged_dir)
+    if column not in dataset.schema.names:
+        return []
+    col = dataset.to_table(columns=[column]).column(column)
+    if pa.types.is_dictionary(col.type):
+        col = col.cast(col.type.value_type)
+    return sorted(v for v in pc.unique(col).to_pylist() if v is not None)
+
+
+def champion_summary(patch: Many = None, queue: Many = None,
+                     processed_dir=PROCESSED_DIR) -> pd.DataFrame:
+    """Champion summary sliced by patch/queue from the stored partials (data/processed)."""
+    partials, _ = load_partials(Path(processed_dir) / "champion_partials.parquet")
+    return summarize(partials, patch=_many(patch), queue=_many(queue))
+
+
+# ====== SQL ======
+def sql(query: str, staged_dir=STAGED_DIR) -> pd.DataFrame:
+    """Run DuckDB SQL with `participants` and `matches` bound to the staged datasets.
+
+    DuckDB pushes WHERE clauses and column selection into the Arrow dataset scan.
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("sql() needs duckdb (pip install duckdb); "
+                          "the other queries only need pyarrow") from e
+    con = duckdb.connect()
+    con.register("participants", participants_dataset(staged_dir))
+    con.register("matches", matches_dataset(staged_dir))
+    try:
+        return con.execute(query).df()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query the staged Parquet without loading it")
+    ap.add_argument("--staged", default=str(STAGED_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("champions", help="per-champion breakdown with filters")
+    c.add_argument("--champion", action="append")
+    c.add_argument("--patch", action="append")
+    c.add_argument("--queue", type=int, action="append")
+    c.add_argument("--start", help="date, e.g. 2025-06-01")
+    c.add_argument("--end")
+    c.add_argument("--by", default="championName")
+    m = sub.add_parser("match", help="participants of one match")
+    m.add_argument("match_id")
+    s = sub.add_parser("sql")
+    s.add_argument("query")
+    args = ap.parse_args()
+
+    pd.set_option("display.width", 200)
+    if args.cmd == "champions":
+        out = champion_breakdown(by=args.by.split(","), staged_dir=args.staged,
+                                 champion=args.champion, patch=args.patch, queue=args.queue,
+                                 start=args.start, end=args.end)
+        print(out.head(30).to_string(index=False))
+    elif args.cmd == "match":
+        print(match_participants(args.match_id, args.staged).to_string(index=False))
+    else:
+        print(sql(args.query, args.staged).to_string(index=False))
@@ -0,0 +1,137 @@
+# ratelimit.py
+"""
+Client-side limiter for the Riot API rate limits.
+
+Riot enforces several windows at once per key, e.g. a development key has
+`20:1,100:120` (20 requests per second AND 100 per two minutes), announced in
+the `X-App-Rate-Limit` header, with the server-side count in
+`X-App-Rate-Limit-Count`. Each window is tracked as a sliding log of request
+completion times, so no window of the server's can ever see more than `limit`
+requests from us, and in-flight requests always count against every window.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# development key defaults; the first response header replaces these
+DEFAULT_APP_LIMITS = "20:1,100:120"
+
+
+def parse_limits(header: Optional[str]) -> List[Tuple[int, int]]:
+    """'20:1,100:120' -> [(20, 1), (100, 120)]  (requests, seconds)."""
+    limits = []
+    for part in (header or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        count, seconds = part.split(":")
+        limits.append((int(count), int(seconds)))
+    return limits
+
+
+class RateLimiter:
+    """Thread-safe multi-window limiter.
+
+    acquire() blocks until every window has room, release() stamps the
+    completion time.  `margin` (seconds) is added to each window to absorb
+    clock/latency skew between us and the server.
+    """
+
+    def __init__(self, limits: str = DEFAULT_APP_LIMITS, margin: float = 0.1,
+                 clock=time.monotonic):
+        self.margin = margin
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._windows: Dict[int, Tuple[int, deque]] = {}
+        self.total_wait = 0.0     # seconds spent blocked in acquire()
+        self.set_limits(limits)
+
+    # --- configuration ---
+    def set_limits(self, header: str) -> None:
+        limits = parse_limits(header)
+        if not limits:
+            return
+        with self._cond:
+            windows = {}
+            for count, seconds in limits:
+                old = self._windows.get(seconds)
+                windows[seconds] = (count, old[1] if old else deque())
+            self._windows = windows
+            self._cond.notify_all()
+
+    @property
+    def limits(self) -> str:
+        return ",".join(f"{c}:{s}" for s, (c, _) in sorted(self._windows.items()))
+
+    # --- core ---
+    def _prune(self, now: float) -> None:
+        for seconds, (_, stamps) in self._windows.items():
+            horizon = now - seconds - self.margin
+            while stamps and stamps[0] <= horizon:
+                stamps.popleft()
+
+    def _wait_time(self, now: float) -> float:
+        """0 if a request may start now, else seconds until the next slot frees."""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        wait = 0.0
+        for seconds, (limit, stamps) in self._windows.items():
+            if self._in_flight + len(stamps) < limit:
+                continue
+            if stamps:
+                wait = max(wait, stamps[0] + seconds + self.margin - now)
+            else:
+                # window is full of in-flight requests; wait for a release
+                wait = max(wait, 0.05)
+        return wait
+
+    def acquire(self) -> float:
+        """Block until a request may be sent. Returns seconds waited."""
+        start = self.clock()
+        with self._cond:
+            while True:
+                now = self.clock()
+                self._prune(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    self._in_flight += 1
+                    waited = now - start
+                    self.total_wait += waited
+                    return waited
+                self._cond.wait(timeout=wait)
+
+    def release(self) -> None:
+        """Mark one in-flight request as finished (counts from now on)."""
+        with self._cond:
+            now = self.clock()
+            self._in_flight = max(0, self._in_flight - 1)
+            for _, stamps in self._windows.values():
+                stamps.append(now)
+            self._cond.notify_all()
+
+    # --- feedback from the server ---
+    def update_from_headers(self, limit_header: Optional[str],
+                            count_header: Optional[str]) -> None:
+        """Adopt the announced limits and catch up with the server's counts."""
+        if limit_header and limit_header != self.limits:
+            self.set_limits(limit_header)
+        counts = dict((s, c) for c, s in parse_limits(count_header))
+        if not counts:
+            return
+        with self._cond:
+            now = self.clock()
+            for seconds, (_, stamps) in self._windows.items():
+                # requests made with this key elsewhere (other process, earlier run)
+                missing = counts.get(seconds, 0) - len(stamps) - self._in_flight
+                for _ in range(max(0, missing)):
+                    stamps.append(now)
+
+    def block_for(self, seconds: float) -> None:
+        """Stop all requests for `seconds` (Retry-After on a 429)."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+            self._cond.notify_all()
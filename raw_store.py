@@ -0,0 +1,273 @@
+# raw_store.py
+"""
+Compact append-only archive for raw match JSON.
+
+Instead of one pretty-printed ~120 KB file per match, matches are stored as
+compact JSON, each compressed as its own gzip member, appended to segment
+files partitioned by patch:
+
+    data/raw/store/patch=15.19/seg-00000.jsonl.gz
+    data/raw/store/index.tsv      matchId  segment  offset  length  patch  gameCreation
+
+A segment is a valid multi-member gzip file (zcat gives JSON lines), and
+because every member is independent a single match can be read with one
+seek + one small decompress through the index. Segments roll over at
+`segment_bytes`, so S3 gets a few large objects instead of one PUT per match.
+
+Crash safety: a match's bytes are written before its index line, so anything
+the index points to is complete. What a crash can leave behind (a torn
+last index line, unindexed bytes at the end of a segment) is cut off the
+first time a process writes to the store again; the store assumes a single
+writing process.
+
+    python raw_store.py migrate data/raw/matches data/raw/store
+    python raw_store.py stats data/raw/store
+"""
+
+import argparse
+import gzip
+import json
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+# orjson parses match documents several times faster; stdlib json otherwise
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+DEFAULT_STORE = Path("data/raw/store")
+INDEX_NAME = "index.tsv"
+
+
+def patch_of(game_version: Optional[str]) -> str:
+    """'15.19.715.1234' -> '15.19' ('unknown' if missing)."""
+    if not game_version:
+        return "unknown"
+    parts = str(game_version).split(".")
+    return ".".join(parts[:2]) if len(parts) >= 2 else parts[0]
+
+
+class Entry(NamedTuple):
+    segment: str       # path relative to the store root
+    offset: int
+    length: int
+    patch: str
+    game_creation: int
+
+
+class RawStore:
+    def __init__(self, root=DEFAULT_STORE, segment_bytes: int = 64 * 1024 * 1024,
+                 level: int = 6):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.index: Dict[str, Entry] = {}
+        self._lock = threading.Lock()
+        self._touched = set()        # segments written since the last drain_touched()
+        self._current: Dict[str, list] = {}    # patch -> [open segment path, size]
+        self._repaired = False
+        self._load_index()
+
+    # --- index ---
+    @property
+    def index_path(self) -> Path:
+        return self.root / INDEX_NAME
+
+    def _load_index(self) -> None:
+        if not self.index_path.exists():
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 6:
+                    continue        # torn last line after a crash
+                mid, seg, off, length, patch, created = parts
+                self.index[mid] = Entry(seg, int(off), int(length), patch, int(created))
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def ids(self) -> List[str]:
+        return list(self.index)
+
+    # --- writes ---
+    def _segment_for(self, patch: str, size: int) -> Path:
+        cur = self._current.get(patch)
+        if cur is None:
+            part = self.root / f"patch={patch}"
+            part.mkdir(parents=True, exist_ok=True)
+            segs = sorted(part.glob("seg-*.jsonl.gz"))
+            last = segs[-1] if segs else part / "seg-00000.jsonl.gz"
+            cur = self._current[patch] = [last, self._truncate_tail(last) if segs else 0]
+        if cur[1] and cur[1] + size > self.segment_bytes:
+            n = int(cur[0].name[4:9]) + 1
+            cur[0], cur[1] = cur[0].with_name(f"seg-{n:05d}.jsonl.gz"), 0
+        cur[1] += size
+        return cur[0]
+
+    def _truncate_tail(self, seg: Path) -> int:
+        """Cut bytes after the segment's last indexed match (left by a crash); returns the size."""
+        rel = seg.relative_to(self.root).as_posix()
+        end = max((e.offset + e.length for e in self.index.values() if e.segment == rel), default=0)
+        size = seg.stat().st_size
+        if size > end:
+            print(f"{rel}: dropping {size - end} unindexed bytes from an interrupted write")
+            with open(seg, "r+b") as f:
+                f.truncate(end)
+        return end
+
+    def _repair_index(self) -> None:
+        """Drop a torn last line, so the next index line starts on a line of its own."""
+        self._repaired = True
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "r+b") as f:
+            end = f.seek(0, 2)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                if b"\n" in chunk:
+                    pos = start + chunk.rfind(b"\n") + 1
+                    break
+                pos = start
+            if pos < end:
+                f.truncate(pos)
+
+    def append(self, match: dict) -> bool:
+        """Add one match; returns False if its matchId is already stored."""
+        mid = match["metadata"]["matchId"]
+        info = match.get("info", {})
+        patch = patch_of(info.get("gameVersion"))
+        payload = json_dumps(match) + b"\n"
+        blob = gzip.compress(payload, self.level)
+        with self._lock:
+            if mid in self.index:
+                return False
+            if not self._repaired:
+                self._repair_index()
+            seg = self._segment_for(patch, len(blob))
+            with open(seg, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+            entry = Entry(seg.relative_to(self.root).as_posix(), offset, len(blob),
+                          patch, int(info.get("gameCreation") or 0))
+            # data first, index line second: a crash in between only leaves unused bytes
+            with open(self.index_path, "a") as f:
+                f.write("\t".join([mid, entry.segment, str(entry.offset), str(entry.length),
+                                   entry.patch, str(entry.game_creation)]) + "\n")
+            self.index[mid] = entry
+            self._touched.add(entry.segment)
+        return True
+
+    def drain_touched(self) -> List[str]:
+        """Segments written since the last call (relative paths), e.g. to upload."""
+        with self._lock:
+            touched, self._touched = sorted(self._touched), set()
+        return touched
+
+    # --- reads ---
+    def get_bytes(self, match_id: str) -> bytes:
+        e = self.index[match_id]
+        with open(self.root / e.segment, "rb") as f:
+            f.seek(e.offset)
+            blob = f.read(e.length)
+        return zlib.decompress(blob, wbits=31)
+
+    def get(self, match_id: str) -> dict:
+        return json_loads(self.get_bytes(match_id))
+
+    def entries(self, ids: Optional[Iterable[str]] = None,
+                patch: Optional[str] = None) -> List[Entry]:
+        """Index entries in read order (segment, then offset)."""
+        entries = self.index.values() if ids is None else \
+            (self.index[m] for m in ids if m in self.index)
+        return sorted((e for e in entries if patch is None or e.patch == patch),
+                      key=lambda e: (e.segment, e.offset))
+
+    def iter_raw(self, ids: Optional[Iterable[str]] = None,
+                 patch: Optional[str] = None) -> Iterator[bytes]:
+        """Stream decompressed match JSON, segment by segment in file order."""
+        return read_entries(self.root, self.entries(ids, patch))
+
+    def iter_matches(self, ids: Optional[Iterable[str]] = None,
+                     patch: Optional[str] = None) -> Iterator[dict]:
+        for raw in self.iter_raw(ids, patch):
+            yield json_loads(raw)
+
+    def patches(self) -> List[str]:
+        return sorted({e.patch for e in self.index.values()})
+
+
+def read_entries(root, entries: Iterable[Entry]) -> Iterator[bytes]:
+    """Decompressed JSON for `entries`, keeping one segment file open at a time."""
+    root = Path(root)
+    f, current = None, None
+    try:
+        for e in entries:
+            if e.segment != current:
+                if f:
+                    f.close()
+                f, current = open(root / e.segment, "rb"), e.segment
+            f.seek(e.offset)
+            yield zlib.decompress(f.read(e.length), wbits=31)
+    finally:
+        if f:
+            f.close()
+
+
+# ====== ONE-SHOT MIGRATION ======
+def migrate_json_dir(src, store: RawStore, verbose: bool = True) -> int:
+    """Copy every data/raw/matches/<id>.json not yet in the store; returns count added."""
+    files = [f for f in Path(src).glob("*.json") if f.stem not in store]
+    # platform + numeric id is chronological per platform, without parsing every file first
+    files.sort(key=lambda f: (f.stem.split("_")[0], int(f.stem.split("_")[-1])
+                              if f.stem.split("_")[-1].isdigit() else 0))
+    added = 0
+    for f in files:
+        with open(f) as fp:
+            added += store.append(json.load(fp))
+    if verbose:
+        print(f"Migrated {added} matches into {store.root} ({len(store)} total)")
+    return added
+
+
+def store_size(store: RawStore) -> int:
+    return sum(f.stat().st_size for f in store.root.rglob("*") if f.is_file())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compact raw match archive")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="import a directory of <matchId>.json files")
+    m.add_argument("src", nargs="?", default="data/raw/matches")
+    m.add_argument("dst", nargs="?", default=str(DEFAULT_STORE))
+    s = sub.add_parser("stats")
+    s.add_argument("dst", nargs="?", default=str(DEFAULT_STORE))
+    g = sub.add_parser("get", help="print one match as JSON")
+    g.add_argument("match_id")
+    g.add_argument("--store", default=str(DEFAULT_STORE))
+    args = ap.parse_args()
+
+    if args.cmd == "migrate":
+        store = RawStore(args.dst)
+        src_bytes = sum(f.stat().st_size for f in Path(args.src).glob("*.json"))
+        migrate_json_dir(args.src, store)
+        print(f"JSON dir: {src_bytes / 1e6:.1f} MB -> store: {store_size(store) / 1e6:.1f} MB")
+    elif args.cmd == "stats":
+        store = RawStore(args.dst)
+        print(f"{len(store)} matches, {store_size(store) / 1e6:.1f} MB, patches: {store.patches()}")
+    else:
+        print(RawStore(args.store).get_bytes(args.match_id).decode())
@@ -1,392 +1,413 @@
 #!/usr/bin/env python
 # coding: utf-8
+"""
+Riot match pipeline: page match IDs, download, stage, aggregate, upload to S3.
 
-# In[8]:
+Importing this module has no side effects (no S3 client, no requests); run the
+whole pipeline with `python riot.py`. app.py uses `fetch_matches()` for its
+live-fetch path, which reads the local raw store and caches what it downloads
+in data/cache/store.
+"""
 
-
-import requests
-import pandas as pd
 import json
+import os
 import time
+import pandas as pd
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-import boto3
-from botocore.exceptions import ClientError
-
-
-# In[9]:
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from riot_client import RiotClient, download_matches
+from id_paging import HighWaterMarks, page_match_ids, merge_index
+from raw_store import RawStore, migrate_json_dir
+from staging import compact_parts, stage_incremental
+from aggregates import update_partials, summarize
+from rollups import ROLLUP_DIR, update_rollups
+from matchups import MATCHUP_DIR, update_matchups
+from dashboard import build_dashboard
+from timeline import TimelineStore, build_features, fetch_timelines
+from metrics import Metrics
+from journal import Journal
+import lake
+import static_data
 
 
 # --- CONFIG ---
-RIOT_API_KEY = "RGAPI-db8fafe7-e1dd-42fe-901b-3c35ac52538b"
-PUUID = "ietVCTS7Tqi47nsRIhmJoIMtYhIT0rtlALufrc2o03sKfgyIvaWBIdKMS2YO17FqODtYSy010_-dxw"
+RIOT_API_KEY = os.getenv("RIOT_API_KEY", "RGAPI-db8fafe7-e1dd-42fe-901b-3c35ac52538b")
+PUUID = os.getenv("PUUID", "ietVCTS7Tqi47nsRIhmJoIMtYhIT0rtlALufrc2o03sKfgyIvaWBIdKMS2YO17FqODtYSy010_-dxw")
 S3_BUCKET = "hackathon-s3-rift-rewind-mohammad"
 AWS_REGION = "us-east-1"
 ROUTING = "asia"   # change if needed: americas, europe, asia, sea
-
-
-# In[12]:
-
-
-# --- S3 CLIENT ---
-try:
-    s3 = boto3.client("s3", region_name=AWS_REGION)
-    print("S3 client ready for bucket:", S3_BUCKET)
-except ClientError as e:
-    print("S3 client creation failed:", e)
-
-def upload_to_s3(local_path, s3_key):
-    try:
-        s3.upload_file(local_path, S3_BUCKET, s3_key)
-    except ClientError as e:
-        print("Upload failed:", e)
-        raise SystemExit("Exiting: cannot continue without valid S3 client.")
-
-
-# In[14]:
-
-
-# --- TIME WINDOW (1 YEAR) ---
-end_dt = datetime.now(timezone.utc)
-start_dt = end_dt - timedelta(days=365)
-start_ts = int(start_dt.timestamp())
-end_ts = int(end_dt.timestamp())
-
-print("Collecting matches from", start_dt.date(), "to", end_dt.date())
-
-
-# In[16]:
-
-
-# --- FETCH MATCH IDS (PAGING, NO BREAK) ---
-headers = {"X-Riot-Token": RIOT_API_KEY}
-all_ids = []
-start = 0
-count = 100
-done = False
-
-while not done:
-    url = f"https://{ROUTING}.api.riotgames.com/lol/match/v5/matches/by-puuid/{PUUID}/ids"
-    params = {"start": start, "count": count, "startTime": start_ts, "endTime": end_ts}
-    r = requests.get(url, headers=headers, params=params, timeout=20)
-
-    if r.status_code != 200:
-        print("Error:", r.status_code, r.text[:100])
-        done = True
-        continue
-
-    ids = r.json()
-    if not ids:
-        done = True
-        continue
-
-    all_ids.extend(ids)
-    print(f"Fetched {len(ids)} IDs (total so far {len(all_ids)})")
-
-    start += count
-    time.sleep(0.3)
-
-print("Total match IDs collected:", len(all_ids))
-
-
-# In[17]:
-
-
-# ====== SAVE & UPLOAD INDEX FILE ======
-index_path = Path("data/raw/index/match_ids_year.json")
-index_path.parent.mkdir(parents=True, exist_ok=True)
-with open(index_path, "w") as f:
-    json.dump(all_ids, f, indent=2)
-
-upload_to_s3(str(index_path), "raw/index/match_ids_year.json")
-
-
-# In[20]:
+DOWNLOAD_WORKERS = 8   # threads; the rate limiter sets the real pace
+INCREMENTAL = True     # only list IDs newer than the last download / only stage new matches
+STAGE_BATCH = 2000     # matches per staged record batch (bounds staging memory)
+STAGE_WORKERS = None   # staging processes; None = all cores, 1 = in-process
+UPLOAD_WORKERS = 8     # parallel S3 uploads
+FETCH_TIMELINES = False  # also download match timelines (1 extra request per match)
+PROFILE_DIR = os.getenv("PIPELINE_PROFILE")   # set to a directory: cProfile dump per stage
+
+RAW_STORE = Path("data/raw/store")
+LAKE_DIR = Path("data/lake")     # hive-partitioned copy for Athena / DuckDB (lake.py)
+JOURNAL_PATH = Path("data/raw/journal.sqlite")   # per-match state + retry queue (journal.py)
+INDEX_PATH = Path("data/raw/index/match_ids_year.json")
+ID_CACHE_DIR = Path("data/cache/ids")
+# fetch_matches() downloads into its own store: the pipeline store has one writer
+# (riot.py / daemon.py), and the app runs next to them
+FETCH_STORE = Path("data/cache/store")
+ID_CACHE_TTL = 300     # seconds a cached ID list for fetch_matches stays fresh
+
+Upload = Callable[[str, str], None]
+Delete = Callable[[List[str]], None]
+
+
+# ====== MATCH IDS ======
+def collect_match_ids(client: RiotClient, store: RawStore, hwm: HighWaterMarks,
+                      puuid: str = PUUID, incremental: bool = INCREMENTAL,
+                      days: int = 365) -> List[str]:
+    """Page new IDs (1 year, or since the high-water mark) and merge them into the index."""
+    end_dt = datetime.now(timezone.utc)
+    start_dt = end_dt - timedelta(days=days)
+    start_ts = int(start_dt.timestamp())
+    end_ts = int(end_dt.timestamp())
+
+    if incremental:
+        hwm.bootstrap(store.iter_matches, [puuid])
+        if hwm.start_time(puuid) is not None:
+            start_ts = max(start_ts, hwm.start_time(puuid))
+            start_dt = datetime.fromtimestamp(start_ts, timezone.utc)
+
+    print("Collecting matches from", start_dt.date(), "to", end_dt.date())
+    new_ids = page_match_ids(client, puuid, start_time=start_ts, end_time=end_ts)
+    print("Total match IDs collected:", len(new_ids))
+
+    # merge new IDs into the existing index instead of overwriting it
+    all_ids = merge_index(new_ids, INDEX_PATH)
+    print("Match IDs in index:", len(all_ids))
+    return all_ids
 
 
 # ====== DOWNLOAD MATCHES ======
-def fetch_match(matchId):
-    url = f"https://{ROUTING}.api.riotgames.com/lol/match/v5/matches/{matchId}"
-    r = requests.get(url, headers=headers, timeout=20)
-    if r.status_code == 200:
-        return r.json()
-    elif r.status_code == 429:
-        # Simple backoff: wait then retry once
-        print("Rate limit (429). Waiting 20s, then retry:", matchId)
-        time.sleep(20)
-        r = requests.get(url, headers=headers, timeout=20)
-        if r.status_code == 200:
-            return r.json()
-        else:
-            print("Still failing after backoff:", matchId, r.status_code)
-            return None
-    else:
-        print("Match failed:", matchId, r.status_code)
-        return None
-
-total = len(all_ids)
-print(f"Total match IDs to download: {total}")
-
-success = 0
-failed = 0
-
-# define 4 progress checkpoints (25%, 50%, 75%, 100%)
-checkpoints = {int(total * 0.25), int(total * 0.5), int(total * 0.75), total}
-
-for i, matchId in enumerate(all_ids, start=1):
-    #skip if file already exists locally ---
-    local_path = Path(f"data/raw/matches/{matchId}.json")
-    local_path.parent.mkdir(parents=True, exist_ok=True)
-    if local_path.exists():
-        print(f"[{i}/{total}] Skipping (already downloaded): {matchId}")
-        continue
-
-    # --- Download if not skipped ---
-    data = fetch_match(matchId)
-    if not data:
-        print(f"[{i}/{total}] Failed: {matchId}")
-        failed += 1
-        continue
-
-    with open(local_path, "w") as f:
-        json.dump(data, f, indent=2)
-
-    s3_key = f"raw/matches/{matchId}.json"
-    upload_to_s3(str(local_path), s3_key)
-    success += 1
-
-    # Print only at key checkpoints
-    if i in checkpoints:
-        percent = round(i / total * 100)
-        print(f"Progress: {percent}% ({i}/{total} matches done)")
-
-    time.sleep(0.5)
-
-print(f"All done! Uploaded {success} matches, failed {failed}.")
-
-
-# In[22]:
-
-
-# ====== CREATE MATCH-LEVEL TABLE ======
-rows1 = []
-
-# go through every raw match json
-for f in Path("data/raw/matches").glob("*.json"):
-    with open(f) as fp:
-        match = json.load(fp)
-
-    info = match["info"]
-    meta = match["metadata"]
-    teams = info["teams"]
-
-    # some matches might not have both teams
-    blue = teams[0] if len(teams) > 0 else {}
-    red = teams[1] if len(teams) > 1 else {}
-
-    rows1.append({
-        "matchId": meta.get("matchId"),
-        "gameCreation": info.get("gameCreation"),
-        "gameStartTimestamp": info.get("gameStartTimestamp"),
-        "gameEndTimestamp": info.get("gameEndTimestamp"),
-        "gameDuration": info.get("gameDuration"),
-        "endOfGameResult": info.get("endOfGameResult"),
-        "gameMode": info.get("gameMode"),
-        "gameType": info.get("gameType"),
-        "gameVersion": info.get("gameVersion"),
-        "queueId": info.get("queueId"),
-        "mapId": info.get("mapId"),
-        "platformId": info.get("platformId"),
-        "tournamentCode": info.get("tournamentCode"),
-        "blueWin": blue.get("win"),
-        "redWin": red.get("win")
-    })
-
-df_matches = pd.DataFrame(rows1)
-print("Total matches:", len(df_matches))
-
-# save locally
-out_path = Path("data/staged/matches.csv")
-out_path.parent.mkdir(parents=True, exist_ok=True)
-df_matches.to_csv(out_path, index=False)
-print("Saved:", out_path)
-
-# upload to S3
-s3_key = "staged/matches.csv"
-upload_to_s3(str(out_path), s3_key)
-print(f"Uploaded to S3 path: s3://{S3_BUCKET}/{s3_key}")
-
-
-# In[24]:
-
-
-try:
-    matches_parquet = Path("data/staged/matches.parquet")
-    df_matches.to_parquet(matches_parquet, index=False)
-    upload_to_s3(str(matches_parquet), "staged/matches.parquet")
-    print("Saved & uploaded:", matches_parquet)
-except Exception as e:
-    print("Parquet save skipped for matches:", e)
-
-
-# In[48]:
-
-
-rows = []
-for f in Path("data/raw/matches").glob("*.json"):
-    with open(f) as fp:
-        m = json.load(fp)
-
-    meta = m.get("metadata", {})
-    info = m.get("info", {})
-    participants = info.get("participants", [])
-
-    for p in participants:
-        rows.append({
-            # context
-            "matchId": meta.get("matchId"),
-            "gameVersion": info.get("gameVersion"),
-            "queueId": info.get("queueId"),
-            "gameDuration": info.get("gameDuration"),  # seconds
-            "championName": p.get("championName"),
-            "teamId": p.get("teamId"),
-            "win": p.get("win"),
-            "winCount": 1 if p.get("win") else 0,
-            "loseCount": 0 if p.get("win") else 1,
-
-            # core stats
-            "kills": p.get("kills"),
-            "deaths": p.get("deaths"),
-            "assists": p.get("assists"),
-            "goldEarned": p.get("goldEarned"),
-            "goldSpent": p.get("goldSpent"),
-            "totalDamageDealtToChampions": p.get("totalDamageDealtToChampions"),
-            "totalDamageTaken": p.get("totalDamageTaken"),
-            "totalMinionsKilled": p.get("totalMinionsKilled"),
-            "neutralMinionsKilled": p.get("neutralMinionsKilled"),
-            "visionScore": p.get("visionScore"),
-            "wardsPlaced": p.get("wardsPlaced"),
-            "wardsKilled": p.get("wardsKilled"),
-            "timeCCingOthers": p.get("timeCCingOthers"),
-            "totalHeal": p.get("totalHeal"),
-            "totalTimeSpentDead": p.get("totalTimeSpentDead"),
-            "killingSprees": p.get("killingSprees"),
-            "damageDealtToObjectives": p.get("damageDealtToObjectives"),
-            "turretTakedowns": p.get("turretTakedowns"),
-            "inhibitorTakedowns": p.get("inhibitorTakedowns"),
-            "champExperience": p.get("champExperience"),
-            "timePlayed": p.get("timePlayed")  # seconds
-        })
-
-df = pd.DataFrame(rows)
-print("Rows:", len(df), "Cols:", len(df.columns))
-
-# --- simple features (safe divisions) ---
-denom_deaths = df["deaths"].replace(0, 1)
-denom_time_min = (df["timePlayed"].replace(0, 1) / 60)
-
-df["KDA_ratio"]      = (df["kills"] + df["assists"]) / denom_deaths
-df["CS_per_min"]     = df["totalMinionsKilled"] / denom_time_min
-df["Gold_efficiency"]= df["goldSpent"] / df["goldEarned"].replace(0, 1)
-df["DMG_Gold_ratio"] = df["totalDamageDealtToChampions"] / df["goldEarned"].replace(0, 1)
-df["Vision_per_min"] = df["visionScore"] / denom_time_min
-df["DMG_per_min"]    = df["totalDamageDealtToChampions"] / denom_time_min
-df["CS_per_game"] = df["totalMinionsKilled"] + df["neutralMinionsKilled"]
-
-# --- choose order for the CSV (context → stats → features) ---
-cols = [
-    "matchId","gameVersion","queueId","gameDuration","championName","teamId","win","winCount", "loseCount",
-    "kills","deaths","assists","goldEarned","goldSpent",
-    "totalDamageDealtToChampions","totalDamageTaken",
-    "totalMinionsKilled","neutralMinionsKilled",
-    "visionScore","wardsPlaced","wardsKilled",
-    "timeCCingOthers","totalHeal","totalTimeSpentDead","killingSprees",
-    "damageDealtToObjectives","turretTakedowns","inhibitorTakedowns",
-    "champExperience","timePlayed",
-    "KDA_ratio","CS_per_min","CS_per_game","Gold_efficiency","DMG_Gold_ratio","Vision_per_min","DMG_per_min"
-]
-df_tidy = df[cols].copy()
-
-# --- save locally + upload to analytics/ ---
-out_path = Path("data/processed/tidy_participants.csv")
-out_path.parent.mkdir(parents=True, exist_ok=True)
-df_tidy.to_csv(out_path, index=False)
-print("Saved:", out_path)
-
-s3_key = "analytics/tidy_participants.csv"
-upload_to_s3(str(out_path), s3_key)
-print(f"Uploaded to S3 path: s3://{S3_BUCKET}/{s3_key}")
-
-
-# In[50]:
+def download_new(client: RiotClient, store: RawStore, hwm: HighWaterMarks,
+                 all_ids: List[str], puuid: str = PUUID,
+                 journal: Optional[Journal] = None) -> Tuple[List[str], List[str]]:
+    total = len(all_ids)
+    print(f"Total match IDs to download: {total}")
+
+    #skip matches already in the raw store ---
+    todo = [m for m in all_ids if m not in store]
+    print(f"Skipping {total - len(todo)} already downloaded, fetching {len(todo)}")
+    if client.metrics is not None:
+        client.metrics.cache("raw_store", hits=total - len(todo), misses=len(todo))
+    if journal is not None:
+        # failed IDs wait out their back-off; given-up ones (404s, too many attempts) are skipped
+        journal.queue(todo)
+        due = set(journal.due())
+        held = [m for m in todo if m not in due]
+        todo = [m for m in todo if m in due]
+        if held:
+            print(f"Holding back {len(held)} failed matches until their retry time")
+
+    def on_match(matchId, data):
+        if journal is not None:
+            journal.mark([matchId], "fetched")
+        store.append(data)
+        hwm.observe(data, [puuid])
+        if journal is not None:
+            journal.mark([matchId], "written")
+
+    def on_failure(matchId, reason):
+        if journal is not None:
+            journal.fail(matchId, reason)
+
+    ok_ids, failed_ids = download_matches(client, todo, on_match, workers=DOWNLOAD_WORKERS,
+                                          on_failure=on_failure)
+    # failed IDs stay in the index (and the journal's retry queue) for the next run
+    hwm.save()
+    print("Requests:", client.stats, f"rate-limit wait {client.limiter.total_wait:.1f}s")
+    print(f"All done! Downloaded {len(ok_ids)} matches, failed {len(failed_ids)}.")
+    return ok_ids, failed_ids
+
+
+# ====== TIMELINES (optional) ======
+def timelines(client: RiotClient, store: RawStore, upload: Upload) -> None:
+    # flattened into frames/events/players part files; per-minute features computed in bulk
+    tl_store = TimelineStore()
+    before = {p.name for p in tl_store.root.glob("*/part-*.parquet")}
+    failed = fetch_timelines(client, store, tl_store, workers=DOWNLOAD_WORKERS)
+    print(f"Timelines stored: {len(tl_store)}, failed {len(failed)}")
+    for part in sorted(tl_store.root.glob("*/part-*.parquet")):
+        if part.name not in before:
+            upload(str(part), f"raw/timelines/{part.parent.name}/{part.name}")
+    for path in build_features(tl_store, "data/processed").values():
+        upload(str(path), f"analytics/{path.name}")
+
+
+# ====== STAGE MATCHES + PARTICIPANTS (ONE PASS) ======
+def stage(store: RawStore, upload: Upload, incremental: bool = INCREMENTAL,
+          delete: Optional[Delete] = None, exports: bool = True) -> dict:
+    # small parts of earlier runs (the daemon's micro-batches) are merged first, while
+    # every consumer is up to date with them: they then only rename what they folded
+    merged = compact_parts("data/staged") if incremental else {"written": [], "removed": []}
+    # every raw match is parsed once (across a process pool) and streamed in batches into both tables;
+    # incremental runs only stage matches missing from data/staged/_manifest.tsv
+    counts = stage_incremental(store, "data/staged", "data/processed", batch_size=STAGE_BATCH,
+                               workers=STAGE_WORKERS, full=not incremental)
+    print("New matches staged:", counts["matches"], "participant rows:", counts["participants"],
+          "| total staged:", counts["staged_total"])
+
+    uploads = [(part, f"staged/{part.parent.name}/{part.name}")
+               for part in merged["written"] + counts["parts"]]
+    uploads += [
+        (Path("data/staged/_manifest.tsv"), "staged/_manifest.tsv"),
+        (Path("data/staged/_match_index.parquet"), "staged/_match_index.parquet"),
+    ]
+    if exports:     # full flat CSVs (re-sent whole; the daemon leaves them to the batch run)
+        uploads += [
+            (Path("data/staged/matches.csv"), "staged/matches.csv"),
+            (Path("data/processed/tidy_participants.csv"), "analytics/tidy_participants.csv"),
+        ]
+    for local_path, s3_key in uploads:
+        upload(str(local_path), s3_key)
+
+    # the same rows partitioned by platformId/queueId/patch/date; small files of
+    # earlier runs are merged, and the objects they replace are removed from S3
+    synced = lake.sync("data/staged", LAKE_DIR)
+    compacted = lake.compact(LAKE_DIR)
+    live = set(synced["written"] + compacted["written"]) - set(compacted["removed"])
+    gone = set(synced["removed"] + compacted["removed"]) - live
+    print(f"Lake: {len(live)} files written, {len(gone)} removed |", lake.stats(LAKE_DIR))
+    for f in sorted(live):
+        upload(str(LAKE_DIR / f), f"lake/{f}")
+    upload(str(LAKE_DIR / lake.MANIFEST_NAME), f"lake/{lake.MANIFEST_NAME}")
+    if gone and delete is not None:
+        delete([f"lake/{f}" for f in sorted(gone)])
+    if merged["removed"] and delete is not None:
+        delete([f"staged/{p.parent.name}/{p.name}" for p in merged["removed"]])
+    return counts
 
 
 # ====== ENHANCED CHAMPION SUMMARY TABLE ======
-champ_summary = (
-    df_tidy.groupby("championName", as_index=False)
-    .agg({
-        "winCount": "sum",
-        "loseCount": "sum",
-        "kills": "mean",
-        "deaths": "mean",
-        "assists": "mean",
-        "goldEarned": "mean",
-        "goldSpent": "mean",
-        "KDA_ratio": "mean",
-        "CS_per_min": "mean",
-        "DMG_per_min": "mean",
-        "Vision_per_min": "mean",
-        "Gold_efficiency": "mean",
-        "DMG_Gold_ratio": "mean",
-        "CS_per_game": "mean",
-        "totalDamageDealtToChampions": "mean",
-        "totalDamageTaken": "mean",
-        "totalHeal": "mean",
-        "timeCCingOthers": "mean"
-    })
-)
-
-# basic totals
-champ_summary["totalGames"] = champ_summary["winCount"] + champ_summary["loseCount"]
-champ_summary["winRate"] = 100 * champ_summary["winCount"] / champ_summary["totalGames"]
-
-# ---- new advanced columns ----
-# Popularity (how often this champion appears compared to all)
-total_games_all = champ_summary["totalGames"].sum()
-champ_summary["popularity_%"] = 100 * champ_summary["totalGames"] / total_games_all
-
-# KDA_performance = kills + assists - deaths (simple contribution indicator)
-champ_summary["KDA_performance"] = (
-    champ_summary["kills"] + champ_summary["assists"] - champ_summary["deaths"]
-)
-
-# Damage Efficiency = Damage Dealt per Death
-champ_summary["DMG_per_death"] = (
-    champ_summary["totalDamageDealtToChampions"] / champ_summary["deaths"].replace(0, 1)
-)
-
-# Tankiness = Damage Taken per Death
-champ_summary["DMG_taken_per_death"] = (
-    champ_summary["totalDamageTaken"] / champ_summary["deaths"].replace(0, 1)
-)
-
-# Healing per Minute
-champ_summary["Heal_per_min"] = champ_summary["totalHeal"] / champ_summary["DMG_per_min"].replace(0, 1)
-
-# Crowd Control per Minute (utility)
-champ_summary["CC_per_min"] = champ_summary["timeCCingOthers"] / champ_summary["DMG_per_min"].replace(0, 1)
-
-# ---- save table ----
-out_path = Path("data/processed/champion_summary.csv")
-champ_summary.to_csv(out_path, index=False)
-print("Saved enhanced champion summary:", out_path)
-
-upload_to_s3(str(out_path), "analytics/champion_summary.csv")
-print(f"Uploaded to S3 path: s3://{S3_BUCKET}/analytics/champion_summary.csv")
-
-
-# In[ ]:
-
-
-
-
+def champion_summary(upload: Upload, delete: Optional[Delete] = None) -> pd.DataFrame:
+    # fold only the new participants part files into the stored per-champion/patch/queue
+    # partials, then derive the summary from them (no rescan of all participants)
+    participant_parts = sorted(Path("data/staged/participants").glob("part-*.parquet"))
+    partials = update_partials(participant_parts, "data/processed/champion_partials.parquet")
+    champ_summary = summarize(partials)
+
+    # ---- save table ----
+    out_path = Path("data/processed/champion_summary.csv")
+    tmp = out_path.with_suffix(".tmp")
+    champ_summary.to_csv(tmp, index=False)
+    os.replace(tmp, out_path)
+    print("Saved enhanced champion summary:", out_path)
+
+    upload(str(out_path), "analytics/champion_summary.csv")
+    upload("data/processed/champion_partials.parquet", "analytics/champion_partials.parquet")
+    # per queue / patch slices, partitioned the same way as the lake tables (rewritten whole)
+    summary_files = lake.write_summary(partials, LAKE_DIR)
+    for f in summary_files["written"]:
+        upload(str(LAKE_DIR / f), f"lake/{f}")
+    upload(str(LAKE_DIR / lake.MANIFEST_NAME), f"lake/{lake.MANIFEST_NAME}")
+    if summary_files["removed"] and delete is not None:
+        delete([f"lake/{f}" for f in summary_files["removed"]])
+
+    # player / role / champion-role stats and percentile sketches, folded in the same way
+    groups = update_rollups(participant_parts, ROLLUP_DIR)
+    print("Rollup groups:", groups)
+    for path in sorted(ROLLUP_DIR.glob("*.parquet")):
+        upload(str(path), f"analytics/rollups/{path.name}")
+    # champion-vs-champion (lane) and champion-with-champion (team) counts per patch
+    print("Matchup rows:", update_matchups(participant_parts, MATCHUP_DIR))
+    for path in sorted(MATCHUP_DIR.glob("*.parquet")):
+        upload(str(path), f"analytics/matchups/{path.name}")
+    return champ_summary
+
+
+# ====== LIVE FETCH (used by app.py) ======
+_clients: Dict[Tuple[str, str], RiotClient] = {}
+
+
+def get_client(api_key: str, routing: str = ROUTING) -> RiotClient:
+    """One client per key/region per process, so the rate limiter spans calls."""
+    key = (api_key, routing)
+    if key not in _clients:
+        _clients[key] = RiotClient(api_key, routing=routing, pool_size=DOWNLOAD_WORKERS)
+    return _clients[key]
+
+
+def _cached_ids(client: RiotClient, puuid: str, count: int, ttl: float) -> List[str]:
+    path = ID_CACHE_DIR / f"{puuid}.json"
+    if path.exists():
+        with open(path) as f:
+            cached = json.load(f)
+        # a short list is complete when it answered a request for at least `count`
+        if time.time() - cached["fetched_at"] < ttl and cached["requested"] >= count:
+            if client.metrics is not None:
+                client.metrics.cache("match_ids", hits=1)
+            return cached["ids"][:count]
+    if client.metrics is not None:
+        client.metrics.cache("match_ids", misses=1)
+    ids = []
+    while len(ids) < count:
+        want = min(100, count - len(ids))
+        page = client.match_ids(puuid, start=len(ids), count=want)
+        if page is None:    # failed request: use what we have, don't cache a cut-short list
+            return ids
+        ids.extend(page)
+        if len(page) < want:
+            break
+    if ids:   # an empty listing may be a failed request; don't pin it for `ttl`
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"fetched_at": time.time(), "requested": count, "ids": ids}, f)
+        os.replace(tmp, path)
+    return ids
+
+
+def player_row(match: dict, puuid: str) -> Optional[dict]:
+    """The given player's line of one match, in the column names app.py expects."""
+    info = match.get("info", {})
+    p = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
+    if p is None:
+        return None
+    return {
+        "match_id": match["metadata"]["matchId"],
+        "date": pd.to_datetime(info.get("gameCreation"), unit="ms"),
+        "champion": p.get("championName"),
+        "position": p.get("teamPosition"),
+        "queueId": info.get("queueId"),
+        "gameDuration": info.get("gameDuration"),
+        "win": p.get("win"),
+        "kills": p.get("kills"),
+        "deaths": p.get("deaths"),
+        "assists": p.get("assists"),
+        "gold": p.get("goldEarned"),
+        "minions": (p.get("totalMinionsKilled") or 0) + (p.get("neutralMinionsKilled") or 0),
+        "damage": p.get("totalDamageDealtToChampions"),
+        "visionScore": p.get("visionScore"),
+    }
+
+
+def fetch_matches(puuid: str, api_key: str = RIOT_API_KEY, count: int = 100,
+                  routing: str = ROUTING, store: Optional[RawStore] = None,
+                  ids_ttl: float = ID_CACHE_TTL) -> pd.DataFrame:
+    """The player's last `count` matches, one row per match.
+
+    Matches the pipeline's raw store already has are read from it (read only);
+    the others are downloaded into `store` (default data/cache/store), keyed by
+    matchId. The ID list is cached for `ids_ttl` seconds, so a repeat fetch of
+    the same player makes no requests.
+    """
+    store = store if store is not None else RawStore(FETCH_STORE)
+    shared = RawStore(RAW_STORE) if store.root.resolve() != RAW_STORE.resolve() else store
+    client = get_client(api_key, routing)
+    ids = _cached_ids(client, puuid, count, ids_ttl)
+    missing = [m for m in ids if m not in store and m not in shared]
+    if client.metrics is not None:
+        client.metrics.cache("raw_store", hits=len(ids) - len(missing), misses=len(missing))
+    if missing:
+        download_matches(client, missing, lambda mid, data: store.append(data),
+                         workers=DOWNLOAD_WORKERS)
+    # entries in the pipeline store's index (read once above) are complete, even
+    # while riot.py / the daemon append to it
+    rows = [player_row(m, puuid) for m in store.iter_matches(ids)]
+    rows += [player_row(m, puuid) for m in shared.iter_matches([m for m in ids if m not in store])]
+    df = pd.DataFrame([r for r in rows if r is not None])
+    return df.sort_values("date", ascending=False, ignore_index=True) if len(df) else df
+
+
+# ====== PIPELINE ======
+def main() -> None:
+    from botocore.exceptions import ClientError
+    from s3_upload import S3Uploader
+
+    # --- S3 UPLOADS ---
+    # uploads run on a background pool and skip objects whose ETag already matches;
+    # upload_to_s3 only queues; uploader.close() at the end of the run collects failures
+    # per-stage timings, request latencies, 429s/retries, cache hits -> data/metrics/
+    metrics = Metrics(profile_dir=PROFILE_DIR)
+    try:
+        uploader = S3Uploader(S3_BUCKET, workers=UPLOAD_WORKERS, region_name=AWS_REGION,
+                              metrics=metrics)
+        print("S3 client ready for bucket:", S3_BUCKET)
+    except ClientError as e:
+        raise SystemExit(f"S3 client creation failed: {e}")
+
+    def upload_to_s3(local_path, s3_key):
+        uploader.submit(local_path, s3_key)
+        print(f"Queued for S3: s3://{S3_BUCKET}/{s3_key}")
+
+    def delete_from_s3(s3_keys):
+        uploader.delete(s3_keys)
+        print(f"Queued S3 delete of {len(s3_keys)} replaced objects")
+
+    # raw matches live in the compact archive; old per-file JSON is imported once
+    store = RawStore(RAW_STORE)
+    migrate_json_dir("data/raw/matches", store)
+    # what reached which stage survives crashes; a stopped backfill resumes from here
+    journal = Journal(JOURNAL_PATH)
+    journal.sync_store(store)
+    print("Journal:", journal.stats())
+    hwm = HighWaterMarks()
+    # one client (pooled session + rate limiter) shared by paging and downloads
+    client = RiotClient(RIOT_API_KEY, routing=ROUTING, pool_size=DOWNLOAD_WORKERS,
+                        metrics=metrics)
+
+    with metrics.stage("ids") as st:
+        all_ids = collect_match_ids(client, store, hwm)
+        st["rows"] = len(all_ids)
+    upload_to_s3(str(INDEX_PATH), "raw/index/match_ids_year.json")
+
+    with metrics.stage("download") as st:
+        ok_ids, _ = download_new(client, store, hwm, all_ids, journal=journal)
+        st["rows"] = len(ok_ids)
+        st["bytes"] = sum(store.index[m].length for m in ok_ids)
+    # one PUT per touched segment + the index, instead of one per match; segments
+    # holding matches not uploaded yet (e.g. by a run that died) are sent again
+    seg_ids = defaultdict(list)
+    for m in journal.not_uploaded():
+        if m in store:
+            seg_ids[store.index[m].segment].append(m)
+    for seg in sorted(set(store.drain_touched()) | set(seg_ids)):
+        upload_to_s3(str(store.root / seg), f"raw/store/{seg}")
+    upload_to_s3(str(store.index_path), "raw/store/index.tsv")
+    if FETCH_TIMELINES:
+        with metrics.stage("timelines"):
+            timelines(client, store, upload_to_s3)
+
+    with metrics.stage("stage") as st:
+        counts = stage(store, upload_to_s3, delete=delete_from_s3)
+        journal.mark(counts["ids"], "staged")
+        st["rows"] = counts["participants"]
+        st["bytes"] = sum(Path(p).stat().st_size for p in counts["parts"])
+    with metrics.stage("aggregate"):
+        champion_summary(upload_to_s3, delete=delete_from_s3)
+    # names for the staged item / spell / rune IDs of any new patch (offline: bundled snapshot)
+    for patch in sorted(set(store.patches()) - set(static_data.cached_patches()) - {"unknown"}):
+        try:
+            print("Static data:", static_data.fetch(patch))
+        except Exception as e:
+            print(f"Static data for {patch} not fetched ({e}); the bundled snapshot is used")
+    # small tables the Streamlit app reads instead of the full participants data
+    with metrics.stage("dashboard"):
+        build_dashboard("data/staged")
+
+    # ====== WAIT FOR UPLOADS ======
+    with metrics.stage("upload_wait"):
+        upload_stats = uploader.close()
+    print("S3 uploads:", upload_stats)
+    failed_keys = {k for k, _ in uploader.errors}
+    journal.mark([m for seg, ids in seg_ids.items() if f"raw/store/{seg}" not in failed_keys
+                  for m in ids], "uploaded")
+    print("Journal:", journal.stats())
+    journal.close()
+    print(metrics.summary())
+    print("Run metrics:", metrics.save())
+    if upload_stats["failed"]:
+        raise SystemExit("Exiting: some S3 uploads failed: " + ", ".join(k for k, _ in uploader.errors))
+
+
+if __name__ == "__main__":
+    main()
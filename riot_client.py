@@ -0,0 +1,199 @@
+# riot_client.py
+"""
+Pooled, rate-limit-aware Riot API client and a concurrent match downloader.
+
+ - one requests.Session per client, with a connection pool sized to the
+   worker count (keep-alive instead of a TLS handshake per match)
+ - every request goes through the app-wide RateLimiter plus a per-method
+   limiter, both fed from the X-App-Rate-Limit / X-Method-Rate-Limit headers
+ - 429 honours Retry-After for all workers at once, 5xx gets a short back-off
+ - with `metrics=` (metrics.Metrics): latency per method, status counts,
+   retries and seconds spent waiting on the limiters
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ratelimit import RateLimiter
+from raw_store import json_loads
+
+MATCH_IDS_PATH = "/lol/match/v5/matches/by-puuid/{puuid}/ids"
+MATCH_PATH = "/lol/match/v5/matches/{match_id}"
+TIMELINE_PATH = "/lol/match/v5/matches/{match_id}/timeline"
+
+
+def routing_url(routing: str) -> str:
+    return f"https://{routing}.api.riotgames.com"
+
+
+class RiotClient:
+    def __init__(self, api_key: str, routing: str = "asia",
+                 base_url: Optional[str] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 pool_size: int = 16, timeout: float = 20,
+                 max_retries: int = 3, metrics=None):
+        self.routing = routing
+        self.base_url = (base_url or routing_url(routing)).rstrip("/")
+        self.limiter = limiter or RateLimiter()
+        self.method_limiters: Dict[str, RateLimiter] = {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self.stats = {"requests": 0, "429": 0, "retries": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()     # per-thread status of the last response
+
+        self.session = requests.Session()
+        self.session.headers["X-Riot-Token"] = api_key
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _method_limiter(self, method: str) -> RateLimiter:
+        # method limits are generous (e.g. 2000:10 for match-v5) until a header says otherwise
+        with self._stats_lock:
+            if method not in self.method_limiters:
+                self.method_limiters[method] = RateLimiter(limits="2000:10")
+            return self.method_limiters[method]
+
+    def get(self, path: str, params: Optional[dict] = None, method: Optional[str] = None):
+        """GET `path` and return the decoded JSON, or None on 404/permanent failure."""
+        method = method or path
+        method_limiter = self._method_limiter(method)
+        url = self.base_url + path
+
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire() + method_limiter.acquire()
+            t0 = time.perf_counter()
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._count("errors")
+                print("Request error:", path, e)
+                r = None
+            finally:
+                self._count("requests")
+            self._local.status = str(r.status_code) if r is not None else "error"
+            if self.metrics is not None:
+                self.metrics.observe("request_seconds", time.perf_counter() - t0, method=method)
+                self.metrics.inc("requests", method=method,
+                                 status=r.status_code if r is not None else "error")
+                if waited:
+                    self.metrics.inc("rate_limit_wait_seconds", waited)
+
+            try:
+                if r is not None:
+                    self.limiter.update_from_headers(r.headers.get("X-App-Rate-Limit"),
+                                                     r.headers.get("X-App-Rate-Limit-Count"))
+                    method_limiter.update_from_headers(r.headers.get("X-Method-Rate-Limit"),
+                                                       r.headers.get("X-Method-Rate-Limit-Count"))
+            finally:
+                self.limiter.release()
+                method_limiter.release()
+
+            if r is not None and r.status_code == 200:
+                return json_loads(r.content)     # orjson when installed
+            if r is not None and r.status_code == 404:
+                return None
+            if r is not None and r.status_code == 429:
+                self._count("429")
+                retry_after = float(r.headers.get("Retry-After", 1))
+                # app-level 429 pauses everyone; a method/service 429 only that method
+                if r.headers.get("X-Rate-Limit-Type") == "method":
+                    method_limiter.block_for(retry_after)
+                else:
+                    self.limiter.block_for(retry_after)
+                print(f"Rate limit (429). Waiting {retry_after:.0f}s, then retry:", path)
+            elif r is not None and r.status_code < 500:
+                print("Request failed:", path, r.status_code, r.text[:100])
+                return None
+            if attempt < self.max_retries:
+                self._count("retries")
+                if self.metrics is not None:
+                    self.metrics.inc("retries", method=method)
+                if r is None or r.status_code >= 500:
+                    time.sleep(min(2 ** attempt, 10))
+        print("Still failing after retries:", path)
+        return None
+
+    def last_status(self) -> Optional[str]:
+        """Status of this thread's last response ("404", "429", "error", ...)."""
+        return getattr(self._local, "status", None)
+
+    # --- endpoints ---
+    def match_ids(self, puuid: str, start: int = 0, count: int = 100,
+                  start_time: Optional[int] = None, end_time: Optional[int] = None,
+                  queue: Optional[int] = None) -> Optional[List[str]]:
+        """One page of IDs; None when the request failed (an empty page is [])."""
+        params = {"start": start, "count": count}
+        if queue is not None:
+            params["queue"] = queue
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        ids = self.get(MATCH_IDS_PATH.format(puuid=puuid), params=params, method="match-ids")
+        if ids is None and self.last_status() != "404":
+            return None     # 5xx / timeout / retries exhausted: not the end of the list
+        return ids or []
+
+    def match(self, match_id: str) -> Optional[dict]:
+        return self.get(MATCH_PATH.format(match_id=match_id), method="match")
+
+    def timeline(self, match_id: str) -> Optional[dict]:
+        return self.get(TIMELINE_PATH.format(match_id=match_id), method="timeline")
+
+
+# ====== CONCURRENT DOWNLOAD ======
+def download_matches(client: RiotClient, match_ids: Iterable[str],
+                     on_match: Callable[[str, dict], None],
+                     workers: int = 8, progress_every: int = 25, endpoint: str = "match",
+                     on_failure: Optional[Callable[[str, str], None]] = None):
+    """Fetch every id with `workers` threads; the limiter decides the actual pace.
+
+    `on_match(match_id, data)` is called from the worker thread as each match
+    arrives (write to disk / upload / ...), `on_failure(match_id, reason)` for
+    each id that failed (reason: last HTTP status, "error", or the exception).
+    `endpoint="timeline"` fetches match timelines instead. Returns
+    (success_ids, failed_ids).
+    """
+    fetch = getattr(client, endpoint)
+    match_ids = list(match_ids)
+    total = len(match_ids)
+    success, failed = [], []
+    if not total:
+        return success, failed
+
+    def work(match_id):
+        data = fetch(match_id)
+        if data:
+            on_match(match_id, data)
+        elif on_failure is not None:
+            on_failure(match_id, client.last_status() or "error")
+        return match_id, data is not None
+
+    # named threads, so py-spy / thread dumps show the download workers
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="riot-dl") as pool:
+        futures = {pool.submit(work, m): m for m in match_ids}
+        for i, fut in enumerate(as_completed(futures), start=1):
+            match_id, ok = futures[fut], False
+            try:
+                match_id, ok = fut.result()
+            except Exception as e:
+                print("Worker error:", match_id, e)
+                if on_failure is not None:
+                    on_failure(match_id, f"{type(e).__name__}: {e}")
+            (success if ok else failed).append(match_id)
+            if i % progress_every == 0 or i == total:
+                print(f"Progress: {round(i / total * 100)}% ({i}/{total} matches done)")
+    return success, failed
+
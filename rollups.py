@@ -0,0 +1,288 @@
+# rollups.py
+"""
+Per-player, per-role and per-champion-per-role rollups with percentile sketches.
+
+For every level in LEVELS the participants table is reduced to mergeable
+partials, like the champion partials in aggregates.py:
+
+    <level>.parquet         games, wins, sum / count of each metric per group
+    <level>_sketch.parquet  quantile sketch per group and SKETCH_METRICS metric
+
+The sketch is a log-bucketed histogram (the DDSketch idea): a value x is
+counted in bucket ceil(log_gamma(x / MIN_VALUE)), so every quantile read back
+from it is within ALPHA (1%) relative error. Sketches merge by adding counts,
+so new staged part files are folded in without rescanning old ones, and only
+non-empty buckets are stored (a player with 20 games has at most 20 rows per
+metric).
+
+Percentiles.rank() answers "where does this value fall for this group": a
+hash lookup of the group plus a binary search over its few buckets, e.g.
+"this game's CS/min was top 10% for Ahri MIDDLE" without recomputing
+quantiles over the table. The files live in data/processed/rollups/.
+
+    python rollups.py build
+    python rollups.py summary --level champion_role
+    python rollups.py rank --level champion_role --key Ahri --key MIDDLE --metric CS_per_min --value 8.1
+"""
+
+import argparse
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aggregates import load_partials, save_partials
+from staging import folded_parts
+
+ROLLUP_DIR = Path("data/processed/rollups")
+
+LEVELS: Dict[str, List[str]] = {
+    "player": ["puuid"],
+    "role": ["teamPosition"],
+    "champion_role": ["championName", "teamPosition"],
+}
+SKETCH_METRICS = ["KDA_ratio", "CS_per_min", "DMG_per_min", "Vision_per_min"]
+MEAN_METRICS = ["kills", "deaths", "assists", "goldEarned"] + SKETCH_METRICS
+QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# sketch: relative accuracy ALPHA; values below MIN_VALUE share bucket 0
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+MIN_VALUE = 0.01
+_LOG_GAMMA = math.log(GAMMA)
+
+
+# ====== SKETCH ======
+def bucket_of(values) -> np.ndarray:
+    """Sketch bucket of each value (NaN -> -1, not counted)."""
+    x = np.asarray(values, dtype="float64")
+    out = np.full(x.shape, -1, dtype=np.int16)
+    ok = ~np.isnan(x)
+    small = ok & (x < MIN_VALUE)
+    big = ok & ~small
+    out[small] = 0
+    out[big] = 1 + np.ceil(np.log(x[big] / MIN_VALUE) / _LOG_GAMMA).astype(np.int16)
+    return out
+
+
+def bucket_value(buckets) -> np.ndarray:
+    """Representative value of each bucket (within ALPHA of anything in it)."""
+    b = np.asarray(buckets, dtype="float64")
+    upper = MIN_VALUE * GAMMA ** (b - 1)
+    return np.where(b <= 0, 0.0, upper * 2 / (1 + GAMMA))
+
+
+# ====== PARTIALS ======
+def _frame_partials(df: pd.DataFrame, keys: List[str]):
+    """(stats, sketch) partials of one batch for one level."""
+    df = df.dropna(subset=keys)
+    g = df.groupby(keys, observed=True, sort=False)
+    stats = g.size().rename("games").to_frame()
+    stats["wins"] = g["win"].sum()
+    for m in MEAN_METRICS:
+        stats[f"{m}_sum"] = g[m].sum()
+        stats[f"{m}_n"] = g[m].count()
+    sketches = []
+    for m in SKETCH_METRICS:
+        b = bucket_of(df[m].to_numpy(dtype="float64", na_value=np.nan))
+        keep = b >= 0
+        part = df.loc[keep, keys].assign(bucket=b[keep])
+        counts = part.groupby(keys + ["bucket"], observed=True, sort=False).size()
+        sketches.append(counts.rename("count").reset_index().assign(metric=m))
+    return stats.reset_index(), pd.concat(sketches, ignore_index=True)
+
+
+def merge_stats(frames: Sequence[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=keys)
+    return pd.concat(frames, ignore_index=True).groupby(keys, as_index=False, sort=False).sum()
+
+
+def merge_sketches(frames: Sequence[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=keys + ["metric", "bucket", "count"])
+    out = (pd.concat(frames, ignore_index=True)
+           .groupby(keys + ["metric", "bucket"], as_index=False, sort=False)["count"].sum())
+    return out.sort_values(keys + ["metric", "bucket"], ignore_index=True)
+
+
+KEY_COLUMNS = sorted({k for keys in LEVELS.values() for k in keys})
+
+
+def _read_part(path: Path) -> pd.DataFrame:
+    """The columns the rollups use; columns the part predates come back as missing."""
+    wanted = KEY_COLUMNS + ["win"] + MEAN_METRICS
+    names = pq.ParquetFile(path).schema_arrow.names
+    df = pq.read_table(path, columns=[c for c in wanted if c in names]).to_pandas()
+    for c in wanted:
+        if c not in df.columns:
+            df[c] = pd.NA if c in KEY_COLUMNS or c == "win" else np.nan
+    for k in KEY_COLUMNS:
+        df[k] = df[k].astype("string")
+    df["win"] = df["win"].astype("boolean").fillna(False).astype("int64")
+    return df
+
+
+def _paths(level: str, out_dir) -> tuple:
+    out_dir = Path(out_dir)
+    return out_dir / f"{level}.parquet", out_dir / f"{level}_sketch.parquet"
+
+
+def update_rollups(participant_parts: Sequence[Path], out_dir=ROLLUP_DIR,
+                   rebuild: bool = False) -> Dict[str, int]:
+    """Fold participants part files not included yet into every level; returns groups per level."""
+    participant_parts = [Path(p) for p in participant_parts]
+    state = {}
+    for level in LEVELS:
+        stats_path, sketch_path = _paths(level, out_dir)
+        stats, done = load_partials(stats_path) if stats_path.exists() else (None, set())
+        sketch, sketch_done = load_partials(sketch_path) if sketch_path.exists() else (None, set())
+        covered, new = folded_parts(participant_parts, done)
+        # a crash between the two writes, or a rebuilt staged dataset: start this level over
+        if rebuild or done != sketch_done or covered is None:
+            stats, sketch, done, covered, new = None, None, set(), set(), participant_parts
+        state[level] = (stats, sketch, done, covered, {p.name for p in new})
+
+    todo = {p.name: p for p in participant_parts
+            if any(p.name in new for *_, new in state.values())}
+    new = {level: ([], []) for level in LEVELS}
+    for name, path in todo.items():
+        df = _read_part(path)
+        missing = [c for c in ("puuid", "teamPosition") if df[c].isna().all()]
+        if missing:
+            print(f"{path.name}: no {', '.join(missing)} (staged before these columns); restage to include it")
+        for level, keys in LEVELS.items():
+            if name not in state[level][4]:
+                continue
+            s, k = _frame_partials(df, keys)
+            new[level][0].append(s)
+            new[level][1].append(k)
+
+    groups = {}
+    for level, keys in LEVELS.items():
+        stats, sketch, done, covered, new_names = state[level]
+        added = [n for n in todo if n in new_names]
+        if added or stats is None or covered != done:
+            stats = merge_stats(([stats] if stats is not None else []) + new[level][0], keys)
+            sketch = merge_sketches(([sketch] if sketch is not None else []) + new[level][1], keys)
+            stats_path, sketch_path = _paths(level, out_dir)
+            # sketch first: the stats file's part list marks the level as complete
+            save_partials(sketch, covered | set(added), sketch_path)
+            save_partials(stats, covered | set(added), stats_path)
+        groups[level] = len(stats)
+    return groups
+
+
+# ====== SUMMARIES ======
+def load_level(level: str, out_dir=ROLLUP_DIR):
+    stats_path, sketch_path = _paths(level, out_dir)
+    return load_partials(stats_path)[0], load_partials(sketch_path)[0]
+
+
+def sketch_quantiles(sketch: pd.DataFrame, keys: List[str],
+                     quantiles=QUANTILES) -> pd.DataFrame:
+    """Quantiles per group and metric from the sketch, as <metric>_p<q> columns."""
+    s = sketch.sort_values(keys + ["metric", "bucket"], ignore_index=True)
+    g = s.groupby(keys + ["metric"], sort=False)["count"]
+    frac = g.cumsum() / g.transform("sum")
+    out = None
+    for q in quantiles:
+        hit = s[frac.to_numpy() >= q - 1e-12]
+        first = hit.groupby(keys + ["metric"], sort=False)["bucket"].first()
+        col = pd.Series(bucket_value(first.to_numpy()), index=first.index, name=f"p{round(q * 100)}")
+        out = col.to_frame() if out is None else out.join(col)
+    wide = out.unstack("metric")
+    wide.columns = [f"{m}_{p}" for p, m in wide.columns]
+    order = [f"{m}_p{round(q * 100)}" for m in SKETCH_METRICS for q in quantiles]
+    wide = wide[[c for c in order if c in wide.columns]]
+    return wide.reset_index()
+
+
+def summarize_level(level: str, out_dir=ROLLUP_DIR, min_games: int = 1) -> pd.DataFrame:
+    """games, winRate, metric means and sketch quantiles per group."""
+    keys = LEVELS[level]
+    stats, sketch = load_level(level, out_dir)
+    stats = stats[stats["games"] >= min_games]
+    out = stats[keys].copy()
+    out["games"] = stats["games"].astype("int64")
+    out["winRate"] = 100 * stats["wins"] / stats["games"]
+    for m in MEAN_METRICS:
+        out[m] = stats[f"{m}_sum"] / stats[f"{m}_n"].replace(0, np.nan)
+    out = out.merge(sketch_quantiles(sketch, keys), on=keys, how="left")
+    return out.sort_values("games", ascending=False, ignore_index=True)
+
+
+# ====== PERCENTILE LOOKUPS ======
+class Percentiles:
+    """O(1) percentile ranks against one level's sketches."""
+
+    def __init__(self, level: str = "champion_role", out_dir=ROLLUP_DIR):
+        self.level = level
+        self.keys = LEVELS[level]
+        _, sketch = load_level(level, out_dir)
+        s = sketch.sort_values(self.keys + ["metric", "bucket"], ignore_index=True)
+        group_cols = self.keys + ["metric"]
+        new_group = np.r_[True, (s[group_cols].iloc[1:].to_numpy() != s[group_cols].iloc[:-1].to_numpy())
+                          .any(axis=1)] if len(s) else np.array([], dtype=bool)
+        self.starts = np.flatnonzero(new_group)
+        self.stops = np.r_[self.starts[1:], len(s)]
+        self.buckets = s["bucket"].to_numpy()
+        self.cum = s.groupby(group_cols, sort=False)["count"].cumsum().to_numpy()
+        self.pos = pd.MultiIndex.from_frame(s.loc[self.starts, group_cols].astype(str)) \
+            if len(s) else pd.MultiIndex.from_tuples([], names=group_cols)
+
+    def rank(self, key, metric: str, value: float) -> Optional[float]:
+        """Percent of the group's games with `metric` <= value (None: unknown group / NaN)."""
+        key = (key,) if isinstance(key, str) else tuple(key)
+        lookup = tuple(str(k) for k in key) + (metric,)
+        if value is None or (isinstance(value, float) and math.isnan(value)) or lookup not in self.pos:
+            return None
+        i = self.pos.get_loc(lookup)
+        lo, hi = self.starts[i], self.stops[i]
+        j = lo + int(np.searchsorted(self.buckets[lo:hi], bucket_of([value])[0], side="right"))
+        below = self.cum[j - 1] if j > lo else 0
+        return 100.0 * below / self.cum[hi - 1]
+
+    def rank_frame(self, df: pd.DataFrame, metrics: Sequence[str] = SKETCH_METRICS) -> pd.DataFrame:
+        """<metric>_pct columns for each row of `df` (e.g. a match roster)."""
+        out = pd.DataFrame(index=df.index)
+        keys = df[self.keys].astype("string").fillna("").to_numpy()
+        for m in metrics:
+            if m in df.columns:
+                vals = df[m].to_numpy(dtype="float64", na_value=np.nan)
+                out[f"{m}_pct"] = [self.rank(tuple(k), m, v) for k, v in zip(keys, vals)]
+        return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Player / role / champion-role rollups with percentile sketches")
+    ap.add_argument("--out", default=str(ROLLUP_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="fold new participants part files into the rollups")
+    b.add_argument("--participants", default="data/staged/participants")
+    b.add_argument("--rebuild", action="store_true")
+    s = sub.add_parser("summary")
+    s.add_argument("--level", choices=list(LEVELS), default="champion_role")
+    s.add_argument("--min-games", type=int, default=1)
+    r = sub.add_parser("rank", help="percentile of one value within a group")
+    r.add_argument("--level", choices=list(LEVELS), default="champion_role")
+    r.add_argument("--key", action="append", required=True, help="group key value(s), in level order")
+    r.add_argument("--metric", choices=SKETCH_METRICS, required=True)
+    r.add_argument("--value", type=float, required=True)
+    args = ap.parse_args()
+
+    pd.set_option("display.width", 200)
+    if args.cmd == "build":
+        parts = sorted(Path(args.participants).glob("part-*.parquet"))
+        print(update_rollups(parts, args.out, rebuild=args.rebuild))
+    elif args.cmd == "summary":
+        print(summarize_level(args.level, args.out, args.min_games).head(30).to_string(index=False))
+    else:
+        pct = Percentiles(args.level, args.out).rank(args.key, args.metric, args.value)
+        print("unknown group" if pct is None else f"{args.metric} {args.value}: {pct:.1f}th percentile "
+              f"(top {100 - pct:.0f}%)")
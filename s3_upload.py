@@ -0,0 +1,252 @@
+# s3_upload.py
+"""
+Parallel S3 uploads with skip-if-unchanged.
+
+ - a bounded thread pool runs uploads in the background while the pipeline
+   carries on; boto3's TransferConfig handles multipart for large objects
+ - before uploading, the local file's S3 ETag (plain MD5, or the multipart
+   "md5-of-part-md5s-N" form for the configured chunk size) is compared with
+   the object's ETag, so unchanged files cost one HEAD, and files unchanged
+   since the last successful upload (same size + mtime, tracked in a small
+   local cache) cost nothing at all
+ - bundle() packs many small files into one tar.gz object (one PUT)
+ - delete() removes objects in batches (files a compaction replaced)
+ - with `metrics=` (metrics.Metrics): per-object upload time, uploaded /
+   skipped / failed counts and bytes, and skip-cache hits
+
+Works against any S3 endpoint, e.g. moto or MinIO via `endpoint_url`.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import tarfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+MB = 1024 * 1024
+
+DEFAULT_TRANSFER = TransferConfig(
+    multipart_threshold=16 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=4,        # per object; the pool adds concurrency across objects
+    use_threads=True,
+)
+
+DEFAULT_CACHE = Path("data/.s3_uploaded.json")
+
+
+def s3_etag(path, config: TransferConfig = DEFAULT_TRANSFER) -> str:
+    """ETag S3 will report for `path` uploaded with `config` (no KMS)."""
+    size = os.path.getsize(path)
+    if size < config.multipart_threshold:
+        h = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(MB), b""):
+                h.update(block)
+        return h.hexdigest()
+    # same adjustment boto3 makes: 5 MiB <= part <= 5 GiB, at most 10,000 parts
+    chunk = min(max(config.multipart_chunksize, 5 * MB), 5 * 1024 * MB)
+    while math.ceil(size / chunk) > 10000:
+        chunk *= 2
+    digests = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            digests.append(hashlib.md5(block).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class S3Uploader:
+    def __init__(self, bucket: str, client=None, workers: int = 8,
+                 config: TransferConfig = DEFAULT_TRANSFER,
+                 cache_path: Optional[Path] = DEFAULT_CACHE, metrics=None, **client_kwargs):
+        self.bucket = bucket
+        self.s3 = client or boto3.client("s3", **client_kwargs)
+        self.config = config
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3")
+        self._slots = threading.BoundedSemaphore(workers * 4)   # bounds queued uploads
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        self.stats = {"uploaded": 0, "skipped": 0, "failed": 0, "deleted": 0, "bytes": 0}
+        self.metrics = metrics
+        self.errors: List[Tuple[str, Exception]] = []
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.cache: Dict[str, dict] = {}
+        if self.cache_path and self.cache_path.exists():
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+
+    # --- skip logic ---
+    def _cache_key(self, key: str) -> str:
+        return f"{self.bucket}/{key}"
+
+    def _unchanged_since_cache(self, st: os.stat_result, key: str) -> bool:
+        entry = self.cache.get(self._cache_key(key))
+        return bool(entry) and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime
+
+    def _remote_etag(self, key: str) -> Optional[str]:
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=key)["ETag"].strip('"')
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _remember(self, st: os.stat_result, key: str, etag: str) -> None:
+        # `st` is taken before hashing, so a file modified mid-upload is re-checked next time
+        with self._lock:
+            self.cache[self._cache_key(key)] = {"etag": etag, "size": st.st_size,
+                                                "mtime": st.st_mtime}
+
+    def _count(self, k: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[k] += n
+        if self.metrics is not None:
+            if k == "bytes":
+                self.metrics.inc("s3_bytes", n)
+            else:
+                self.metrics.inc("s3_uploads", n, result=k)
+
+    # --- uploads ---
+    def upload(self, local_path, key: str, force: bool = False) -> bool:
+        """Upload now (in the calling thread). Returns False if skipped as unchanged."""
+        path = Path(local_path)
+        st = path.stat()
+        if not force and self._unchanged_since_cache(st, key):
+            self._count("skipped")
+            if self.metrics is not None:
+                self.metrics.cache("s3_local", hits=1)
+            return False
+        etag = s3_etag(path, self.config)
+        if not force and self._remote_etag(key) == etag:
+            self._remember(st, key, etag)
+            self._count("skipped")
+            if self.metrics is not None:
+                self.metrics.cache("s3_local", misses=1)
+                self.metrics.cache("s3_etag", hits=1)
+            return False
+        if self.metrics is not None and not force:
+            self.metrics.cache("s3_local", misses=1)
+            self.metrics.cache("s3_etag", misses=1)
+        t0 = time.perf_counter()
+        self.s3.upload_file(str(path), self.bucket, key, Config=self.config)
+        if self.metrics is not None:
+            self.metrics.observe("s3_upload_seconds", time.perf_counter() - t0)
+        self._remember(st, key, etag)
+        self._count("uploaded")
+        self._count("bytes", st.st_size)
+        return True
+
+    def submit(self, local_path, key: str, force: bool = False) -> Future:
+        """Queue an upload on the pool (blocks only when too many are queued)."""
+        self._slots.acquire()
+
+        def run():
+            try:
+                return self.upload(local_path, key, force)
+            except Exception as e:
+                self._count("failed")
+                with self._lock:
+                    self.errors.append((key, e))
+                print("Upload failed:", key, e)
+                return False
+            finally:
+                self._slots.release()
+
+        fut = self.pool.submit(run)
+        with self._lock:
+            self._futures.append(fut)
+        return fut
+
+    def upload_many(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        for local_path, key in pairs:
+            self.submit(local_path, key)
+
+    def bundle(self, files: Iterable, key: str, arcname_root=None) -> Future:
+        """Pack `files` into one tar.gz object at `key` (one PUT for many small files)."""
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+            for f in files:
+                f = Path(f)
+                tar.add(f, arcname=str(f.relative_to(arcname_root)) if arcname_root else f.name)
+        size = buf.tell()
+        buf.seek(0)
+
+        def run():
+            try:
+                self.s3.upload_fileobj(buf, self.bucket, key, Config=self.config)
+                self._count("uploaded")
+                self._count("bytes", size)
+                return True
+            except Exception as e:
+                self._count("failed")
+                with self._lock:
+                    self.errors.append((key, e))
+                print("Upload failed:", key, e)
+                return False
+
+        fut = self.pool.submit(run)
+        with self._lock:
+            self._futures.append(fut)
+        return fut
+
+    def delete(self, keys: Iterable[str]) -> Future:
+        """Queue removal of `keys` (e.g. files replaced by a compaction), 1000 per request."""
+        keys = list(keys)
+
+        def run():
+            try:
+                for i in range(0, len(keys), 1000):
+                    self.s3.delete_objects(Bucket=self.bucket, Delete={
+                        "Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True})
+                with self._lock:
+                    for k in keys:
+                        self.cache.pop(self._cache_key(k), None)
+                self._count("deleted", len(keys))
+                return True
+            except Exception as e:
+                self._count("failed")
+                with self._lock:
+                    self.errors.append((keys[0] if keys else "", e))
+                print("Delete failed:", len(keys), "keys", e)
+                return False
+
+        fut = self.pool.submit(run)
+        with self._lock:
+            self._futures.append(fut)
+        return fut
+
+    def wait(self) -> dict:
+        """Block until every queued upload finished; persist the cache. Returns stats."""
+        while True:
+            with self._lock:
+                pending, self._futures = self._futures, []
+            if not pending:
+                break
+            for fut in pending:
+                fut.result()
+        self.save_cache()
+        return dict(self.stats)
+
+    def save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        with self._lock, open(tmp, "w") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp, self.cache_path)
+
+    def close(self) -> dict:
+        stats = self.wait()
+        self.pool.shutdown()
+        return stats
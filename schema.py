@@ -0,0 +1,229 @@
+# schema.py
+"""
+Typed schemas for the staged tables, shared by staging (riot.py) and app.py.
+
+ - low-cardinality strings (championName, gameVersion, patch, platformId, ...)
+   are dictionary-encoded in Arrow/Parquet and categorical in pandas
+ - counters use the narrowest integer type that holds real values
+ - `win` is a nullable boolean; winCount/loseCount are not stored, they are
+   derived again only for the legacy CSV export
+ - `patch` ("15.19") is parsed once from gameVersion at staging time
+ - champions, items, summoner spells and runes are stored as their numeric
+   Data Dragon IDs; static_data.py turns them into names when displayed
+"""
+
+from typing import Dict, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from features import FEATURES as FEATURE_DEFS, feature
+from raw_store import patch_of  # noqa: F401  (re-exported: the one patch rule)
+
+CAT = pa.dictionary(pa.int32(), pa.string())
+
+MATCH_SCHEMA = pa.schema([
+    ("matchId", pa.string()),
+    ("gameCreation", pa.int64()),          # epoch ms
+    ("gameStartTimestamp", pa.int64()),
+    ("gameEndTimestamp", pa.int64()),
+    ("gameDuration", pa.int32()),          # seconds
+    ("endOfGameResult", CAT),
+    ("gameMode", CAT),
+    ("gameType", CAT),
+    ("gameVersion", CAT),
+    ("patch", CAT),
+    ("queueId", pa.int16()),
+    ("mapId", pa.int16()),
+    ("platformId", CAT),
+    ("tournamentCode", pa.string()),
+    ("blueWin", pa.bool_()),
+    ("redWin", pa.bool_()),
+])
+
+# participant stats copied as-is from info.participants[i], with their storage type
+PARTICIPANT_STATS = {
+    "kills": pa.int16(),
+    "deaths": pa.int16(),
+    "assists": pa.int16(),
+    "goldEarned": pa.int32(),
+    "goldSpent": pa.int32(),
+    "totalDamageDealtToChampions": pa.int32(),
+    "totalDamageTaken": pa.int32(),
+    "totalMinionsKilled": pa.int16(),
+    "neutralMinionsKilled": pa.int16(),
+    "visionScore": pa.int16(),
+    "wardsPlaced": pa.int16(),
+    "wardsKilled": pa.int16(),
+    "timeCCingOthers": pa.int32(),
+    "totalHeal": pa.int32(),
+    "totalTimeSpentDead": pa.int32(),
+    "killingSprees": pa.int16(),
+    "damageDealtToObjectives": pa.int32(),
+    "turretTakedowns": pa.int16(),
+    "inhibitorTakedowns": pa.int16(),
+    "champExperience": pa.int32(),
+    "timePlayed": pa.int32(),
+}
+
+# Data Dragon IDs, decoded to names on display (static_data.ID_COLUMNS); items
+# include Arena / event IDs above 2^15
+PARTICIPANT_IDS = {
+    "summoner1Id": pa.int16(),
+    "summoner2Id": pa.int16(),
+    **{f"item{i}": pa.int32() for i in range(7)},
+    "perkKeystone": pa.int16(),
+    "perkPrimaryStyle": pa.int16(),
+    "perkSubStyle": pa.int16(),
+}
+
+# derived features: expressions and storage types are defined in features.py
+FEATURES = {name: dtype for name, (_, dtype) in FEATURE_DEFS.items()}
+
+# order of the tidy participants table (context -> stats -> IDs -> features)
+PARTICIPANT_SCHEMA = pa.schema(
+    [("matchId", CAT), ("gameVersion", CAT), ("patch", CAT), ("queueId", pa.int16()),
+     ("gameDuration", pa.int32()), ("championName", CAT), ("championId", pa.int16()),
+     ("teamId", pa.int16()), ("teamPosition", CAT), ("puuid", pa.string()),
+     ("win", pa.bool_())]
+    + list(PARTICIPANT_STATS.items())
+    + list(PARTICIPANT_IDS.items())
+    + list(FEATURES.items())
+)
+
+# columns of the legacy tidy_participants.csv export, in order
+LEGACY_PARTICIPANT_COLUMNS = (
+    ["matchId", "gameVersion", "queueId", "gameDuration", "championName", "teamId",
+     "win", "winCount", "loseCount"]
+    + list(PARTICIPANT_STATS) + list(FEATURES)
+)
+
+
+def conform(cols: Dict[str, pa.Array], schema: pa.Schema) -> pa.RecordBatch:
+    """Cast computed columns to `schema` (narrow ints, float32, dictionaries)."""
+    arrays = []
+    for f in schema:
+        col = cols[f.name]
+        arrays.append(col if col.type == f.type else col.cast(f.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def legacy_participants(df: pd.DataFrame) -> pd.DataFrame:
+    """Staged participants frame -> tidy_participants.csv layout (winCount/loseCount back)."""
+    df = df.copy()
+    # float32 in storage; the export recomputes them in float64 from the stored
+    # (exact) stats, so the CSV keeps the full precision it always had
+    for name, (_, t) in FEATURE_DEFS.items():
+        if pa.types.is_floating(t) and name in df.columns:
+            df[name] = feature(df, name)
+    win = df["win"].astype("boolean").fillna(False)
+    df["winCount"] = win.astype("int64")
+    df["loseCount"] = 1 - df["winCount"]
+    return df[[c for c in LEGACY_PARTICIPANT_COLUMNS if c in df.columns]]
+
+
+# ====== PANDAS ======
+def _pandas_dtype(t: pa.DataType) -> str:
+    if pa.types.is_dictionary(t):
+        return "category"
+    if pa.types.is_boolean(t):
+        return "boolean"
+    if pa.types.is_integer(t):
+        return {8: "Int8", 16: "Int16", 32: "Int32", 64: "Int64"}[t.bit_width]
+    if pa.types.is_floating(t):
+        return "float32" if t.bit_width == 32 else "float64"
+    return "string"
+
+
+def pandas_dtypes() -> Dict[str, str]:
+    """column -> pandas dtype for every known staged column (nullable dtypes)."""
+    dtypes = {}
+    for schema in (MATCH_SCHEMA, PARTICIPANT_SCHEMA):
+        for f in schema:
+            dtypes.setdefault(f.name, _pandas_dtype(f.type))
+    dtypes["matchId"] = "category"      # repeated 10x in participant tables
+    dtypes.update(winCount="Int8", loseCount="Int8")
+    return dtypes
+
+
+def enforce_frame(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """Apply the schema dtypes to a loaded frame (known columns), and shrink the rest.
+
+    Unknown object columns become categorical when they repeat enough, unknown
+    numbers are downcast. Columns that don't convert are left as they are.
+    """
+    dtypes = pandas_dtypes()
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        try:
+            if c in dtypes:
+                target = dtypes[c]
+                if target == "boolean" and s.dtype == object:
+                    s = s.map({"True": True, "False": False, True: True, False: False})
+                out[c] = s.astype(target)
+            elif s.dtype == object or pd.api.types.is_string_dtype(s):
+                if len(s) and s.nunique(dropna=True) <= max_category_ratio * len(s):
+                    out[c] = s.astype("category")
+                else:
+                    out[c] = s
+            elif pd.api.types.is_integer_dtype(s):
+                out[c] = pd.to_numeric(s, downcast="integer")
+            elif pd.api.types.is_float_dtype(s):
+                out[c] = pd.to_numeric(s, downcast="float")
+            else:
+                out[c] = s
+        except (TypeError, ValueError):
+            out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+# ====== ARROW ======
+def arrow_types() -> Dict[str, pa.DataType]:
+    """column -> Arrow type for every known staged column."""
+    types = {}
+    for schema in (MATCH_SCHEMA, PARTICIPANT_SCHEMA):
+        for f in schema:
+            types.setdefault(f.name, f.type)
+    types["matchId"] = CAT
+    types.update(winCount=pa.int8(), loseCount=pa.int8())
+    return types
+
+
+# nullable pandas dtypes for Arrow ints / bools (what enforce_frame produces)
+NULLABLE_DTYPES = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(),
+                   pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+
+
+def enforce_table(table: pa.Table, max_category_ratio: float = 0.5) -> pa.Table:
+    """enforce_frame() done in Arrow, before pandas sees the data (no second copy).
+
+    Known columns are cast to their schema type, unknown strings that repeat
+    enough are dictionary-encoded. Columns that don't convert are left as they are.
+    """
+    types = arrow_types()
+    columns = []
+    for name, col in zip(table.column_names, table.columns):
+        try:
+            if name in types and col.type != types[name]:
+                col = col.cast(types[name])
+            elif name not in types and (pa.types.is_string(col.type) or pa.types.is_large_string(col.type)):
+                if len(col) and pc.count_distinct(col).as_py() <= max_category_ratio * len(col):
+                    col = col.dictionary_encode()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+        columns.append(col)
+    return pa.table(columns, names=table.column_names)
+
+
+def to_frame(table: pa.Table) -> pd.DataFrame:
+    """Arrow table -> pandas with the schema dtypes, releasing Arrow buffers as it goes."""
+    return enforce_table(table).to_pandas(types_mapper=NULLABLE_DTYPES.get, split_blocks=True,
+                                          self_destruct=True)
+
+
+def csv_dtypes(columns: Iterable[str]) -> Dict[str, str]:
+    """dtype= argument for pd.read_csv limited to the schema columns present."""
+    dtypes = pandas_dtypes()
+    return {c: dtypes[c] for c in columns if c in dtypes and dtypes[c] != "boolean"}
@@ -0,0 +1,518 @@
+# staging.py
+"""
+Single-pass streaming staging: raw matches -> matches + participants tables.
+
+Each match is parsed once and feeds both tables at the same time. Values go
+straight into per-column buffers (no per-row dicts), and every `batch_size`
+matches the buffers are turned into Arrow record batches, the derived
+features are computed on the batch, and the batch is appended to the Parquet
+and CSV outputs. Memory is bounded by the batch size, not the match count.
+
+With `workers > 1`, stage_store() fans chunks of the raw-store index out to a
+process pool: each worker reads, decompresses, parses (orjson when installed)
+and extracts its chunk and sends back two Arrow record batches, which the
+parent writes in order. At most 2 x workers chunks are in flight.
+
+Incremental mode (stage_incremental) keeps a manifest of staged matchIds
+and only stages raw matches that are not in it. Each run appends one part
+file per table to the data/staged/matches/ and data/staged/participants/
+Parquet datasets and appends rows to the CSV exports, so a nightly run costs
+time proportional to the new matches, not the whole history. The matchId ->
+row index (match_index.py) is brought up to date after every run.
+
+Frequent small runs (the ingestion daemon stages every few seconds) would
+leave thousands of tiny parts, so compact_parts() merges small parts into one
+once there are COMPACT_MIN_PARTS of them. The merged part records the parts
+it replaces (and what those replaced) in its Parquet metadata (merged_from);
+consumers that fold parts by name (aggregates, rollups, matchups, lake) use
+folded_parts() to see that they already hold its rows.
+
+    python staging.py --store data/raw/store --workers 8
+    python staging.py --incremental
+    python staging.py --compact
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from features import add_features
+from match_index import update_match_index
+from schema import (FEATURES, MATCH_SCHEMA, PARTICIPANT_IDS, PARTICIPANT_SCHEMA,
+                    PARTICIPANT_STATS, conform, legacy_participants, patch_of)
+
+PARTICIPANT_INPUTS = [f.name for f in PARTICIPANT_SCHEMA if f.name not in FEATURES]
+# IDs copied as-is (the perk columns come from the nested perks.styles)
+ITEM_SPELL_IDS = [c for c in PARTICIPANT_IDS if not c.startswith("perk")]
+
+
+# ====== EXTRACT (one match -> column buffers) ======
+def new_buffers(columns: Iterable[str]) -> Dict[str, list]:
+    return {c: [] for c in columns}
+
+
+def extract_match(match: dict, mb: Dict[str, list], pb: Dict[str, list]) -> None:
+    """Append one match's match-level row to `mb` and its participant rows to `pb`."""
+    meta = match.get("metadata", {})
+    info = match.get("info", {})
+    teams = info.get("teams", [])
+    # some matches might not have both teams
+    blue = teams[0] if len(teams) > 0 else {}
+    red = teams[1] if len(teams) > 1 else {}
+
+    match_id = meta.get("matchId")
+    version = info.get("gameVersion")
+    patch = patch_of(version)
+    for c in ("gameCreation", "gameStartTimestamp", "gameEndTimestamp", "gameDuration",
+              "endOfGameResult", "gameMode", "gameType", "gameVersion", "queueId",
+              "mapId", "platformId", "tournamentCode"):
+        mb[c].append(info.get(c))
+    mb["matchId"].append(match_id)
+    mb["patch"].append(patch)
+    mb["blueWin"].append(blue.get("win"))
+    mb["redWin"].append(red.get("win"))
+
+    queue, duration = info.get("queueId"), info.get("gameDuration")
+    for p in info.get("participants", []):
+        pb["matchId"].append(match_id)
+        pb["gameVersion"].append(version)
+        pb["patch"].append(patch)
+        pb["queueId"].append(queue)
+        pb["gameDuration"].append(duration)     # seconds
+        pb["championName"].append(p.get("championName"))
+        pb["championId"].append(p.get("championId"))
+        pb["teamId"].append(p.get("teamId"))
+        pb["teamPosition"].append(p.get("teamPosition") or None)    # "" outside Summoner's Rift
+        pb["puuid"].append(p.get("puuid"))
+        pb["win"].append(p.get("win"))
+        for c in PARTICIPANT_STATS:
+            pb[c].append(p.get(c))
+        for c in ITEM_SPELL_IDS:
+            pb[c].append(p.get(c))
+        styles = (p.get("perks") or {}).get("styles") or [{}]
+        primary, sub = styles[0], styles[1] if len(styles) > 1 else {}
+        pb["perkKeystone"].append(((primary.get("selections") or [{}])[0]).get("perk"))
+        pb["perkPrimaryStyle"].append(primary.get("style"))
+        pb["perkSubStyle"].append(sub.get("style"))
+
+
+# ====== BATCHES (features: features.FEATURES, vectorized per batch) ======
+def to_batch(buffers: Dict[str, list], schema: pa.Schema,
+             derive=None) -> pa.RecordBatch:
+    # build wide (int64/string) and narrow once at the end, so features never overflow
+    cols = {name: pa.array(buffers[name], type=_wide(schema.field(name).type))
+            for name in buffers}
+    if derive is not None:
+        cols = derive(cols)
+    return conform(cols, schema)
+
+
+def _wide(t: pa.DataType) -> pa.DataType:
+    if pa.types.is_integer(t):
+        return pa.int64()
+    if pa.types.is_dictionary(t):
+        return pa.string()
+    return t
+
+
+# ====== WRITERS ======
+def tmp_path(path: Path) -> Path:
+    # dot prefix: pq.read_table / ds.dataset skip it, and it never matches part-*.parquet
+    return path.with_name(f".{path.stem}.tmp")
+
+
+class TableSink:
+    """Appends record batches to a Parquet file and (optionally) a CSV file.
+
+    The Parquet file is written under a dot-prefixed tmp name and moved into
+    place on close(), so dataset readers never see a part still being written.
+    """
+
+    def __init__(self, schema: pa.Schema, parquet_path: Optional[Path] = None,
+                 csv_path: Optional[Path] = None, append: bool = False, csv_transform=None):
+        self.schema = schema
+        self.csv_transform = csv_transform   # DataFrame -> DataFrame for the CSV layout
+        self.parquet_path = Path(parquet_path) if parquet_path else None
+        self._tmp = tmp_path(self.parquet_path) if parquet_path else None
+        self.csv_path = Path(csv_path) if csv_path else None
+        self.append = append       # append to the CSV; no empty Parquet file for 0 rows
+        self.rows = 0
+        self._pq = None
+        for p in (self.parquet_path, self.csv_path):
+            if p:
+                p.parent.mkdir(parents=True, exist_ok=True)
+        if self.csv_path and self.csv_path.exists() and not append:
+            self.csv_path.unlink()
+        self._csv_header = not (self.csv_path and self.csv_path.exists()
+                                and self.csv_path.stat().st_size > 0)
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        if batch.num_rows == 0:
+            return
+        if self.parquet_path:
+            if self._pq is None:
+                self._pq = pq.ParquetWriter(self._tmp, self.schema)
+            self._pq.write_batch(batch)
+        if self.csv_path:
+            # pandas CSV formatting, same as the previous DataFrame.to_csv outputs
+            df = batch.to_pandas()
+            if self.csv_transform is not None:
+                df = self.csv_transform(df)
+            df.to_csv(self.csv_path, mode="a", index=False, header=self._csv_header)
+            self._csv_header = False
+        self.rows += batch.num_rows
+
+    def close(self) -> None:
+        if self._pq is not None:
+            self._pq.close()
+            self._pq = None
+            os.replace(self._tmp, self.parquet_path)
+        elif self.parquet_path and not self.append:
+            pq.write_table(self.schema.empty_table(), self._tmp)
+            os.replace(self._tmp, self.parquet_path)
+        if self.csv_path and self._csv_header:
+            df = self.schema.empty_table().to_pandas()
+            if self.csv_transform is not None:
+                df = self.csv_transform(df)
+            df.to_csv(self.csv_path, index=False)
+            self._csv_header = False
+
+
+# ====== STAGE ======
+def stage_matches(matches: Iterable[dict], match_sink: TableSink,
+                  participant_sink: TableSink, batch_size: int = 2000) -> dict:
+    """Stream `matches` once into both sinks; returns {"matches": n, "participants": n}."""
+    mb, pb = new_buffers(MATCH_SCHEMA.names), new_buffers(PARTICIPANT_INPUTS)
+    n = 0
+
+    def flush():
+        nonlocal mb, pb
+        match_sink.write(to_batch(mb, MATCH_SCHEMA))
+        participant_sink.write(to_batch(pb, PARTICIPANT_SCHEMA, add_features))
+        mb, pb = new_buffers(MATCH_SCHEMA.names), new_buffers(PARTICIPANT_INPUTS)
+
+    try:
+        for match in matches:
+            extract_match(match, mb, pb)
+            n += 1
+            if n % batch_size == 0:
+                flush()
+        flush()
+    finally:
+        match_sink.close()
+        participant_sink.close()
+    return {"matches": match_sink.rows, "participants": participant_sink.rows}
+
+
+def stage_chunk(root, entries) -> Tuple[pa.RecordBatch, pa.RecordBatch]:
+    """Worker: raw-store entries -> (matches batch, participants batch)."""
+    from raw_store import json_loads, read_entries
+
+    mb, pb = new_buffers(MATCH_SCHEMA.names), new_buffers(PARTICIPANT_INPUTS)
+    for raw in read_entries(root, entries):
+        extract_match(json_loads(raw), mb, pb)
+    return to_batch(mb, MATCH_SCHEMA), to_batch(pb, PARTICIPANT_SCHEMA, add_features)
+
+
+def stage_store(store, match_sink: TableSink, participant_sink: TableSink,
+                batch_size: int = 2000, workers: Optional[int] = None,
+                ids: Optional[Iterable[str]] = None) -> dict:
+    """Stage raw-store matches (all, or `ids`), in parallel when workers > 1."""
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    entries = store.entries(ids)
+    if workers <= 1 or len(entries) <= batch_size:
+        return stage_matches(store.iter_matches(ids), match_sink, participant_sink, batch_size)
+
+    chunks = (entries[i:i + batch_size] for i in range(0, len(entries), batch_size))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(stage_chunk, store.root, chunk))
+                if len(in_flight) >= 2 * workers:
+                    _write_chunk(in_flight.popleft().result(), match_sink, participant_sink)
+            while in_flight:
+                _write_chunk(in_flight.popleft().result(), match_sink, participant_sink)
+    finally:
+        match_sink.close()
+        participant_sink.close()
+    return {"matches": match_sink.rows, "participants": participant_sink.rows}
+
+
+def _write_chunk(batches, match_sink: TableSink, participant_sink: TableSink) -> None:
+    match_batch, participant_batch = batches
+    match_sink.write(match_batch)
+    participant_sink.write(participant_batch)
+
+
+def default_sinks(staged_dir="data/staged", processed_dir="data/processed"):
+    staged_dir, processed_dir = Path(staged_dir), Path(processed_dir)
+    return (TableSink(MATCH_SCHEMA, staged_dir / "matches.parquet", staged_dir / "matches.csv"),
+            TableSink(PARTICIPANT_SCHEMA, staged_dir / "participants.parquet",
+                      processed_dir / "tidy_participants.csv", csv_transform=legacy_participants))
+
+
+# ====== INCREMENTAL ======
+MANIFEST_NAME = "_manifest.tsv"
+
+
+def fingerprint(entry) -> str:
+    # a raw-store entry never changes once written; its location identifies the content
+    return f"{entry.segment}:{entry.offset}:{entry.length}"
+
+
+class StageManifest:
+    """matchId -> (run, raw fingerprint) for every match already staged.
+
+    Lines are `matchId  run  fingerprint`; a run's lines are appended only after
+    its part files are closed, so part files of a run that never made it into
+    the manifest are leftovers of a crash and are removed (see orphan_parts).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.staged: Dict[str, Tuple[str, str]] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3:
+                        self.staged[parts[0]] = (parts[1], parts[2])
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.staged
+
+    def __len__(self) -> int:
+        return len(self.staged)
+
+    def runs(self) -> set:
+        return {run for run, _ in self.staged.values()}
+
+    def add(self, run: str, items: Iterable[Tuple[str, str]]) -> None:
+        lines = [f"{mid}\t{run}\t{fp}\n" for mid, fp in items]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        for line in lines:
+            mid, run_, fp = line.rstrip("\n").split("\t")
+            self.staged[mid] = (run_, fp)
+
+    def replace_runs(self, runs: Iterable[str], run: str) -> None:
+        """Point the matches of `runs` at `run` (compaction); the file is rewritten atomically."""
+        runs = set(runs)
+        self.staged = {m: (run if r in runs else r, fp) for m, (r, fp) in self.staged.items()}
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            f.writelines(f"{m}\t{r}\t{fp}\n" for m, (r, fp) in self.staged.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def dataset_dirs(staged_dir="data/staged") -> Tuple[Path, Path]:
+    staged_dir = Path(staged_dir)
+    return staged_dir / "matches", staged_dir / "participants"
+
+
+def orphan_parts(staged_dir, manifest: StageManifest) -> List[Path]:
+    """Parts of runs missing from the manifest, and tmp files of interrupted writes."""
+    runs = manifest.runs()
+    return [f for d in dataset_dirs(staged_dir) if d.exists()
+            for f in sorted(d.glob("part-*.parquet")) + sorted(d.glob(".part-*.tmp"))
+            if f.suffix == ".tmp" or f.stem[len("part-"):] not in runs]
+
+
+# ====== PART COMPACTION ======
+SMALL_PART_BYTES = 16 * 1024 * 1024
+COMPACT_MIN_PARTS = 32          # small parts tolerated before they are merged
+MERGED_FROM = b"merged_from"
+
+
+def part_lineage(path) -> dict:
+    """{source part name: its own lineage} for a compacted part, {} for a plain one."""
+    meta = pq.read_schema(path).metadata or {}
+    return json.loads(meta.get(MERGED_FROM, b"{}"))
+
+
+def _lineage_names(lineage: dict) -> set:
+    return set(lineage).union(*(_lineage_names(sub) for sub in lineage.values()))
+
+
+def _lineage_folded(lineage: dict, done: set) -> bool:
+    return all(name in done or (sub and _lineage_folded(sub, done)) for name, sub in lineage.items())
+
+
+def folded_parts(parts: Iterable[Path], done: set) -> Tuple[Optional[set], List[Path]]:
+    """Match the current part files against the part names a consumer folded in.
+
+    Returns (names of current parts already folded, parts still to fold). A
+    compacted part whose sources are all folded in counts as folded. Returns
+    (None, []) when `done` can't be matched (a folded part is gone, or a merged
+    part is only partly folded): the consumer has to start over.
+    """
+    covered, new, seen = set(), [], set()
+    for p in map(Path, parts):
+        seen.add(p.name)
+        if p.name in done:
+            covered.add(p.name)
+            continue
+        lineage = part_lineage(p)
+        names = _lineage_names(lineage)
+        seen |= names
+        if lineage and _lineage_folded(lineage, done):
+            covered.add(p.name)
+        elif names & done:
+            return None, []
+        else:
+            new.append(p)
+    if done - seen:
+        return None, []
+    return covered, new
+
+
+def compact_parts(staged_dir="data/staged", small_bytes: int = SMALL_PART_BYTES,
+                  min_parts: int = COMPACT_MIN_PARTS) -> dict:
+    """Merge the small parts into one once there are `min_parts` of them.
+
+    Returns {"written": [...], "removed": [...]} part paths. Run it when every
+    consumer is up to date (before staging new matches): consumers only rename
+    what they folded, a consumer that folded part of the merged parts starts over.
+    """
+    staged_dir = Path(staged_dir)
+    manifest = StageManifest(staged_dir / MANIFEST_NAME)
+    matches_dir, participants_dir = dataset_dirs(staged_dir)
+    small = sorted(r for r in manifest.runs()
+                   if (matches_dir / f"part-{r}.parquet").exists()
+                   and (participants_dir / f"part-{r}.parquet").exists()
+                   and (participants_dir / f"part-{r}.parquet").stat().st_size < small_bytes)
+    if len(small) < max(2, min_parts):
+        return {"written": [], "removed": []}
+
+    run = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    written, removed = [], []
+    for d in (matches_dir, participants_dir):
+        sources = [d / f"part-{r}.parquet" for r in small]
+        # two levels: enough for a consumer one compaction behind, and the footer stays small
+        lineage = {p.name: {name: {} for name in part_lineage(p)} for p in sources}
+        table = pa.concat_tables([pq.read_table(p) for p in sources])    # match rows stay contiguous
+        table = table.replace_schema_metadata({MERGED_FROM: json.dumps(lineage).encode()})
+        path = d / f"part-{run}.parquet"
+        pq.write_table(table, tmp_path(path))
+        os.replace(tmp_path(path), path)
+        written.append(path)
+        removed += sources
+    # the manifest switches to the new run last; a crash before that leaves the
+    # new parts as orphans, after it the old ones (both are removed on the next run)
+    manifest.replace_runs(small, run)
+    for p in removed:
+        p.unlink()
+    update_match_index(staged_dir)
+    print(f"Compacted {len(small)} staged runs into part-{run}.parquet")
+    return {"written": written, "removed": removed}
+
+
+def schema_matches(staged_dir) -> bool:
+    """True if every existing part file was written with the current schemas."""
+    for d, schema in zip(dataset_dirs(staged_dir), (MATCH_SCHEMA, PARTICIPANT_SCHEMA)):
+        part = next(iter(sorted(d.glob("part-*.parquet"))), None) if d.exists() else None
+        if part is not None and not pq.read_schema(part).remove_metadata().equals(schema):
+            return False
+    return True
+
+
+def stage_incremental(store, staged_dir="data/staged", processed_dir="data/processed",
+                      batch_size: int = 2000, workers: Optional[int] = None,
+                      full: bool = False) -> dict:
+    """Stage only raw matches missing from the manifest (everything if `full`)."""
+    staged_dir, processed_dir = Path(staged_dir), Path(processed_dir)
+    manifest_path = staged_dir / MANIFEST_NAME
+    matches_dir, participants_dir = dataset_dirs(staged_dir)
+    # without a manifest the existing CSVs can't be trusted to line up, and parts
+    # written with an older schema can't share a dataset with new ones: start over
+    if not full and manifest_path.exists() and not schema_matches(staged_dir):
+        print("Staged parts use an older schema; restaging everything")
+        full = True
+    if full or not manifest_path.exists():
+        for d in (matches_dir, participants_dir):
+            for f in d.glob("part-*.parquet"):
+                f.unlink()
+        for f in (manifest_path, staged_dir / "matches.csv", processed_dir / "tidy_participants.csv"):
+            if f.exists():
+                f.unlink()
+    manifest = StageManifest(manifest_path)
+    for f in orphan_parts(staged_dir, manifest):
+        print("Removing part file from an interrupted run:", f)
+        f.unlink()
+
+    changed = [m for m, (_, fp) in manifest.staged.items()
+               if m in store and fingerprint(store.index[m]) != fp]
+    if changed:
+        print(f"{len(changed)} staged matches changed in the raw store; run with full=True to restage")
+    new_ids = [m for m in store.ids() if m not in manifest]
+    result = {"matches": 0, "participants": 0, "parts": [], "ids": [], "staged_total": len(manifest)}
+    if not new_ids:
+        update_match_index(staged_dir)
+        return result
+
+    run = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    match_sink = TableSink(MATCH_SCHEMA, matches_dir / f"part-{run}.parquet", append=True)
+    participant_sink = TableSink(PARTICIPANT_SCHEMA, participants_dir / f"part-{run}.parquet",
+                                 append=True)
+    counts = stage_store(store, match_sink, participant_sink, batch_size, workers, ids=new_ids)
+    manifest.add(run, ((m, fingerprint(store.index[m])) for m in new_ids))
+
+    # CSV exports: append just this run's rows
+    for part, csv_path, transform in (
+            (match_sink.parquet_path, staged_dir / "matches.csv", None),
+            (participant_sink.parquet_path, processed_dir / "tidy_participants.csv",
+             legacy_participants)):
+        csv_sink = TableSink(pq.read_schema(part), csv_path=csv_path, append=True,
+                             csv_transform=transform)
+        for batch in pq.ParquetFile(part).iter_batches():
+            csv_sink.write(batch)
+        csv_sink.close()
+
+    update_match_index(staged_dir)
+    result.update(counts, parts=[match_sink.parquet_path, participant_sink.parquet_path],
+                  ids=new_ids, staged_total=len(manifest))
+    return result
+
+
+if __name__ == "__main__":
+    from raw_store import RawStore
+
+    ap = argparse.ArgumentParser(description="Stage raw matches into matches/participants tables")
+    ap.add_argument("--store", default="data/raw/store")
+    ap.add_argument("--staged", default="data/staged")
+    ap.add_argument("--processed", default="data/processed")
+    ap.add_argument("--batch-size", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="only stage matches missing from the manifest (Parquet datasets)")
+    ap.add_argument("--full", action="store_true", help="with --incremental: restage everything")
+    ap.add_argument("--compact", action="store_true",
+                    help="merge the small incremental parts (consumers should be up to date)")
+    args = ap.parse_args()
+    if args.compact:
+        out = compact_parts(args.staged, min_parts=2)
+        print(f"{len(out['written'])} parts written, {len(out['removed'])} removed")
+    elif args.incremental:
+        result = stage_incremental(RawStore(args.store), args.staged, args.processed,
+                                   args.batch_size, args.workers, full=args.full)
+        print({k: v for k, v in result.items() if k != "ids"})
+    else:
+        match_sink, participant_sink = default_sinks(args.staged, args.processed)
+        print(stage_store(RawStore(args.store), match_sink, participant_sink,
+                          batch_size=args.batch_size, workers=args.workers))
+        update_match_index(args.staged)
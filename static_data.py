@@ -0,0 +1,224 @@
+# static_data.py
+"""
+Local cache of Data Dragon static data, keyed by patch, as array-indexed lookups.
+
+Staging stores small integer IDs (championId, summoner1Id/2Id, item0-6,
+perkKeystone / perkPrimaryStyle / perkSubStyle); names are looked up only
+when something is shown. Per patch ("15.19", the same patch_of(gameVersion)
+as everywhere else) the champion, item, summoner-spell and rune names are
+kept as one compact JSON file:
+
+    data/static/<patch>.json    {"version": "15.19.1", "champion": {"103": "Ahri"}, ...}
+
+`python static_data.py fetch --patch 15.19` fills it from Data Dragon. Offline,
+load() falls back to the newest cached patch before the requested one, then
+to the snapshot bundled with the repo (static_snapshot.json): every
+champion seen in the raw store plus long-standing spells, rune trees,
+keystones and common items. IDs it does not know decode to None.
+
+A loaded table is a dense array position-indexed by ID (int16 slots, -1 =
+unknown) next to an array of names, so decoding a column is one fancy
+index; decode_frame() decodes each distinct value once. Loaded patches are
+kept for the life of the process.
+
+    python static_data.py fetch --patch 15.19
+    python static_data.py snapshot              # rebuild static_snapshot.json
+    python static_data.py decode item 3031 6672 --patch 15.19
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+STATIC_DIR = Path("data/static")
+SNAPSHOT_PATH = Path(__file__).with_name("static_snapshot.json")
+DDRAGON = "https://ddragon.leagueoflegends.com"
+KINDS = ("champion", "item", "summoner", "rune")
+
+# staged participant column -> lookup kind
+ID_COLUMNS = {
+    "championId": "champion",
+    "summoner1Id": "summoner", "summoner2Id": "summoner",
+    **{f"item{i}": "item" for i in range(7)},
+    "perkKeystone": "rune", "perkPrimaryStyle": "rune", "perkSubStyle": "rune",
+}
+
+
+# ====== LOOKUP TABLES ======
+class Lookup:
+    """id -> name as a dense position array plus a names array."""
+
+    def __init__(self, names: Mapping):
+        items = sorted((int(k), v) for k, v in names.items())
+        ids = np.array([i for i, _ in items], dtype=np.int64)
+        # last slot stays None: where unknown IDs (-1) land
+        self.names = np.array([v for _, v in items] + [None], dtype=object)
+        self.index = np.full(int(ids.max()) + 1 if len(ids) else 0, -1,
+                             dtype=np.int16 if len(ids) < 2 ** 15 else np.int32)
+        self.index[ids] = np.arange(len(ids))
+
+    def __len__(self) -> int:
+        return len(self.names) - 1
+
+    def __getitem__(self, id_) -> Optional[str]:
+        return self.decode([id_])[0]
+
+    def decode(self, ids) -> np.ndarray:
+        """Names for an array of IDs (None for unknown / missing)."""
+        ids = np.asarray(pd.to_numeric(pd.Series(ids), errors="coerce").fillna(-1), dtype=np.int64)
+        ok = (ids >= 0) & (ids < len(self.index))
+        pos = np.where(ok, self.index[np.where(ok, ids, 0)] if len(self.index) else -1, -1)
+        return self.names[pos]
+
+
+class StaticData:
+    def __init__(self, tables: Mapping[str, Mapping], version: str = "", patch: str = ""):
+        self.version = version
+        self.patch = patch
+        self.lookups = {k: Lookup(tables.get(k, {})) for k in KINDS}
+
+    def name(self, kind: str, id_) -> Optional[str]:
+        return self.lookups[kind][id_]
+
+    def decode(self, kind: str, ids) -> np.ndarray:
+        return self.lookups[kind].decode(ids)
+
+    def decode_frame(self, df: pd.DataFrame, columns: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+        """Copy of `df` with its ID columns replaced by names (each distinct ID decoded once)."""
+        columns = ID_COLUMNS if columns is None else columns
+        out = {}
+        for col, kind in columns.items():
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                names = self.decode(kind, uniques)
+                # unknown IDs keep their number; 0 (empty slot / no runes) and missing stay None
+                labels = np.array([n if n is not None else str(int(u)) if u else None
+                                   for n, u in zip(names, uniques)] + [None], dtype=object)
+                out[col] = labels[codes]
+        return df.assign(**out)
+
+
+# ====== CACHE ======
+def _read(path: Path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _patch_key(patch: str):
+    return tuple(int(p) if p.isdigit() else -1 for p in str(patch).split("."))
+
+
+def cached_patches(static_dir=STATIC_DIR) -> list:
+    return sorted((p.stem for p in Path(static_dir).glob("*.json")), key=_patch_key)
+
+
+_loaded: Dict[tuple, StaticData] = {}
+
+
+def load(patch: Optional[str] = None, static_dir=STATIC_DIR) -> StaticData:
+    """Static data for `patch` (newest cached if None); built once per process.
+
+    The patch's own cache file if present, else the newest cached patch before
+    it, on top of the bundled snapshot (so a partial cache still decodes).
+    """
+    static_dir = Path(static_dir)
+    patches = cached_patches(static_dir)
+    if patch is None:
+        use = patches[-1] if patches else None
+    else:
+        older = [p for p in patches if _patch_key(p) <= _patch_key(patch)]
+        use = older[-1] if older else None
+    key = (str(static_dir), use)
+    if key not in _loaded:
+        snapshot = _read(SNAPSHOT_PATH) if SNAPSHOT_PATH.exists() else {}
+        data = _read(static_dir / f"{use}.json") if use else {}
+        tables = {k: {**snapshot.get(k, {}), **data.get(k, {})} for k in KINDS}
+        _loaded[key] = StaticData(tables, data.get("version") or snapshot.get("version", ""), use or "")
+    return _loaded[key]
+
+
+# ====== DATA DRAGON ======
+def fetch(patch: str, static_dir=STATIC_DIR, timeout: float = 20) -> Path:
+    """Download the patch's Data Dragon files into data/static/<patch>.json (online)."""
+    import requests
+
+    versions = requests.get(f"{DDRAGON}/api/versions.json", timeout=timeout).json()
+    version = next((v for v in versions if v == patch or v.startswith(patch + ".")), None)
+    if version is None:
+        raise ValueError(f"no Data Dragon version for patch {patch}")
+
+    def get(name):
+        return requests.get(f"{DDRAGON}/cdn/{version}/data/en_US/{name}", timeout=timeout).json()
+
+    runes = {}
+    for tree in get("runesReforged.json"):
+        runes[str(tree["id"])] = tree["name"]
+        for slot in tree["slots"]:
+            for r in slot["runes"]:
+                runes[str(r["id"])] = r["name"]
+    data = {
+        "version": version,
+        "champion": {c["key"]: c["id"] for c in get("champion.json")["data"].values()},
+        "item": {k: v["name"] for k, v in get("item.json")["data"].items()},
+        "summoner": {s["key"]: s["name"] for s in get("summoner.json")["data"].values()},
+        "rune": runes,
+    }
+    path = Path(static_dir) / f"{patch}.json"
+    _write(path, data)
+    return path
+
+
+def build_snapshot(store=None, static_dir=STATIC_DIR, path=SNAPSHOT_PATH) -> dict:
+    """Refresh the bundled snapshot: current one + cached patches + champions seen in the raw store."""
+    snap = _read(Path(path)) if Path(path).exists() else {"version": "bundled"}
+    for patch in cached_patches(static_dir):
+        data = _read(Path(static_dir) / f"{patch}.json")
+        for k in KINDS:
+            snap.setdefault(k, {}).update(data.get(k, {}))
+        snap["version"] = data.get("version", snap["version"])
+    if store is not None:
+        champs = snap.setdefault("champion", {})
+        for m in store.iter_matches():
+            for p in m.get("info", {}).get("participants", []):
+                if p.get("championId") and p.get("championName"):
+                    champs[str(p["championId"])] = p["championName"]
+    _write(Path(path), snap)
+    return {k: len(snap.get(k, {})) for k in KINDS}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Data Dragon static-data cache")
+    ap.add_argument("--static", default=str(STATIC_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fetch", help="download one patch from Data Dragon")
+    f.add_argument("--patch", required=True)
+    s = sub.add_parser("snapshot", help="rebuild the bundled offline snapshot")
+    s.add_argument("--store", default="data/raw/store")
+    d = sub.add_parser("decode")
+    d.add_argument("kind", choices=KINDS)
+    d.add_argument("ids", nargs="+", type=int)
+    d.add_argument("--patch")
+    args = ap.parse_args()
+
+    if args.cmd == "fetch":
+        print("Saved", fetch(args.patch, args.static))
+    elif args.cmd == "snapshot":
+        from raw_store import RawStore
+        print(build_snapshot(RawStore(args.store), args.static))
+    else:
+        sd = load(args.patch, args.static)
+        for i, name in zip(args.ids, sd.decode(args.kind, args.ids)):
+            print(i, name)
@@ -0,0 +1,181 @@
+# synth.py
+"""
+Synthetic match-v5 JSON for load tests and benchmarks.
+
+Every generated match starts from a real match in the raw store (a
+template), so the structure is the real one: every key, nested challenges /
+perks / missions, team objectives. On top of it the generator sets new ids,
+times, patch, players, champions, stats and winner:
+
+ - matchId / gameId count up from `first_id`. gameCreation advances with
+   the id over `days`, so newer ids are newer games, and gameVersion walks
+   through `patches` over the same span.
+ - players come from a pool of `players` synthetic PUUIDs, so by-puuid
+   paging returns realistic per-player histories.
+ - champions are drawn from the templates' champion pool. Duration and the
+   stat counters are rescaled by random factors, and on two-team maps the
+   winner is a coin flip.
+
+Generation streams straight into a RawStore (or a JSON directory) and needs
+no memory per match, so 1M matches is only a matter of disk space (~16 KB
+each in the store).
+
+    python synth.py --matches 100000 --store /tmp/synth/store
+    python synth.py --matches 1000 --json-dir /tmp/synth/matches
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from raw_store import RawStore, json_loads
+
+DAY_MS = 86_400_000
+DEFAULT_PATCHES = ("15.14.700.1", "15.15.705.2", "15.16.710.3", "15.17.712.4", "15.18.716.5",
+                   "15.19.720.6", "15.20.724.7")
+
+# participant counters rescaled with the game, besides every *Damage* key
+# (anything else is copied from the template)
+SCALED = {"goldEarned", "goldSpent", "totalMinionsKilled", "neutralMinionsKilled", "visionScore",
+          "wardsPlaced", "wardsKilled", "detectorWardsPlaced", "timeCCingOthers", "totalHeal",
+          "totalHealsOnTeammates", "totalTimeSpentDead", "damageDealtToObjectives",
+          "damageDealtToBuildings", "damageDealtToTurrets", "champExperience", "totalTimeCCDealt",
+          "damageSelfMitigated", "longestTimeSpentLiving"}
+
+
+def synthetic_puuid(i: int) -> str:
+    # 78 characters like real PUUIDs, stable per index
+    return hashlib.sha512(f"synthetic-player-{i}".encode()).hexdigest()[:78]
+
+
+def load_templates(store: RawStore, queues: Optional[Sequence[int]] = None) -> List[bytes]:
+    """Raw JSON of the template matches (optionally only some queues)."""
+    templates = []
+    for raw in store.iter_raw():
+        if queues is not None and json_loads(raw)["info"].get("queueId") not in queues:
+            continue
+        templates.append(raw)
+    if not templates:
+        raise ValueError(f"no template matches in {store.root}")
+    return templates
+
+
+class MatchGenerator:
+    def __init__(self, templates: Sequence[bytes], players: int = 10_000, seed: int = 0,
+                 first_id: int = 9_000_000_000, days: int = 180,
+                 patches: Sequence[str] = DEFAULT_PATCHES, end_ms: Optional[int] = None):
+        self.templates = list(templates)
+        self.rng = random.Random(seed)
+        self.players = [synthetic_puuid(i) for i in range(players)]
+        self.first_id = first_id
+        self.days = days
+        self.patches = list(patches)
+        self.end_ms = end_ms if end_ms is not None else int(time.time() * 1000)
+        champs = {}
+        self._scaled = []       # per template: the participant keys to rescale
+        for raw in self.templates:
+            parts = json_loads(raw)["info"]["participants"]
+            for p in parts:
+                champs[p["championName"]] = p["championId"]
+            self._scaled.append(sorted({k for p in parts for k, v in p.items()
+                                        if isinstance(v, int) and not isinstance(v, bool)
+                                        and (k in SCALED or "Damage" in k)}))
+        self.champions = sorted(champs.items())
+
+    def generate(self, n: int) -> Iterator[dict]:
+        span = self.days * DAY_MS
+        start_ms = self.end_ms - span
+        for i in range(n):
+            yield self.match(i, start_ms + int(span * (i + self.rng.random()) / max(n, 1)),
+                             self.patches[min(len(self.patches) - 1, i * len(self.patches) // max(n, 1))])
+
+    def match(self, i: int, created_ms: int, version: str) -> dict:
+        rng = self.rng
+        t_i = rng.randrange(len(self.templates))
+        m = json_loads(self.templates[t_i])     # a fresh copy of the template
+        scaled = self._scaled[t_i]
+        info = m["info"]
+        game_id = self.first_id + i
+        info["gameId"] = game_id
+        m["metadata"]["matchId"] = f"{info.get('platformId', 'KR')}_{game_id}"
+
+        old_duration = max(1, info.get("gameDuration", 1800))
+        duration = max(300, int(old_duration * rng.uniform(0.7, 1.3)))
+        t = duration / old_duration
+        info["gameCreation"] = created_ms
+        info["gameStartTimestamp"] = created_ms + rng.randint(5_000, 60_000)
+        info["gameEndTimestamp"] = info["gameStartTimestamp"] + duration * 1000
+        info["gameDuration"] = duration
+        info["gameVersion"] = version
+
+        parts = info["participants"]
+        puuids = rng.sample(self.players, len(parts))
+        champs = rng.sample(self.champions, len(parts))    # a champion appears once per match
+        two_teams = {p.get("teamId") for p in parts} == {100, 200}
+        flip = two_teams and rng.random() < 0.5
+        for p, puuid, (name, champ_id) in zip(parts, puuids, champs):
+            p["puuid"] = puuid
+            p["riotIdGameName"] = f"Player{puuid[:6]}"
+            p["summonerId"] = puuid[:47]
+            p["championName"], p["championId"] = name, champ_id
+            f = t * rng.uniform(0.6, 1.4)
+            for k in scaled:
+                if k in p:
+                    p[k] = int(p[k] * f)
+            for k in ("kills", "deaths", "assists"):
+                if isinstance(p.get(k), int):
+                    p[k] = max(0, int(round(p[k] * rng.uniform(0.5, 1.5))))
+            p["timePlayed"] = duration
+            if flip:
+                p["win"] = not p.get("win")
+        if flip:
+            for team in info.get("teams", []):
+                team["win"] = not team.get("win")
+        m["metadata"]["participants"] = puuids
+        return m
+
+
+def write_store(gen: MatchGenerator, n: int, store: RawStore, progress_every: int = 100_000) -> int:
+    for i, m in enumerate(gen.generate(n), start=1):
+        store.append(m)
+        if i % progress_every == 0:
+            print(f"generated {i}/{n}")
+    return n
+
+
+def write_json_dir(gen: MatchGenerator, n: int, out_dir) -> int:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for m in gen.generate(n):
+        with open(out_dir / f"{m['metadata']['matchId']}.json", "w") as f:
+            json.dump(m, f)
+    return n
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate synthetic match-v5 JSON from real templates")
+    ap.add_argument("--matches", type=int, default=10_000)
+    ap.add_argument("--players", type=int, default=10_000, help="size of the PUUID pool")
+    ap.add_argument("--templates", default="data/raw/store", help="raw store with real matches")
+    ap.add_argument("--queue", type=int, action="append", help="only use templates of this queue")
+    ap.add_argument("--days", type=int, default=180)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--level", type=int, default=1, help="gzip level of the generated store")
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--store", help="append to this raw store")
+    out.add_argument("--json-dir", help="write one JSON file per match here")
+    args = ap.parse_args()
+
+    gen = MatchGenerator(load_templates(RawStore(args.templates), args.queue),
+                         players=args.players, seed=args.seed, days=args.days)
+    t0 = time.time()
+    if args.store:
+        write_store(gen, args.matches, RawStore(args.store, level=args.level))
+    else:
+        write_json_dir(gen, args.matches, args.json_dir)
+    dt = time.time() - t0
+    print(f"{args.matches} matches in {dt:.1f}s ({args.matches / dt:.0f}/s)")
@@ -0,0 +1,389 @@
+# timeline.py
+"""
+Match timelines (/lol/match/v5/matches/{id}/timeline): compact storage and
+vectorized per-minute features.
+
+A timeline is ~1 MB of nested JSON (one frame per minute, ten participant
+frames each, plus every event). On ingest it is flattened into three
+narrow-typed tables, and the JSON is not kept:
+
+    frames   matchId, frame, participantId, totalGold, xp, cs, level, damage, x, y
+    events   matchId, timestamp, type, subtype, teamId, participantId
+             (champion kills, elite monsters, buildings only)
+    players  matchId, participantId, teamId, teamPosition, championName
+
+Each ingest batch is one Parquet part per table under data/raw/timelines/.
+
+The feature engine works on whole tables at once. Participant frames at the
+requested minutes are scattered into a dense (match, minute, participant,
+field) array. Lane opponents (same teamPosition, other team) are found with
+one fancy-index lookup. Gold/XP/CS diffs at 10/15/20, team gold diffs and
+lane leads are then array arithmetic, with no per-match Python loop.
+Objective timings (first blood/tower/dragon/herald/baron/grubs, counts per
+team) are one grouped pass over the events.
+
+    python timeline.py fetch --routing asia        # timelines for matches in the raw store
+    python timeline.py features                    # -> data/processed/timeline_*.parquet
+"""
+
+import argparse
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from schema import CAT
+
+TIMELINE_DIR = Path("data/raw/timelines")
+MINUTES = (10, 15, 20)
+POSITIONS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+
+FRAME_FIELDS = {
+    "totalGold": pa.int32(),
+    "xp": pa.int32(),
+    "cs": pa.int16(),           # minionsKilled + jungleMinionsKilled
+    "level": pa.int8(),
+    "damage": pa.int32(),       # damageStats.totalDamageDoneToChampions
+    "x": pa.int16(),
+    "y": pa.int16(),
+}
+FRAME_SCHEMA = pa.schema([("matchId", CAT), ("frame", pa.int16()), ("participantId", pa.int8())]
+                         + list(FRAME_FIELDS.items()))
+EVENT_SCHEMA = pa.schema([
+    ("matchId", CAT),
+    ("timestamp", pa.int32()),      # ms since game start
+    ("type", CAT),                  # CHAMPION_KILL, ELITE_MONSTER_KILL, BUILDING_KILL
+    ("subtype", CAT),               # monsterType / buildingType
+    ("teamId", pa.int16()),         # team credited with the event
+    ("participantId", pa.int8()),   # killer (0 = minions/none)
+])
+PLAYER_SCHEMA = pa.schema([("matchId", CAT), ("participantId", pa.int8()), ("teamId", pa.int16()),
+                           ("teamPosition", CAT), ("championName", CAT)])
+TABLES = {"frames": FRAME_SCHEMA, "events": EVENT_SCHEMA, "players": PLAYER_SCHEMA}
+KEPT_EVENTS = {"CHAMPION_KILL", "ELITE_MONSTER_KILL", "BUILDING_KILL"}
+
+
+# ====== EXTRACT (one timeline -> column buffers) ======
+def new_buffers() -> Dict[str, Dict[str, list]]:
+    return {name: {f.name: [] for f in schema} for name, schema in TABLES.items()}
+
+
+def extract_timeline(timeline: dict, match: Optional[dict], buf: Dict[str, Dict[str, list]]) -> None:
+    """Append one timeline's frames/events/players to `buf`.
+
+    `match` (the match-v5 JSON) supplies teamPosition/championName; without it
+    teams are inferred from participantId (first half blue).
+    """
+    info = timeline["info"]
+    mid = timeline["metadata"]["matchId"]
+    f = buf["frames"]
+    for i, frame in enumerate(info.get("frames", [])):
+        for pid, pf in frame.get("participantFrames", {}).items():
+            pos = pf.get("position") or {}
+            f["matchId"].append(mid)
+            f["frame"].append(i)
+            f["participantId"].append(int(pid))
+            f["totalGold"].append(pf.get("totalGold"))
+            f["xp"].append(pf.get("xp"))
+            f["cs"].append((pf.get("minionsKilled") or 0) + (pf.get("jungleMinionsKilled") or 0))
+            f["level"].append(pf.get("level"))
+            f["damage"].append((pf.get("damageStats") or {}).get("totalDamageDoneToChampions"))
+            f["x"].append(pos.get("x"))
+            f["y"].append(pos.get("y"))
+
+    parts = {p["participantId"]: p for p in (match or {}).get("info", {}).get("participants", [])}
+    pids = [p["participantId"] for p in info.get("participants", [])] or sorted(parts)
+    half = len(pids) // 2
+    team_of = {}
+    pl = buf["players"]
+    for pid in pids:
+        p = parts.get(pid, {})
+        team_of[pid] = p.get("teamId") or (100 if pid <= half else 200)
+        pl["matchId"].append(mid)
+        pl["participantId"].append(pid)
+        pl["teamId"].append(team_of[pid])
+        pl["teamPosition"].append(p.get("teamPosition") or None)
+        pl["championName"].append(p.get("championName"))
+
+    e = buf["events"]
+    for frame in info.get("frames", []):
+        for ev in frame.get("events", []):
+            kind = ev.get("type")
+            if kind not in KEPT_EVENTS:
+                continue
+            killer = ev.get("killerId") or 0
+            if kind == "BUILDING_KILL":
+                # teamId on a building event is the team that lost the building
+                team = 300 - ev["teamId"] if ev.get("teamId") in (100, 200) else None
+                subtype = ev.get("buildingType")
+            elif kind == "ELITE_MONSTER_KILL":
+                team = ev.get("killerTeamId") or team_of.get(killer)
+                subtype = ev.get("monsterType")
+            else:
+                team = team_of.get(killer)
+                subtype = None
+            e["matchId"].append(mid)
+            e["timestamp"].append(ev.get("timestamp"))
+            e["type"].append(kind)
+            e["subtype"].append(subtype)
+            e["teamId"].append(team)
+            e["participantId"].append(killer)
+
+
+def to_tables(buf: Dict[str, Dict[str, list]]) -> Dict[str, pa.Table]:
+    out = {}
+    for name, schema in TABLES.items():
+        cols = buf[name]
+        out[name] = pa.table({f.name: pa.array(cols[f.name], type=f.type.value_type
+                                               if pa.types.is_dictionary(f.type) else f.type)
+                              for f in schema}).cast(schema)
+    return out
+
+
+# ====== STORE ======
+class TimelineStore:
+    """Part files of the frames/events/players tables, appended per ingest batch."""
+
+    def __init__(self, root=TIMELINE_DIR, batch_size: int = 500):
+        self.root = Path(root)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._buf = new_buffers()
+        self._pending = 0
+        self._ids = None
+
+    def _dir(self, name: str) -> Path:
+        return self.root / name
+
+    def ids(self) -> set:
+        if self._ids is None:
+            parts = sorted(self._dir("players").glob("part-*.parquet"))
+            ids = set()
+            for p in parts:
+                col = pq.read_table(p, columns=["matchId"]).column("matchId")
+                ids.update(col.cast(pa.string()).unique().to_pylist())
+            self._ids = ids
+        return self._ids
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.ids()
+
+    def __len__(self) -> int:
+        return len(self.ids())
+
+    def add(self, timeline: dict, match: Optional[dict] = None) -> None:
+        """Buffer one timeline (thread-safe); writes a part every `batch_size` timelines."""
+        with self._lock:
+            extract_timeline(timeline, match, self._buf)
+            self.ids().add(timeline["metadata"]["matchId"])
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        tables = to_tables(self._buf)
+        run = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        # players last: a part counts as ingested once its players file exists
+        for name in ("frames", "events", "players"):
+            d = self._dir(name)
+            d.mkdir(parents=True, exist_ok=True)
+            tmp = d / f".part-{run}.tmp"     # dot prefix: never matched as a part
+            pq.write_table(tables[name], tmp)
+            os.replace(tmp, d / f"part-{run}.parquet")
+        self._buf, self._pending = new_buffers(), 0
+
+    def table(self, name: str, ids: Optional[Iterable[str]] = None,
+              columns: Optional[Sequence[str]] = None) -> pa.Table:
+        d = self._dir(name)
+        # only runs whose players part exists (a flush interrupted before that is not ingested)
+        players = self._dir("players")
+        parts = sorted(str(p) for p in d.glob("part-*.parquet") if (players / p.name).exists())
+        if not parts:
+            return TABLES[name].empty_table()
+        dataset = ds.dataset(parts, format="parquet")
+        expr = ds.field("matchId").isin(list(ids)) if ids is not None else None
+        return dataset.to_table(columns=columns, filter=expr)
+
+
+# ====== FEATURES (vectorized) ======
+def _codes(values, categories: pd.Index) -> np.ndarray:
+    return categories.get_indexer(pd.Series(values).astype(str))
+
+
+def timeline_features(frames: pa.Table, players: pa.Table,
+                      minutes: Sequence[int] = MINUTES) -> pd.DataFrame:
+    """One row per participant: gold/xp/cs at each minute, diffs vs lane opponent and team.
+
+    Columns: gold_<m>, xp_<m>, cs_<m>, goldDiff_<m>, xpDiff_<m>, csDiff_<m>,
+    teamGoldDiff_<m> and laneLead_<m> (ahead in both gold and xp). Values are
+    NaN when the game ended before minute m or the player has no lane opponent.
+    """
+    minutes = np.asarray(sorted(minutes))
+    pl = players.to_pandas()
+    pl["matchId"] = pl["matchId"].astype(str)
+    matches = pd.Index(pl["matchId"].unique())
+    n_m, n_t = len(matches), len(minutes)
+    n_p = int(pl["participantId"].max()) + 1 if len(pl) else 1
+
+    # --- dense values at the requested minutes: [match, minute, participant, field] ---
+    fields = ["totalGold", "xp", "cs"]
+    fr = frames.select(["matchId", "frame", "participantId"] + fields)
+    frame_col = fr.column("frame").to_numpy()
+    keep = np.isin(frame_col, minutes)
+    fr = fr.filter(pa.array(keep))
+    mi = _codes(fr.column("matchId").to_pandas(), matches)
+    ti = np.searchsorted(minutes, fr.column("frame").to_numpy())
+    pi = fr.column("participantId").to_numpy().astype(np.int64)
+    ok = mi >= 0
+    dense = np.full((n_m, n_t, n_p, len(fields)), np.nan, dtype=np.float32)
+    for k, name in enumerate(fields):
+        vals = fr.column(name).to_numpy(zero_copy_only=False).astype(np.float32)
+        dense[mi[ok], ti[ok], pi[ok], k] = vals[ok]
+
+    # --- lane opponents: slot[match, team, position] -> participantId ---
+    pm = _codes(pl["matchId"], matches)
+    pp = pl["participantId"].to_numpy().astype(np.int64)
+    team = (pl["teamId"].to_numpy() == 200).astype(np.int64)
+    pos = pd.Categorical(pl["teamPosition"].astype(object), categories=POSITIONS).codes.astype(np.int64)
+    slot = np.full((n_m, 2, len(POSITIONS)), -1, dtype=np.int64)
+    has_pos = pos >= 0
+    slot[pm[has_pos], team[has_pos], pos[has_pos]] = pp[has_pos]
+    opp = np.where(has_pos, slot[pm, 1 - team, np.maximum(pos, 0)], -1)
+
+    # --- team gold per [match, minute, team] ---
+    team_gold = np.zeros((n_m, n_t, 2), dtype=np.float64)
+    gold_at = dense[pm, :, pp, 0]                               # [rows, minute]
+    np.add.at(team_gold, (pm, slice(None), team), np.nan_to_num(gold_at))
+    game_over = np.isnan(dense[pm, :, :, 0]).all(axis=2)        # no frame at that minute
+
+    out = pl[["matchId", "participantId", "teamId", "teamPosition", "championName"]].copy()
+    mine = dense[pm, :, pp, :]                                  # [rows, minute, field]
+    theirs = np.where((opp >= 0)[:, None, None], dense[pm, :, np.maximum(opp, 0), :], np.nan)
+    diff = mine - theirs
+    team_diff = team_gold[pm, :, team] - team_gold[pm, :, 1 - team]
+    team_diff[game_over] = np.nan
+    for j, m in enumerate(minutes):
+        out[f"gold_{m}"] = mine[:, j, 0]
+        out[f"xp_{m}"] = mine[:, j, 1]
+        out[f"cs_{m}"] = mine[:, j, 2]
+        out[f"goldDiff_{m}"] = diff[:, j, 0]
+        out[f"xpDiff_{m}"] = diff[:, j, 1]
+        out[f"csDiff_{m}"] = diff[:, j, 2]
+        out[f"teamGoldDiff_{m}"] = team_diff[:, j].astype(np.float32)
+        lead = (diff[:, j, 0] > 0) & (diff[:, j, 1] > 0)
+        out[f"laneLead_{m}"] = pd.array(np.where(np.isnan(diff[:, j, 0]), None, lead), dtype="boolean")
+    return out
+
+
+OBJECTIVES = {
+    "firstBlood": ("CHAMPION_KILL", None),
+    "firstTower": ("BUILDING_KILL", "TOWER_BUILDING"),
+    "firstInhibitor": ("BUILDING_KILL", "INHIBITOR_BUILDING"),
+    "firstDragon": ("ELITE_MONSTER_KILL", "DRAGON"),
+    "firstHerald": ("ELITE_MONSTER_KILL", "RIFTHERALD"),
+    "firstBaron": ("ELITE_MONSTER_KILL", "BARON_NASHOR"),
+    "firstGrubs": ("ELITE_MONSTER_KILL", "HORDE"),
+}
+COUNTED = {"dragons": "DRAGON", "barons": "BARON_NASHOR", "heralds": "RIFTHERALD"}
+
+
+def objective_timings(events: pa.Table) -> pd.DataFrame:
+    """One row per match: <objective>_min and <objective>_team, plus per-team counts."""
+    ev = events.to_pandas()
+    if not len(ev):
+        return pd.DataFrame(columns=["matchId"])
+    ev["matchId"] = ev["matchId"].astype(str)
+    ev["type"] = ev["type"].astype(str)
+    ev["subtype"] = ev["subtype"].astype(object)
+    ev = ev.sort_values(["matchId", "timestamp"], kind="stable")
+    out = pd.DataFrame(index=pd.Index(ev["matchId"].unique(), name="matchId"))
+    for name, (kind, sub) in OBJECTIVES.items():
+        sel = ev[(ev["type"] == kind) & ((ev["subtype"] == sub) if sub else True)]
+        first = sel.groupby("matchId", sort=False).first()
+        out[f"{name}_min"] = (first["timestamp"] / 60000).astype("float32")
+        out[f"{name}_team"] = first["teamId"].astype("Int16")
+    towers = ev[(ev["type"] == "BUILDING_KILL") & (ev["subtype"] == "TOWER_BUILDING")]
+    counted = {"towers": towers}
+    for name, sub in COUNTED.items():
+        counted[name] = ev[(ev["type"] == "ELITE_MONSTER_KILL") & (ev["subtype"] == sub)]
+    for name, sel in counted.items():
+        counts = sel.groupby(["matchId", "teamId"]).size().unstack(fill_value=0)
+        for team in (100, 200):
+            col = counts[team] if team in counts.columns else pd.Series(dtype="int64")
+            out[f"{name}_{team}"] = col.reindex(out.index, fill_value=0).astype("int16")
+    return out.reset_index()
+
+
+def build_features(store: TimelineStore, out_dir="data/processed",
+                   ids: Optional[Iterable[str]] = None) -> Dict[str, Path]:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    frames = store.table("frames", ids, columns=["matchId", "frame", "participantId",
+                                                 "totalGold", "xp", "cs"])
+    feats = timeline_features(frames, store.table("players", ids))
+    objectives = objective_timings(store.table("events", ids))
+    paths = {"participants": out_dir / "timeline_participants.parquet",
+             "objectives": out_dir / "timeline_objectives.parquet"}
+    feats.to_parquet(paths["participants"], index=False)
+    objectives.to_parquet(paths["objectives"], index=False)
+    return paths
+
+
+# ====== INGEST ======
+def fetch_timelines(client, raw_store, store: TimelineStore, ids: Optional[Iterable[str]] = None,
+                    workers: int = 8) -> List[str]:
+    """Download timelines for stored matches that have none yet. Returns failed ids."""
+    from riot_client import download_matches
+
+    todo = [m for m in (ids if ids is not None else raw_store.ids()) if m not in store]
+    print(f"Timelines to fetch: {len(todo)}")
+
+    def on_timeline(match_id, data):
+        store.add(data, raw_store.get(match_id) if match_id in raw_store else None)
+
+    ok, failed = download_matches(client, todo, on_timeline, workers=workers, endpoint="timeline")
+    store.flush()
+    return failed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Match timelines: fetch into compact tables, build features")
+    ap.add_argument("--timelines", default=str(TIMELINE_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fetch")
+    f.add_argument("--store", default="data/raw/store")
+    f.add_argument("--routing", default="asia")
+    f.add_argument("--base-url")
+    f.add_argument("--workers", type=int, default=8)
+    b = sub.add_parser("features")
+    b.add_argument("--out", default="data/processed")
+    args = ap.parse_args()
+
+    tl_store = TimelineStore(args.timelines)
+    if args.cmd == "fetch":
+        from raw_store import RawStore
+        from riot_client import RiotClient
+
+        client = RiotClient(os.environ.get("RIOT_API_KEY", ""), routing=args.routing,
+                            base_url=args.base_url)
+        failed = fetch_timelines(client, RawStore(args.store), tl_store, workers=args.workers)
+        print(f"{len(tl_store)} timelines stored, {len(failed)} failed")
+    else:
+        t0 = time.time()
+        paths = build_features(tl_store, args.out)
+        print(f"features for {len(tl_store)} timelines in {time.time() - t0:.2f}s -> "
+              + ", ".join(str(p) for p in paths.values()))